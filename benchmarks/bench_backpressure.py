@@ -0,0 +1,82 @@
+"""Benchmark bulk transfer over a loopback data channel.
+
+Compares the former backpressure, which polled the buffered amount
+in 50 ms steps, with DataConnection's bufferedamountlow driven queue.
+
+Run with: python benchmarks/bench_backpressure.py
+"""
+import asyncio
+import time
+
+from aiortc import RTCConfiguration, RTCPeerConnection
+
+from peerjs.dataconnection import DataConnection
+
+CONFIG = RTCConfiguration(iceServers=[])
+MESSAGE = b'x' * 16 * 1024
+TOTAL = 64 * 1024 * 1024
+# Low enough for the channel to drain it within one 50 ms poll,
+# as on fast links or with memory constrained senders
+HIGH_WATER_MARK = 64 * 1024
+
+
+async def channel_pair():
+    """Return an open local data channel and a remote receive counter."""
+    local = RTCPeerConnection(CONFIG)
+    remote = RTCPeerConnection(CONFIG)
+    channel = local.createDataChannel('bench')
+    received = {'bytes': 0, 'done': asyncio.Event()}
+
+    @remote.on('datachannel')
+    def on_datachannel(remoteChannel):
+        @remoteChannel.on('message')
+        def on_message(message):
+            received['bytes'] += len(message)
+            if received['bytes'] >= TOTAL:
+                received['done'].set()
+
+    await local.setLocalDescription(await local.createOffer())
+    await remote.setRemoteDescription(local.localDescription)
+    await remote.setLocalDescription(await remote.createAnswer())
+    await local.setRemoteDescription(remote.localDescription)
+    opened = asyncio.Event()
+    channel.on('open', opened.set)
+    await opened.wait()
+    return local, remote, channel, received
+
+
+async def polling_send(channel, message):
+    """Former strategy: retry every 50 ms while the buffer is full."""
+    while channel.bufferedAmount > HIGH_WATER_MARK:
+        await asyncio.sleep(0.05)
+    channel.send(message)
+
+
+async def run(event_driven: bool) -> float:
+    local, remote, channel, received = await channel_pair()
+    if event_driven:
+        connection = DataConnection(
+            'remote', None, serialization='raw',
+            bufferHighWaterMark=HIGH_WATER_MARK,
+            bufferLowWaterMark=HIGH_WATER_MARK // 4)
+        await connection.initialize(channel)
+    started = time.perf_counter()
+    for _ in range(TOTAL // len(MESSAGE)):
+        if event_driven:
+            await connection.send(MESSAGE, wait=True)
+        else:
+            await polling_send(channel, MESSAGE)
+    await received['done'].wait()
+    elapsed = time.perf_counter() - started
+    await local.close()
+    await remote.close()
+    return TOTAL / elapsed / 1024 / 1024
+
+
+async def main():
+    print(f'polling 50 ms: {await run(False):7.1f} MiB/s')
+    print(f' event driven: {await run(True):7.1f} MiB/s')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+"""Benchmark BinaryPack against JSON for detection event payloads.
+
+JSON cannot carry bytes, so the thumbnail payload
+goes through base64 on the JSON path, as it would on the wire.
+
+Run with: python benchmarks/bench_binarypack.py
+"""
+import base64
+import json
+import os
+import timeit
+
+from peerjs.binarypack import pack, unpack
+
+ROUNDS = 20000
+
+EVENT = {
+    'type': 'detection',
+    'id': 'f1e2d3c4',
+    'camera': 'front-door',
+    'timestamp': 1700000000.123,
+    'frame': 123456,
+    'detections': [
+        {'label': 'person', 'confidence': 0.87, 'box': [12, 40, 220, 310]},
+        {'label': 'car', 'confidence': 0.66, 'box': [300, 120, 620, 400]},
+    ],
+}
+
+THUMBNAIL_EVENT = dict(EVENT, thumbnail=os.urandom(8 * 1024))
+
+
+def json_encode(event):
+    if 'thumbnail' in event:
+        event = dict(event, thumbnail=base64.b64encode(
+            event['thumbnail']).decode())
+    return json.dumps(event)
+
+
+def json_decode(message):
+    event = json.loads(message)
+    if 'thumbnail' in event:
+        event['thumbnail'] = base64.b64decode(event['thumbnail'])
+    return event
+
+
+def rate(func, *args):
+    return ROUNDS / timeit.timeit(lambda: func(*args), number=ROUNDS)
+
+
+def main():
+    for name, event in (('event', EVENT), ('event+8KiB', THUMBNAIL_EVENT)):
+        wire_json = json_encode(event)
+        wire_pack = pack(event)
+        assert json_decode(wire_json) == unpack(wire_pack) == event
+        print(f'{name}:')
+        print(f'  json        {rate(json_encode, event):>10,.0f} enc/s '
+              f'{rate(json_decode, wire_json):>10,.0f} dec/s '
+              f'{len(wire_json):>6} bytes')
+        print(f'  binarypack  {rate(pack, event):>10,.0f} enc/s '
+              f'{rate(unpack, wire_pack):>10,.0f} dec/s '
+              f'{len(wire_pack):>6} bytes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Benchmark per connection setup CPU time with and without cert reuse.
+
+Measures process CPU time to build an RTCPeerConnection
+and create its local offer, without ICE servers.
+
+Run with: python benchmarks/bench_certificatecache.py
+"""
+import asyncio
+import time
+
+from aiortc import RTCConfiguration, RTCPeerConnection
+
+from peerjs.certificatecache import CertificateCache
+
+ROUNDS = 500
+CONFIG = RTCConfiguration(iceServers=[])
+
+
+async def setup(new_connection):
+    """Return average CPU seconds per connection setup."""
+    connections = []
+    started = time.process_time()
+    for _ in range(ROUNDS):
+        peerConnection = new_connection()
+        peerConnection.createDataChannel('bench')
+        await peerConnection.createOffer()
+        connections.append(peerConnection)
+    elapsed = time.process_time() - started
+    for peerConnection in connections:
+        await peerConnection.close()
+    return elapsed / ROUNDS
+
+
+async def main():
+    cache = CertificateCache()
+    # generated once, as the first connection after start would
+    cache.certificate()
+    fresh = await setup(lambda: RTCPeerConnection(CONFIG))
+    cached = await setup(lambda: cache.createPeerConnection(CONFIG))
+    print(f'   fresh certificate: {fresh * 1e3:.3f} ms CPU per connection')
+    print(f'  cached certificate: {cached * 1e3:.3f} ms CPU per connection')
+    rotate = CertificateCache(lifetime=1)
+    now = time.time()
+    started = time.process_time()
+    for n in range(ROUNDS):
+        rotate.certificate(now + n * 2)
+    generate = (time.process_time() - started) / ROUNDS
+    print(f'certificate generate: {generate * 1e3:.3f} ms CPU')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""Benchmark small message rate and latency over a loopback data channel.
+
+Sends small JSON messages stamped with their send time, one at a time
+and with coalescing into batch frames, and reports the receive rate
+and the 99th percentile of the one way latency: as fast as possible,
+where latency is mostly queueing, and paced at a rate both keep up with.
+
+Run with: python benchmarks/bench_coalescing.py
+"""
+import asyncio
+import statistics
+import time
+
+from aiortc import RTCConfiguration, RTCPeerConnection
+
+from peerjs.dataconnection import DataConnection
+from peerjs.enums import ConnectionEventType
+
+CONFIG = RTCConfiguration(iceServers=[])
+# messages sent between two yields to the event loop
+BURST = 50
+
+
+async def connection_pair(**options):
+    """Return an open sending and receiving DataConnection."""
+    local = RTCPeerConnection(CONFIG)
+    remote = RTCPeerConnection(CONFIG)
+    channel = local.createDataChannel('bench')
+    sender = DataConnection('remote', None, serialization='json', **options)
+    receiver = DataConnection('local', None, serialization='json')
+    accepted = asyncio.Event()
+
+    @remote.on('datachannel')
+    async def on_datachannel(remoteChannel):
+        await receiver.initialize(remoteChannel)
+        accepted.set()
+
+    await local.setLocalDescription(await local.createOffer())
+    await remote.setRemoteDescription(local.localDescription)
+    await remote.setLocalDescription(await remote.createAnswer())
+    await local.setRemoteDescription(remote.localDescription)
+    opened = asyncio.Event()
+    sender.on(ConnectionEventType.Open, opened.set)
+    await sender.initialize(channel)
+    await opened.wait()
+    await accepted.wait()
+    receiver._open = True
+    return local, remote, sender, receiver
+
+
+async def run(count: int, rate: float = None, **options):
+    local, remote, sender, receiver = await connection_pair(**options)
+    latencies = []
+    done = asyncio.Event()
+
+    @receiver.on(ConnectionEventType.Data)
+    def on_data(message):
+        latencies.append(time.perf_counter() - message['t'])
+        if len(latencies) == count:
+            done.set()
+
+    started = time.perf_counter()
+    for n in range(count):
+        await sender.send({'n': n, 't': time.perf_counter()})
+        if n % BURST == BURST - 1:
+            await asyncio.sleep(BURST / rate if rate else 0)
+    await sender.drain()
+    await done.wait()
+    elapsed = time.perf_counter() - started
+    await local.close()
+    await remote.close()
+    p99 = statistics.quantiles(latencies, n=100)[98]
+    return count / elapsed, p99 * 1000
+
+
+async def main():
+    for count, rate in ((20000, None), (5000, 500)):
+        print('as fast as possible' if rate is None
+              else f'paced at {rate} msgs/s')
+        for name, options in (
+                ('one message per send', {}),
+                ('coalesce 1 ms', {'coalesceDelay': 0.001}),
+                ('coalesce 5 ms', {'coalesceDelay': 0.005})):
+            received, p99 = await run(count, rate, **options)
+            print(f'{name:>22}: {received:8.0f} msgs/s, '
+                  f'p99 latency {p99:8.2f} ms')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
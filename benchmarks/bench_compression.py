@@ -0,0 +1,57 @@
+"""Benchmark per-message compression of typical payloads.
+
+Reports wire size, CPU time to compress and decompress, and the time
+to send each payload over a slow 1 Mbit/s uplink, with and without
+compression.
+
+Run with: python benchmarks/bench_compression.py
+"""
+import json
+import os
+import time
+
+from peerjs import binarypack
+from peerjs.compression import Compressor
+
+UPLINK = 1_000_000 / 8  # bytes per second
+ROUNDS = 50
+
+PAYLOADS = {
+    'JSON event list': json.dumps([
+        {'id': f'evt-{i:06d}', 'type': 'detection',
+         'label': ('person', 'car', 'cat')[i % 3],
+         'score': round(0.5 + (i % 50) / 100, 2),
+         'box': [i % 640, i % 480, 64, 128],
+         'time': 1_600_000_000 + i * 7}
+        for i in range(500)]).encode(),
+    'HTTP JSON response': binarypack.pack({
+        'status': 200,
+        'headers': {'content-type': 'application/json'},
+        'body': json.dumps({'timeline': [
+            {'file': f'clip-{i}.mp4', 'args': {'inference': 'ok'}}
+            for i in range(300)]})}),
+    'JPEG like noise': os.urandom(64 * 1024),
+}
+
+
+def main():
+    for name, data in PAYLOADS.items():
+        compressor = Compressor()
+        started = time.process_time()
+        for _ in range(ROUNDS):
+            compressed = compressor.compress(data)
+        compressTime = (time.process_time() - started) / ROUNDS
+        started = time.process_time()
+        if compressed is not data:
+            for _ in range(ROUNDS):
+                compressor.decompress(compressed)
+        decompressTime = (time.process_time() - started) / ROUNDS
+        print(f'{name:>18}: {len(data):7d} -> {len(compressed):7d} bytes, '
+              f'compress {compressTime * 1000:5.2f} ms, '
+              f'decompress {decompressTime * 1000:5.2f} ms, '
+              f'uplink {len(data) / UPLINK * 1000:6.0f} -> '
+              f'{len(compressed) / UPLINK * 1000:6.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
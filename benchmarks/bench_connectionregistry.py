@@ -0,0 +1,57 @@
+"""Benchmark connection lookup cost as the connection count grows.
+
+Compares the former dict of lists scanned per lookup
+against ConnectionRegistry, with all connections
+to one remote peer as the worst case of the former.
+
+Run with: python benchmarks/bench_connectionregistry.py
+"""
+import timeit
+
+from pyee import AsyncIOEventEmitter
+
+from peerjs.connectionregistry import ConnectionRegistry
+
+LOOKUPS = 2000
+
+
+class FakeConnection(AsyncIOEventEmitter):
+    """Stand in for a data connection."""
+
+    def __init__(self, peer, connectionId):
+        super().__init__()
+        self.peer = peer
+        self.connectionId = connectionId
+        self.open = False
+
+
+def legacy_get(connections, peerId, connectionId):
+    """Former Peer.getConnection lookup."""
+    for connection in connections.get(peerId, []):
+        if connection.connectionId == connectionId:
+            return connection
+    return None
+
+
+def main():
+    print(f'{"connections":>12} {"before ns/op":>14} {"after ns/op":>14}')
+    for count in (10, 100, 1000, 10000):
+        legacy = {'remote': []}
+        registry = ConnectionRegistry()
+        for n in range(count):
+            connection = FakeConnection('remote', f'dc_{n}')
+            legacy['remote'].append(connection)
+            registry.add('remote', connection)
+        # look up the newest connection, as candidates for a fresh
+        # connection do while older ones are still registered
+        target = f'dc_{count - 1}'
+        before = timeit.timeit(
+            lambda: legacy_get(legacy, 'remote', target), number=LOOKUPS)
+        after = timeit.timeit(
+            lambda: registry.get('remote', target), number=LOOKUPS)
+        print(f'{count:>12} {before / LOOKUPS * 1e9:>14.0f} '
+              f'{after / LOOKUPS * 1e9:>14.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark a dashboard page load over the HTTP proxy.
+
+The page issues 24 API calls, each taking 50 ms upstream. With the
+original protocol the client sends one request after the other. With
+request ids it sends them all at once, and the proxy forwards up to
+max_concurrent_requests at a time.
+
+Run with: python benchmarks/bench_httpmultiplex.py
+"""
+import asyncio
+import json
+import time
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from loguru import logger
+from pyee import AsyncIOEventEmitter
+
+from peerjs.enums import ConnectionEventType
+from peerjs.ext import http_proxy
+
+CALLS = 24
+LATENCY = 0.05
+
+
+class LoopbackConnection(AsyncIOEventEmitter):
+    """Data connection that hands responses to the client."""
+
+    def __init__(self):
+        super().__init__()
+        self.open = True
+        self.peer = 'dashboard'
+        self.responses = asyncio.Queue()
+
+    async def send(self, data, compress=True):
+        await self.responses.put(data)
+
+    async def drain(self, limit=None):
+        pass
+
+
+async def api(request):
+    await asyncio.sleep(LATENCY)
+    return web.json_response({'path': request.path})
+
+
+async def body(connection):
+    """Return the next body message, skipping headers and pings."""
+    while True:
+        message = await connection.responses.get()
+        if isinstance(message, bytes):
+            return message
+
+
+async def waterfall(connection, urls):
+    for url in urls:
+        connection.emit(ConnectionEventType.Data, json.dumps({'url': url}))
+        await body(connection)
+
+
+async def multiplexed(connection, urls):
+    for id, url in enumerate(urls):
+        connection.emit(ConnectionEventType.Data,
+                        json.dumps({'id': id, 'url': url}))
+    for _ in urls:
+        await body(connection)
+
+
+async def main():
+    logger.remove()
+    app = web.Application()
+    app.router.add_get('/api/{name}', api)
+    async with TestServer(app) as server, aiohttp.ClientSession() as session:
+        http_proxy.http_session = session
+        urls = [str(server.make_url(f'/api/{n}')) for n in range(CALLS)]
+        for name, load, limit in (('waterfall', waterfall, 8),
+                                  ('multiplexed', multiplexed, 1),
+                                  ('multiplexed', multiplexed, 8),
+                                  ('multiplexed', multiplexed, 32)):
+            http_proxy.config['max_concurrent_requests'] = limit
+            connection = LoopbackConnection()
+            http_proxy._setPeerConnectionHandlers(connection)
+            started = time.perf_counter()
+            await load(connection, urls)
+            elapsed = time.perf_counter() - started
+            print(f'{name:>11}, {limit:2d} in flight: '
+                  f'{CALLS} calls in {elapsed * 1000:5.0f} ms')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
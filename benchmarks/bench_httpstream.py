@@ -0,0 +1,112 @@
+"""Benchmark buffered against streamed HTTP proxy responses.
+
+A local aiohttp server sends a 32 MiB clip at 40 MB/s, and the
+simulated data channel drains at 20 MB/s. Reports the time until the
+peer gets the response header and the first body bytes, the total
+time, and the peak memory traced while proxying.
+
+Run with: python benchmarks/bench_httpstream.py
+"""
+import asyncio
+import time
+import tracemalloc
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from loguru import logger
+
+from peerjs.ext import http_proxy
+
+CLIP_SIZE = 32 * 1024 * 1024
+UPSTREAM_RATE = 40 * 1024 * 1024  # bytes per second
+CHANNEL_RATE = 20 * 1024 * 1024
+TICK = 0.005
+
+
+class SimulatedConnection:
+    """Data connection whose buffer drains at CHANNEL_RATE."""
+
+    def __init__(self):
+        self.open = True
+        self.bufferedAmount = 0
+        self.started = time.perf_counter()
+        self.header = self.firstBody = None
+        self._drained = asyncio.Event()
+        self._task = asyncio.ensure_future(self._drain())
+
+    async def _drain(self):
+        while True:
+            await asyncio.sleep(TICK)
+            self.bufferedAmount = max(
+                0, self.bufferedAmount - int(CHANNEL_RATE * TICK))
+            self._drained.set()
+
+    async def send(self, data, compress=True):
+        now = time.perf_counter() - self.started
+        if isinstance(data, str):
+            if self.header is None:
+                self.header = now
+            return
+        if self.firstBody is None:
+            self.firstBody = now
+        self.bufferedAmount += len(data)
+
+    async def drain(self, limit=None):
+        while self.bufferedAmount > limit:
+            self._drained.clear()
+            await self._drained.wait()
+
+    async def finish(self):
+        while self.bufferedAmount:
+            await asyncio.sleep(TICK)
+        self._task.cancel()
+        return time.perf_counter() - self.started
+
+
+async def clip(request):
+    response = web.StreamResponse(
+        headers={'content-type': 'video/mp4',
+                 'content-length': str(CLIP_SIZE)})
+    await response.prepare(request)
+    block = b'\x42' * (256 * 1024)
+    for _ in range(CLIP_SIZE // len(block)):
+        await response.write(block)
+        await asyncio.sleep(len(block) / UPSTREAM_RATE)
+    return response
+
+
+async def buffered(connection, url):
+    response, content = await http_proxy._fetch(url=url)
+    await connection.send('{"status": 200}')
+    await connection.send(content)
+
+
+async def streamed(connection, url):
+    await http_proxy._stream(responder=http_proxy._Responder(connection),
+                             url=url,
+                             stop_flag=asyncio.Event())
+
+
+async def main():
+    logger.remove()
+    app = web.Application()
+    app.router.add_get('/clip', clip)
+    async with TestServer(app) as server, aiohttp.ClientSession() as session:
+        http_proxy.http_session = session
+        url = str(server.make_url('/clip'))
+        for name, proxy in (('buffered', buffered), ('streamed', streamed)):
+            tracemalloc.start()
+            connection = SimulatedConnection()
+            await proxy(connection, url)
+            total = await connection.finish()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f'{name:>9}: header {connection.header * 1000:6.0f} ms, '
+                  f'first body byte {connection.firstBody * 1000:6.0f} ms, '
+                  f'total {total:5.2f} s, '
+                  f'peak memory {peak / 1024 / 1024:5.1f} MiB')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+"""Benchmark uploads through the HTTP proxy.
+
+Sends a 16 MiB body to a local aiohttp server that reads it at
+40 MB/s, once inline in the JSON request and once streamed in 64 KiB
+binary messages, keeping to the acknowledged window. Reports the
+total time and the peak memory traced while uploading.
+
+Run with: python benchmarks/bench_httpupload.py
+"""
+import asyncio
+import json
+import struct
+import time
+import tracemalloc
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from loguru import logger
+from pyee import AsyncIOEventEmitter
+
+from peerjs.enums import ConnectionEventType
+from peerjs.ext import http_proxy
+
+SIZE = 16 * 1024 * 1024
+CHUNK = 64 * 1024
+UPSTREAM_RATE = 40 * 1024 * 1024  # bytes per second
+
+
+class LoopbackConnection(AsyncIOEventEmitter):
+    """Data connection that hands replies to the uploading client."""
+
+    def __init__(self):
+        super().__init__()
+        self.open = True
+        self.peer = 'uploader'
+        self.received = 0
+        self.acknowledged = asyncio.Event()
+        self.done = asyncio.Event()
+
+    async def send(self, data, compress=True):
+        if isinstance(data, bytes):
+            self.done.set()
+            return
+        message = json.loads(data)
+        if message['status'] == 100:
+            self.received = message['received']
+            self.acknowledged.set()
+        elif message['status'] >= 400:
+            self.done.set()
+
+    async def drain(self, limit=None):
+        pass
+
+
+async def upload(request):
+    length = 0
+    async for chunk in request.content.iter_chunked(CHUNK):
+        length += len(chunk)
+        await asyncio.sleep(len(chunk) / UPSTREAM_RATE)
+    return web.json_response({'length': length})
+
+
+async def inline(connection, url):
+    body = 'u' * SIZE
+    connection.emit(ConnectionEventType.Data, json.dumps(
+        {'id': 1, 'url': url, 'method': 'POST', 'body': body}))
+    del body
+
+
+async def streamed(connection, url):
+    connection.emit(ConnectionEventType.Data, json.dumps(
+        {'id': 1, 'url': url, 'method': 'POST', 'body-length': SIZE}))
+    prefix = struct.pack('>I', 1)
+    sent = 0
+    while sent < SIZE:
+        while sent + CHUNK - connection.received > http_proxy.UPLOAD_WINDOW:
+            connection.acknowledged.clear()
+            await connection.acknowledged.wait()
+        connection.emit(ConnectionEventType.Data, prefix + b'u' * CHUNK)
+        sent += CHUNK
+        await asyncio.sleep(0)
+
+
+async def main():
+    logger.remove()
+    app = web.Application(client_max_size=2 * SIZE)
+    app.router.add_post('/upload', upload)
+    async with TestServer(app) as server, aiohttp.ClientSession() as session:
+        http_proxy.http_session = session
+        url = str(server.make_url('/upload'))
+        for name, client in (('inline', inline), ('streamed', streamed)):
+            connection = LoopbackConnection()
+            http_proxy._setPeerConnectionHandlers(connection)
+            tracemalloc.start()
+            started = time.perf_counter()
+            await client(connection, url)
+            await connection.done.wait()
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f'{name:>9}: {SIZE // 1024 // 1024} MiB in {elapsed:5.2f} s, '
+                  f'peak memory {peak / 1024 / 1024:5.1f} MiB')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+"""Benchmark keepalives of HTTP proxy requests waiting on upstream.
+
+50 requests on one connection wait 3 seconds on a slow upstream.
+Compares a keepalive task per request, sending a 202 every second as
+the proxy used to, with the shared scheduler. Reports keepalive
+messages sent and timer wakeups.
+
+Run with: python benchmarks/bench_keepalive.py
+"""
+import asyncio
+import json
+
+from peerjs.ext.keepalive import KeepaliveScheduler
+
+REQUESTS = 50
+WAIT = 3.0
+INTERVAL = 1.0
+
+
+class Counter:
+    """Data connection that counts keepalives."""
+
+    open = True
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, data):
+        self.sent += 1
+
+
+async def perRequest(connection):
+    wakeups = 0
+
+    async def ping(stop):
+        nonlocal wakeups
+        while not stop.is_set():
+            await connection.send(json.dumps({'status': 202}))
+            await asyncio.sleep(INTERVAL)
+            wakeups += 1
+
+    async def request():
+        stop = asyncio.Event()
+        task = asyncio.ensure_future(ping(stop))
+        await asyncio.sleep(WAIT)
+        stop.set()
+        await task
+
+    await asyncio.gather(*(request() for _ in range(REQUESTS)))
+    return wakeups
+
+
+async def shared(connection):
+    scheduler = KeepaliveScheduler(interval=INTERVAL)
+
+    async def request(id):
+        waiting = scheduler.waiting(connection, id)
+        await asyncio.sleep(WAIT)
+        waiting.set()
+
+    await asyncio.gather(*(request(id) for id in range(REQUESTS)))
+    return scheduler.stats.ticks
+
+
+async def main():
+    for name, run in (('per request', perRequest), ('shared', shared)):
+        connection = Counter()
+        wakeups = await run(connection)
+        print(f'{name:>11}: {connection.sent:3d} keepalives, '
+              f'{wakeups:3d} timer wakeups for {REQUESTS} requests')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""Benchmark event loop stalls while large messages are serialized.
+
+Sends and receives a large JSON and a large binary message through
+DataConnections over a stand-in data channel, while a ticker measures
+how late the event loop runs it. Compares inline serialization with
+offloading to the default thread pool and to a process pool.
+
+Run with: python benchmarks/bench_offload.py
+"""
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from peerjs.dataconnection import DataConnection
+
+TICK = 0.001
+MESSAGE = {'events': [
+    {'id': f'evt-{i:06d}', 'label': 'person', 'score': 0.87,
+     'box': [i % 640, i % 480, 48, 160], 'time': 1600000000 + i}
+    for i in range(50000)]}
+
+
+class Channel:
+    """Data channel stand in keeping what is sent."""
+
+    bufferedAmount = 0
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+
+
+async def ticker(lags: list, stop: asyncio.Event) -> None:
+    """Record how late each tick runs."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+
+async def run(serialization: str, **options):
+    sender = DataConnection('remote', None, serialization=serialization,
+                            **options)
+    receiver = DataConnection('local', None, serialization=serialization,
+                              **options)
+    sender._dc = channel = Channel()
+    sender._open = True
+    lags = []
+    stop = asyncio.Event()
+    ticks = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    await sender.send(MESSAGE)
+    for message in channel.sent:
+        receiver._handleDataMessage(message)
+    assert await receiver.recv() == MESSAGE
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticks
+    return elapsed * 1000, max(lags) * 1000
+
+
+async def main():
+    processes = ProcessPoolExecutor(2)
+    for serialization in ('json', 'binary'):
+        print(f'{serialization}:')
+        for name, options in (
+                ('inline', {'offloadThreshold': 0}),
+                ('thread pool', {}),
+                ('process pool', {'offloadExecutor': processes})):
+            await run(serialization, **options)  # warm up
+            elapsed, lag = await run(serialization, **options)
+            print(f'{name:>13}: round trip {elapsed:7.1f} ms, '
+                  f'worst event loop lag {lag:7.1f} ms')
+    processes.shutdown()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
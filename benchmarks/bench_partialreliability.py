@@ -0,0 +1,101 @@
+"""Benchmark sensor message latency over a lossy data channel.
+
+Sends small timestamped readings at a fixed rate over a loopback
+connection that drops a share of its outgoing SCTP packets, with a
+reliable ordered channel and with partially reliable ones, and reports
+the latency percentiles of the readings that arrive.
+
+Run with: python benchmarks/bench_partialreliability.py
+"""
+import asyncio
+import random
+import statistics
+import time
+
+from aiortc import RTCConfiguration, RTCPeerConnection
+
+from peerjs.dataconnection import DataConnection
+from peerjs.enums import ConnectionEventType
+
+CONFIG = RTCConfiguration(iceServers=[])
+LOSS = 0.05
+RATE = 100
+COUNT = 1000
+
+
+def simulateLoss(peerConnection: RTCPeerConnection, rate: float) -> None:
+    """Drop a share of the SCTP packets a connection sends."""
+    transport = peerConnection.sctp.transport
+    send = transport._send_data
+
+    async def lossy_send(data):
+        if random.random() >= rate:
+            await send(data)
+
+    transport._send_data = lossy_send
+
+
+async def connection_pair(**options):
+    """Return an open sending and receiving DataConnection."""
+    local = RTCPeerConnection(CONFIG)
+    remote = RTCPeerConnection(CONFIG)
+    sender = DataConnection('remote', None, serialization='json', **options)
+    receiver = DataConnection('local', None, serialization='json')
+    channel = local.createDataChannel(sender.label,
+                                      **sender.dataChannelInit())
+    accepted = asyncio.Event()
+
+    @remote.on('datachannel')
+    async def on_datachannel(remoteChannel):
+        await receiver.initialize(remoteChannel)
+        receiver._open = True
+        accepted.set()
+
+    await local.setLocalDescription(await local.createOffer())
+    await remote.setRemoteDescription(local.localDescription)
+    await remote.setLocalDescription(await remote.createAnswer())
+    await local.setRemoteDescription(remote.localDescription)
+    opened = asyncio.Event()
+    sender.on(ConnectionEventType.Open, opened.set)
+    await sender.initialize(channel)
+    await opened.wait()
+    await accepted.wait()
+    simulateLoss(local, LOSS)
+    return local, remote, sender, receiver
+
+
+async def run(**options):
+    local, remote, sender, receiver = await connection_pair(**options)
+    latencies = []
+
+    @receiver.on(ConnectionEventType.Data)
+    def on_data(message):
+        latencies.append(time.perf_counter() - message['t'])
+
+    for n in range(COUNT):
+        await sender.send({'n': n, 't': time.perf_counter()})
+        await asyncio.sleep(1 / RATE)
+    # let retransmissions settle
+    await asyncio.sleep(3)
+    await local.close()
+    await remote.close()
+    p50, p99 = (statistics.quantiles(latencies, n=100)[i] for i in (49, 98))
+    return len(latencies) / COUNT, p50 * 1000, p99 * 1000, \
+        max(latencies) * 1000
+
+
+async def main():
+    print(f'{RATE} readings/s, {LOSS:.0%} packet loss')
+    for name, options in (
+            ('reliable ordered', {'ordered': True}),
+            ('reliable unordered', {'ordered': False}),
+            ('maxRetransmits=0', {'ordered': False, 'maxRetransmits': 0}),
+            ('maxPacketLifeTime=50', {'ordered': False,
+                                      'maxPacketLifeTime': 50})):
+        delivered, p50, p99, worst = await run(**options)
+        print(f'{name:>21}: {delivered:6.1%} delivered, '
+              f'p50 {p50:6.1f} ms, p99 {p99:7.1f} ms, max {worst:7.1f} ms')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
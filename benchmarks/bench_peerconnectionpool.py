@@ -0,0 +1,72 @@
+"""Benchmark answering an offer with and without pre-built connections.
+
+Measures the time from receiving a remote offer
+to having the local answer ready, over loopback without ICE servers.
+
+Run with: python benchmarks/bench_peerconnectionpool.py
+"""
+import asyncio
+import statistics
+import time
+
+from aiortc import RTCConfiguration, RTCPeerConnection
+
+from peerjs.peerconnectionpool import PeerConnectionPool
+
+ROUNDS = 30
+POOL_SIZE = 2
+CONFIG = RTCConfiguration(iceServers=[])
+
+
+async def make_offer():
+    offerer = RTCPeerConnection(CONFIG)
+    offerer.createDataChannel('bench')
+    await offerer.setLocalDescription(await offerer.createOffer())
+    return offerer
+
+
+async def answer(new_connection, offer):
+    started = time.perf_counter()
+    answerer = new_connection()
+    await answerer.setRemoteDescription(offer)
+    await answerer.setLocalDescription(await answerer.createAnswer())
+    elapsed = time.perf_counter() - started
+    return answerer, elapsed
+
+
+async def run(new_connection, idle=None):
+    times = []
+    for _ in range(ROUNDS):
+        offerer = await make_offer()
+        if idle:
+            await idle()
+        answerer, elapsed = await answer(
+            new_connection, offerer.localDescription)
+        times.append(elapsed)
+        await offerer.close()
+        await answerer.close()
+    return times
+
+
+async def refilled(pool):
+    """Wait as the time between offers would let the pool refill."""
+    while len(pool) < POOL_SIZE:
+        await asyncio.sleep(0.001)
+
+
+async def main():
+    on_demand = await run(lambda: RTCPeerConnection(CONFIG))
+    pool = PeerConnectionPool(
+        lambda: RTCPeerConnection(CONFIG), size=POOL_SIZE)
+    pool.fill()
+    pooled = await run(pool.take, idle=lambda: refilled(pool))
+    for name, times in (('on demand', on_demand), ('pooled', pooled)):
+        print(f'{name:>10}: median {statistics.median(times) * 1e3:.2f} ms '
+              f'p90 {sorted(times)[int(len(times) * 0.9)] * 1e3:.2f} ms')
+    stats = pool.stats
+    print(f'pool hits {stats.hits} misses {stats.misses}')
+    await pool.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+"""Benchmark per identity memory and startup cost of pooled peers.
+
+Starts N peers against an in-process signaling server stand in,
+once as standalone Peer instances and once through a PeerPool.
+
+Run with: python benchmarks/bench_peerpool.py [N]
+"""
+import asyncio
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from aiohttp import web
+
+from peerjs.peer import Peer, PeerOptions
+from peerjs.peerpool import PeerPool
+from peerjs.util import util
+
+PORT = 9779
+
+
+async def start_signaling_server():
+    """Serve the minimal PeerJS server API needed by Peer.start()."""
+    counter = 0
+
+    async def retrieve_id(request):
+        nonlocal counter
+        counter += 1
+        return web.Response(text=f'peer{counter}')
+
+    async def websocket(request):
+        # no compression, so that only client side memory is measured
+        ws = web.WebSocketResponse(compress=False)
+        await ws.prepare(request)
+        await ws.send_str(json.dumps({'type': 'OPEN'}))
+        async for _ in ws:
+            pass
+        return ws
+
+    app = web.Application()
+    app.router.add_get('/peerjs/id', retrieve_id)
+    app.router.add_get('/peerjs', websocket)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, 'localhost', PORT).start()
+    return runner
+
+
+def options():
+    return PeerOptions(host='localhost', port=PORT, secure=False,
+                       token=util.randomToken())
+
+
+async def standalone(n):
+    peers = []
+    for _ in range(n):
+        peer = Peer(peer_options=options())
+        await peer.start()
+        peers.append(peer)
+    return peers, peers
+
+
+async def pooled(n):
+    pool = PeerPool(peer_options=options())
+    for _ in range(n):
+        await pool.addPeer()
+    return pool, list(pool)
+
+
+async def measure(label, create, n):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    started = time.perf_counter()
+    owner, peers = await create(n)
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(0.2)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    memory = sum(stat.size_diff for stat in
+                 after.compare_to(before, 'filename'))
+    assert all(peer.open for peer in peers)
+    print(f'{label:>10}: {elapsed / n * 1000:8.2f} ms/peer startup, '
+          f'{memory / n / 1024:8.1f} KiB/peer')
+    if isinstance(owner, PeerPool):
+        await owner.close()
+    else:
+        for peer in peers:
+            await peer.destroy()
+
+
+async def main(n):
+    runner = await start_signaling_server()
+    try:
+        await measure('standalone', standalone, n)
+        await measure('pooled', pooled, n)
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
@@ -0,0 +1,101 @@
+"""Benchmark the HTTP proxy response cache on a polling UI.
+
+The UI polls a status endpoint that may be cached for a second and a
+64 KiB timeline that upstream only lets us revalidate by ETag, every
+100 ms. Upstream takes 20 ms per request. Reports the mean time per
+poll, upstream body bytes and the cache stats, without and with the
+cache, and with the client sending If-None-Match too.
+
+Run with: python benchmarks/bench_responsecache.py
+"""
+import asyncio
+import time
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from loguru import logger
+
+from peerjs.ext import http_proxy
+from peerjs.ext.responsecache import ResponseCache
+
+POLLS = 30
+INTERVAL = 0.1
+LATENCY = 0.02
+TIMELINE = b'[' + b'{"event": "motion"},' * 3200 + b'{}]'
+
+
+class Sink:
+    """Data connection that only counts what it is sent."""
+
+    open = True
+
+    def __init__(self):
+        self.bodyBytes = 0
+
+    async def send(self, data, compress=True):
+        if isinstance(data, bytes):
+            self.bodyBytes += len(data)
+
+    async def drain(self, limit=None):
+        pass
+
+
+async def main():
+    logger.remove()
+    upstreamBytes = 0
+
+    async def status(request):
+        nonlocal upstreamBytes
+        await asyncio.sleep(LATENCY)
+        upstreamBytes += 15
+        return web.Response(body=b'{"status": "ok"}', headers={
+            'Cache-Control': 'max-age=1', 'Content-Type': 'application/json'})
+
+    async def timeline(request):
+        nonlocal upstreamBytes
+        await asyncio.sleep(LATENCY)
+        if request.headers.get('If-None-Match') == '"t1"':
+            return web.Response(status=304, headers={'ETag': '"t1"'})
+        upstreamBytes += len(TIMELINE)
+        return web.Response(body=TIMELINE, headers={
+            'ETag': '"t1"', 'Cache-Control': 'no-cache',
+            'Content-Type': 'application/json'})
+
+    app = web.Application()
+    app.router.add_get('/status', status)
+    app.router.add_get('/timeline', timeline)
+    async with TestServer(app) as server, aiohttp.ClientSession() as session:
+        http_proxy.http_session = session
+        urls = [str(server.make_url(path)) for path in ('/status', '/timeline')]
+        for name, cache, conditional in (('no cache', None, False),
+                                         ('cache', ResponseCache(), False),
+                                         ('cache + 304', ResponseCache(), True)):
+            http_proxy.response_cache = cache
+            upstreamBytes = 0
+            sink = Sink()
+            responder = http_proxy._Responder(sink)
+            elapsed = 0.0
+            for _ in range(POLLS):
+                for url in urls:
+                    headers = {'If-None-Match': '"t1"'} if conditional else None
+                    started = time.perf_counter()
+                    await http_proxy._proxy(
+                        responder=responder,
+                        request={'url': url, 'headers': headers},
+                        waiting_on_fetch=asyncio.Event())
+                    elapsed += time.perf_counter() - started
+                await asyncio.sleep(INTERVAL)
+            print(f'{name:>11}: {elapsed / POLLS / len(urls) * 1000:5.1f} ms '
+                  f'per request, upstream {upstreamBytes / 1024:6.0f} KiB, '
+                  f'to peer {sink.bodyBytes / 1024:6.0f} KiB')
+            if cache is not None:
+                stats = cache.stats
+                print(f'{"":>11}  hit ratio {stats.hitRatio:.2f}, '
+                      f'saved {stats.upstreamBytesSaved / 1024:.0f} KiB '
+                      f'upstream, {stats.peerBytesSaved / 1024:.0f} KiB '
+                      'to peer')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""Micro-benchmark for decoding and dispatching signaling server messages.
+
+Compares the former dataclasses_json decoder with per message
+event emitter dispatch against the slotted decoder and the
+precompiled dispatch table in Peer.
+
+Run with: python benchmarks/bench_signaling.py
+"""
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from dataclasses_json import dataclass_json
+from pyee import AsyncIOEventEmitter
+
+from peerjs.enums import ConnectionType, ServerMessageType
+from peerjs.peer import Peer, PeerOptions
+from peerjs.servermessage import ServerMessage
+
+ROUNDS = 20000
+
+FRAMES = [
+    json.dumps({
+        'type': 'CANDIDATE',
+        'src': 'remote-peer',
+        'payload': {
+            'connectionId': 'dc_bench',
+            'type': 'data',
+            'candidate': {
+                'candidate': 'candidate:842163049 1 udp 1677729535 '
+                             '203.0.113.7 50123 typ srflx raddr 0.0.0.0 '
+                             'rport 0 generation 0',
+                'sdpMid': '0',
+                'sdpMLineIndex': 0,
+            },
+        },
+    }),
+    json.dumps({'type': 'HEARTBEAT'}),
+]
+
+
+@dataclass_json
+@dataclass
+class LegacyServerMessage:
+    """Server message as decoded before the slotted decoder."""
+
+    type: ServerMessageType = None
+    payload: Optional[Any] = None
+    src: Optional[str] = None
+
+
+class FakeConnection(AsyncIOEventEmitter):
+    """Stand in for a negotiating data connection."""
+
+    def __init__(self):
+        super().__init__()
+        self.type = ConnectionType.Data
+        self.peer = 'remote-peer'
+        self.connectionId = 'dc_bench'
+        self.peerConnection = object()
+        self.open = False
+
+    async def handleMessage(self, message):
+        pass
+
+
+async def legacy_dispatch(peer, message):
+    """Replicate the former per message emitter based dispatch."""
+    server_messenger = AsyncIOEventEmitter()
+    for type in (ServerMessageType.Open, ServerMessageType.Error,
+                 ServerMessageType.IdTaken, ServerMessageType.InvalidKey,
+                 ServerMessageType.Leave, ServerMessageType.Expire,
+                 ServerMessageType.Offer):
+        @server_messenger.once(type)
+        def _handler():
+            pass
+    if not server_messenger.emit(message.type):
+        payload = message.payload
+        if not payload:
+            return
+        connection = peer.getConnection(message.src,
+                                        payload['connectionId'])
+        if connection:
+            await connection.handleMessage(message)
+
+
+async def run(label, decode, dispatch, peer):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for frame in FRAMES:
+            await dispatch(peer, decode(frame))
+    elapsed = time.perf_counter() - start
+    rate = ROUNDS * len(FRAMES) / elapsed
+    print(f'{label:>8}: {rate:12,.0f} messages/s')
+    return rate
+
+
+async def main():
+    peer = Peer(peer_options=PeerOptions())
+    try:
+        peer._addConnection('remote-peer', FakeConnection())
+        before = await run('before', LegacyServerMessage.from_json,
+                           legacy_dispatch, peer)
+        after = await run('after', ServerMessage.from_json,
+                          Peer._handleMessage, peer)
+        print(f' speedup: {after / before:12.1f}x')
+    finally:
+        await peer.http_api.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
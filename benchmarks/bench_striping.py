@@ -0,0 +1,124 @@
+"""Benchmark large message transfer over one and several data channels.
+
+Sends large binary messages over a loopback connection, in chunks on
+the connection's own channel or striped across auxiliary channels,
+while a small control message goes out every 10 ms. Reports the
+transfer rate and the 99th percentile of the control message latency,
+without and with simulated loss of outgoing SCTP packets.
+
+Run with: python benchmarks/bench_striping.py
+"""
+import asyncio
+import os
+import random
+import statistics
+import time
+
+from aiortc import RTCConfiguration, RTCPeerConnection
+
+from peerjs.dataconnection import DataConnection
+from peerjs.enums import ConnectionEventType
+from peerjs.stripedchannels import stripeLabel
+
+CONFIG = RTCConfiguration(iceServers=[])
+MESSAGE = os.urandom(4 * 1024 * 1024)
+COUNT = 8
+CONTROL_INTERVAL = 0.01
+
+
+def simulateLoss(peerConnection: RTCPeerConnection, rate: float) -> None:
+    """Drop a share of the SCTP packets a connection sends."""
+    transport = peerConnection.sctp.transport
+    send = transport._send_data
+
+    async def lossy_send(data):
+        if random.random() >= rate:
+            await send(data)
+
+    transport._send_data = lossy_send
+
+
+async def connection_pair(stripes: int, loss: float):
+    """Return an open sending and receiving DataConnection."""
+    local = RTCPeerConnection(CONFIG)
+    remote = RTCPeerConnection(CONFIG)
+    sender = DataConnection('remote', None, stripes=stripes)
+    receiver = DataConnection('local', None, stripes=stripes)
+    channel = local.createDataChannel(sender.label)
+    for index in range(stripes):
+        sender.addStripe(
+            local.createDataChannel(stripeLabel(sender.label, index)))
+    receiver.label = sender.label
+    accepted = asyncio.Event()
+
+    @remote.on('datachannel')
+    async def on_datachannel(remoteChannel):
+        if receiver.isStripe(remoteChannel.label):
+            receiver.addStripe(remoteChannel)
+        else:
+            await receiver.initialize(remoteChannel)
+            receiver._open = True
+            accepted.set()
+
+    await local.setLocalDescription(await local.createOffer())
+    await remote.setRemoteDescription(local.localDescription)
+    await remote.setLocalDescription(await remote.createAnswer())
+    await local.setRemoteDescription(remote.localDescription)
+    opened = asyncio.Event()
+    sender.on(ConnectionEventType.Open, opened.set)
+    await sender.initialize(channel)
+    await opened.wait()
+    await accepted.wait()
+    while stripes and not sender._stripes.ready:
+        await asyncio.sleep(0.01)
+    simulateLoss(local, loss)
+    return local, remote, sender, receiver
+
+
+async def run(stripes: int, loss: float):
+    local, remote, sender, receiver = \
+        await connection_pair(stripes, loss)
+    latencies = []
+    received = []
+    done = asyncio.Event()
+
+    @receiver.on(ConnectionEventType.Data)
+    def on_data(message):
+        if isinstance(message, dict):
+            latencies.append(time.perf_counter() - message['t'])
+            return
+        received.append(len(message))
+        if len(received) == COUNT:
+            done.set()
+
+    async def control():
+        while not done.is_set():
+            await sender.send({'t': time.perf_counter()})
+            await asyncio.sleep(CONTROL_INTERVAL)
+
+    started = time.perf_counter()
+    controller = asyncio.create_task(control())
+    for _ in range(COUNT):
+        await sender.send(MESSAGE)
+    await done.wait()
+    elapsed = time.perf_counter() - started
+    await controller
+    await local.close()
+    await remote.close()
+    p99 = statistics.quantiles(latencies, n=100)[98] if \
+        len(latencies) > 1 else float('nan')
+    return COUNT * len(MESSAGE) / elapsed / 1024 / 1024, p99 * 1000
+
+
+async def main():
+    for loss in (0, 0.01):
+        print(f'{loss:.0%} packet loss')
+        for stripes in (0, 2, 4):
+            name = 'one channel' if not stripes else f'{stripes} stripes'
+            rate, p99 = await run(stripes, loss)
+            print(f'{name:>12}: {rate:6.1f} MiB/s, '
+                  f'control p99 latency {p99:8.1f} ms')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -24,11 +24,19 @@ class HttpMethod:
 class API:
     """Client side methods for commonly used REST APIs."""
 
-    def __init__(self, options: Any = None):
-        """Create API instance."""
+    def __init__(self,
+                 options: Any = None,
+                 http_session: aiohttp.ClientSession = None):
+        """Create API instance.
+
+        An http_session can be shared with other API instances
+        to pool connections and DNS lookups. It is then left open
+        by close() and owned by the caller.
+        """
         self._options = options
         log.debug('API options: %s', options)
-        self._http_session = aiohttp.ClientSession()
+        self._owns_http_session = http_session is None
+        self._http_session = http_session or aiohttp.ClientSession()
 
     def _buildUrl(self, rest_method: str = None) -> str:
         log.debug('port %s', self._options.port)
@@ -95,4 +103,5 @@ class API:
 
     async def close(self):
         """Close any open http pooling resources."""
-        await self._http_session.close()
+        if self._owns_http_session:
+            await self._http_session.close()
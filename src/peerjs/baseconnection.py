@@ -38,6 +38,9 @@ class BaseConnection(AsyncIOEventEmitter):
         self.connectionId: str = None
         self.peerConnection: RTCPeerConnection = None
 
+    def housekeep(self) -> None:
+        """Run periodic maintenance."""
+
     @abstractmethod
     def close(self) -> None:
         """Close this connection."""
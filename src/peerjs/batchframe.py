@@ -0,0 +1,56 @@
+"""Frame several small data channel messages as one.
+
+A batch frame is the 4 byte magic 00 50 4a 42 ("\\0PJB") followed by
+each message as a 32 bit big endian length and the message bytes.
+JSON messages are carried as UTF-8 text, Binary ones as BinaryPack.
+
+Batches are sent as binary messages, which a JSON connection never
+otherwise receives. A single BinaryPack value never starts with a 00
+byte and goes on, as 00 alone encodes the integer 0.
+Raw connections pass arbitrary bytes and cannot carry batches.
+"""
+import struct
+from typing import List
+
+BATCH_MAGIC = b'\x00PJB'
+# Bytes each message adds to a batch frame besides its own.
+BATCH_OVERHEAD = 4
+
+_LENGTH = struct.Struct('>I')
+
+
+def isBatch(data) -> bool:
+    """Return True if a received message is a batch frame."""
+    return isinstance(data, (bytes, bytearray, memoryview)) and \
+        len(data) >= len(BATCH_MAGIC) and \
+        data[:len(BATCH_MAGIC)] == BATCH_MAGIC
+
+
+def packBatch(messages: List[bytes]) -> bytes:
+    """Frame encoded messages as one batch."""
+    out = bytearray(BATCH_MAGIC)
+    for message in messages:
+        out += _LENGTH.pack(len(message))
+        out += message
+    return bytes(out)
+
+
+def splitBatch(data) -> List[memoryview]:
+    """Return the messages of a batch frame, without copying them.
+
+    Raise ValueError if the frame is truncated.
+    """
+    buf = data if isinstance(data, memoryview) else memoryview(data)
+    pos = len(BATCH_MAGIC)
+    end = len(buf)
+    messages = []
+    while pos < end:
+        if pos + _LENGTH.size > end:
+            raise ValueError('Truncated batch frame')
+        size, = _LENGTH.unpack_from(buf, pos)
+        pos += _LENGTH.size
+        if pos + size > end:
+            raise ValueError('Truncated batch frame')
+        messages.append(buf[pos:pos + size])
+        pos += size
+    return messages
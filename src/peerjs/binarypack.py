@@ -0,0 +1,227 @@
+"""BinaryPack serialization, wire compatible with PeerJS js-binarypack.
+
+BinaryPack is a MessagePack variant. It differs in that strings
+and raw bytes have their own type codes:
+0xb0-0xbf, 0xd8 and 0xd9 for strings,
+0xa0-0xaf, 0xda and 0xdb for raw bytes.
+All multi byte values are big endian.
+"""
+import struct
+from typing import Any
+
+_UINT8 = struct.Struct('>B')
+_UINT16 = struct.Struct('>H')
+_UINT32 = struct.Struct('>I')
+_UINT64 = struct.Struct('>Q')
+_INT8 = struct.Struct('>b')
+_INT16 = struct.Struct('>h')
+_INT32 = struct.Struct('>i')
+_INT64 = struct.Struct('>q')
+_FLOAT = struct.Struct('>f')
+_DOUBLE = struct.Struct('>d')
+
+# Type code followed by a fixed size value.
+_TYPE_UINT8 = struct.Struct('>BB')
+_TYPE_UINT16 = struct.Struct('>BH')
+_TYPE_UINT32 = struct.Struct('>BI')
+_TYPE_UINT64 = struct.Struct('>BQ')
+_TYPE_INT8 = struct.Struct('>Bb')
+_TYPE_INT16 = struct.Struct('>Bh')
+_TYPE_INT32 = struct.Struct('>Bi')
+_TYPE_INT64 = struct.Struct('>Bq')
+_TYPE_DOUBLE = struct.Struct('>Bd')
+
+
+def _packLength(out: bytearray, length: int, fix: int, code16: int) -> None:
+    """Write the type code and length of a sized value.
+
+    fix is the type code with an inline length up to 15,
+    code16 the one with a 16 bit length.
+    The 32 bit length code always follows the 16 bit one.
+    """
+    if length <= 0x0f:
+        out.append(fix + length)
+    elif length <= 0xffff:
+        out += _TYPE_UINT16.pack(code16, length)
+    elif length <= 0xffffffff:
+        out += _TYPE_UINT32.pack(code16 + 1, length)
+    else:
+        raise ValueError(f'Value too large to pack: {length} items')
+
+
+def _packInteger(out: bytearray, value: int) -> None:
+    """Write an integer in the smallest encoding js-binarypack would."""
+    if -0x20 <= value <= 0x7f:
+        out.append(value & 0xff)
+    elif 0 <= value <= 0xff:
+        out += _TYPE_UINT8.pack(0xcc, value)
+    elif -0x80 <= value <= 0x7f:
+        out += _TYPE_INT8.pack(0xd0, value)
+    elif 0 <= value <= 0xffff:
+        out += _TYPE_UINT16.pack(0xcd, value)
+    elif -0x8000 <= value <= 0x7fff:
+        out += _TYPE_INT16.pack(0xd1, value)
+    elif 0 <= value <= 0xffffffff:
+        out += _TYPE_UINT32.pack(0xce, value)
+    elif -0x80000000 <= value <= 0x7fffffff:
+        out += _TYPE_INT32.pack(0xd2, value)
+    elif -0x8000000000000000 <= value <= 0x7fffffffffffffff:
+        out += _TYPE_INT64.pack(0xd3, value)
+    elif 0 <= value <= 0xffffffffffffffff:
+        out += _TYPE_UINT64.pack(0xcf, value)
+    else:
+        raise ValueError(f'Integer out of 64 bit range: {value}')
+
+
+def _pack(out: bytearray, value: Any) -> None:
+    """Append the encoding of value to out."""
+    # Most frequent types first.
+    cls = type(value)
+    if cls is str:
+        data = value.encode('utf-8')
+        _packLength(out, len(data), 0xb0, 0xd8)
+        out += data
+    elif cls is int:
+        _packInteger(out, value)
+    elif cls is float:
+        out += _TYPE_DOUBLE.pack(0xcb, value)
+    elif cls is dict:
+        _packLength(out, len(value), 0x80, 0xde)
+        for key, item in value.items():
+            _pack(out, key)
+            _pack(out, item)
+    elif cls is list or cls is tuple:
+        _packLength(out, len(value), 0x90, 0xdc)
+        for item in value:
+            _pack(out, item)
+    elif value is None:
+        out.append(0xc0)
+    elif cls is bool:
+        out.append(0xc3 if value else 0xc2)
+    elif cls is bytes or cls is bytearray or cls is memoryview:
+        _packLength(out, len(value) if cls is not memoryview
+                    else value.nbytes, 0xa0, 0xda)
+        out += value
+    # Subclasses, e.g. enums based on str or int.
+    elif isinstance(value, str):
+        _pack(out, str(value))
+    elif isinstance(value, bool):
+        _pack(out, bool(value))
+    elif isinstance(value, int):
+        _pack(out, int(value))
+    elif isinstance(value, float):
+        _pack(out, float(value))
+    elif isinstance(value, dict):
+        _pack(out, dict(value))
+    elif isinstance(value, (list, tuple)):
+        _pack(out, list(value))
+    elif isinstance(value, (bytes, bytearray)):
+        _pack(out, bytes(value))
+    else:
+        raise TypeError(f'Cannot pack type {cls.__name__}')
+
+
+def pack(value: Any) -> bytes:
+    """Serialize value to BinaryPack bytes."""
+    out = bytearray()
+    _pack(out, value)
+    return bytes(out)
+
+
+def _unpack(buf: memoryview, pos: int):
+    """Decode the value at pos and return it with the next position."""
+    code = buf[pos]
+    pos += 1
+    if code < 0x80:
+        return code, pos
+    if code >= 0xe0:
+        return code - 0x100, pos
+    if code < 0xc0:
+        size = code & 0x0f
+        kind = code & 0xf0
+    elif code >= 0xd8:
+        if code & 1:
+            size, = _UINT32.unpack_from(buf, pos)
+            pos += 4
+        else:
+            size, = _UINT16.unpack_from(buf, pos)
+            pos += 2
+        kind = _SIZED_KINDS[code]
+    elif code == 0xcb:
+        return _DOUBLE.unpack_from(buf, pos)[0], pos + 8
+    elif 0xcc <= code <= 0xd3:
+        fmt = _INTEGERS[code - 0xcc]
+        return fmt.unpack_from(buf, pos)[0], pos + fmt.size
+    elif code == 0xc2:
+        return False, pos
+    elif code == 0xc3:
+        return True, pos
+    elif code == 0xca:
+        return _FLOAT.unpack_from(buf, pos)[0], pos + 4
+    else:
+        # 0xc0 is null, 0xc1 and 0xd4-0xd7 are undefined in js-binarypack
+        return None, pos
+    if kind == 0xb0:
+        end = pos + size
+        if end > len(buf):
+            raise ValueError('Truncated BinaryPack data')
+        return str(buf[pos:end], 'utf-8'), end
+    if kind == 0x80:
+        result = {}
+        for _ in range(size):
+            code = buf[pos]
+            if 0xb0 <= code <= 0xbf:
+                # inline the common short string key
+                end = pos + 1 + (code & 0x0f)
+                if end > len(buf):
+                    raise ValueError('Truncated BinaryPack data')
+                key = str(buf[pos + 1:end], 'utf-8')
+                pos = end
+            else:
+                key, pos = _unpack(buf, pos)
+            result[key], pos = _unpack(buf, pos)
+        return result, pos
+    if kind == 0x90:
+        # every item takes a byte at least
+        if size > len(buf) - pos:
+            raise ValueError('Truncated BinaryPack data')
+        result = [None] * size
+        for i in range(size):
+            result[i], pos = _unpack(buf, pos)
+        return result, pos
+    end = pos + size
+    if end > len(buf):
+        raise ValueError('Truncated BinaryPack data')
+    return bytes(buf[pos:end]), end
+
+
+_INTEGERS = (_UINT8, _UINT16, _UINT32, _UINT64,
+             _INT8, _INT16, _INT32, _INT64)
+
+# Kind of value for type codes with a 16 or 32 bit size.
+_SIZED_KINDS = {
+    0xd8: 0xb0, 0xd9: 0xb0,  # string
+    0xda: 0xa0, 0xdb: 0xa0,  # raw
+    0xdc: 0x90, 0xdd: 0x90,  # array
+    0xde: 0x80, 0xdf: 0x80,  # map
+}
+
+
+def unpack(data) -> Any:
+    """Deserialize one value from BinaryPack bytes or a memoryview.
+
+    Strings are decoded straight from the buffer. Raw values are
+    copied out as bytes, so they stay valid after the buffer is reused.
+    Raise ValueError for any data that does not unpack.
+    """
+    buf = data if isinstance(data, memoryview) else memoryview(data)
+    try:
+        value, _ = _unpack(buf, 0)
+    except (IndexError, struct.error):
+        raise ValueError('Truncated BinaryPack data')
+    except RecursionError:
+        raise ValueError('BinaryPack data nested too deeply')
+    except TypeError as err:
+        # e.g. a list or map as a map key
+        raise ValueError(f'Invalid BinaryPack data: {err}')
+    return value
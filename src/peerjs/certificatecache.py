@@ -0,0 +1,146 @@
+"""Reuse one DTLS certificate across peer connections."""
+import datetime
+import logging
+import os
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any
+
+from aiortc import RTCCertificate, RTCPeerConnection
+from aiortc import rtcpeerconnection
+from cryptography import x509
+from cryptography.hazmat.primitives import serialization
+
+log = logging.getLogger(__name__)
+
+# Rotate ahead of the certificate's own expiry by at least this much.
+_EXPIRY_MARGIN = datetime.timedelta(days=1)
+
+
+class _SharedCertificate(RTCCertificate):
+    """Certificate that computes its fingerprints once.
+
+    Every offer and answer lists them, and a shared certificate
+    would otherwise digest the same bytes for each.
+    """
+
+    def getFingerprints(self):
+        """Return certificate fingerprints."""
+        fingerprints = getattr(self, '_fingerprints', None)
+        if fingerprints is None:
+            fingerprints = self._fingerprints = super().getFingerprints()
+        return fingerprints
+
+
+@dataclass
+class CertificateCacheStats:
+    """DTLS certificate cache metrics."""
+
+    # certificates generated, including rotations
+    generated: int = 0
+    # certificates loaded from disk
+    loaded: int = 0
+    rotations: int = 0
+    # peer connections built with a cached certificate
+    reused: int = 0
+
+
+class CertificateCache:
+    """Hand out one DTLS certificate to many peer connections.
+
+    aiortc generates a new key pair and certificate for every
+    RTCPeerConnection. The cache generates one and reuses it
+    until it is lifetime seconds old. With a path, the certificate
+    and its private key are kept in a PEM file, so the first connection
+    after a restart does not generate one either.
+    """
+
+    def __init__(self, lifetime: float = 24 * 3600, path: str = None):
+        """Create certificate cache."""
+        self._lifetime = lifetime
+        self._path = path
+        self._certificate: RTCCertificate = None
+        # time.time() when the current certificate was generated
+        self._created: float = None
+        self._stats = CertificateCacheStats()
+
+    @property
+    def stats(self) -> CertificateCacheStats:
+        """Return cache metrics."""
+        return self._stats
+
+    def _stale(self, now: float) -> bool:
+        if now - self._created >= self._lifetime:
+            return True
+        expires = self._certificate.expires
+        return expires - _EXPIRY_MARGIN <= \
+            datetime.datetime.fromtimestamp(now, tz=datetime.timezone.utc)
+
+    def certificate(self, now: float = None) -> RTCCertificate:
+        """Return the current certificate, rotating it when due."""
+        now = now or time.time()
+        if self._certificate is None and self._path:
+            self._load()
+        if self._certificate is not None and not self._stale(now):
+            return self._certificate
+        if self._certificate is not None:
+            self._stats.rotations += 1
+            log.debug('Rotating DTLS certificate.')
+        self._certificate = _SharedCertificate.generateCertificate()
+        self._created = now
+        self._stats.generated += 1
+        if self._path:
+            self._save()
+        return self._certificate
+
+    def createPeerConnection(self, config: Any = None) -> RTCPeerConnection:
+        """Build an RTCPeerConnection using the cached certificate."""
+        certificate = self.certificate()
+        # RTCPeerConnection has no parameter for certificates and generates
+        # one in its constructor. Hand it ours for the duration of the call.
+        generator = rtcpeerconnection.RTCCertificate
+        rtcpeerconnection.RTCCertificate = SimpleNamespace(
+            generateCertificate=lambda: certificate)
+        try:
+            peerConnection = RTCPeerConnection(config)
+        finally:
+            rtcpeerconnection.RTCCertificate = generator
+        self._stats.reused += 1
+        return peerConnection
+
+    def _load(self) -> None:
+        """Load certificate and key from the PEM file if present."""
+        try:
+            with open(self._path, 'rb') as f:
+                data = f.read()
+            key = serialization.load_pem_private_key(data, password=None)
+            cert = x509.load_pem_x509_certificate(data)
+            created = os.path.getmtime(self._path)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as err:
+            log.warning('Ignoring unreadable DTLS certificate file %s: %r',
+                        self._path, err)
+            return
+        self._certificate = _SharedCertificate(key=key, cert=cert)
+        self._created = created
+        self._stats.loaded += 1
+
+    def _save(self) -> None:
+        """Write certificate and key to the PEM file, readable by owner."""
+        certificate = self._certificate
+        data = certificate._key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()) + \
+            certificate._cert.public_bytes(serialization.Encoding.PEM)
+        tmp = f'{self._path}.tmp'
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, self._path)
+        except OSError as err:
+            log.warning('Could not save DTLS certificate to %s: %r',
+                        self._path, err)
@@ -0,0 +1,195 @@
+"""Reassemble messages sent in PeerJS __peerData chunks."""
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from .util import util
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class ReassemblyStats:
+    """Chunked transfer metrics."""
+
+    chunks: int = 0
+    completed: int = 0
+    # incomplete transfers dropped after the timeout
+    expired: int = 0
+    # incomplete transfers dropped to stay within limits
+    # or because their chunks were inconsistent
+    dropped: int = 0
+    # transfers in progress
+    pending: int = 0
+    # bytes held by transfers in progress
+    bytes: int = 0
+
+
+class _Transfer:
+    """State of one chunked message."""
+
+    __slots__ = ('total', 'count', 'received', 'chunkSize',
+                 'buffer', 'last', 'started')
+
+    def __init__(self, total: int, started: float):
+        self.total = total
+        self.count = 0
+        self.received = bytearray(total)
+        # size of every chunk but the last, known from the first one seen
+        self.chunkSize: int = None
+        self.buffer: bytearray = None
+        # the last chunk, held until the chunk size is known
+        self.last: bytes = None
+        self.started = started
+
+    @property
+    def allocated(self) -> int:
+        return len(self.received) + (
+            len(self.buffer) if self.buffer is not None
+            else len(self.last or b''))
+
+
+class ChunkReassembler:
+    """Put chunked messages back together.
+
+    The sender splits a packed message in chunks of equal size,
+    except for the last one. Each transfer is written into a single
+    bytearray allocated from the chunk size and count, in any order
+    of arrival. Incomplete transfers are dropped after timeout seconds
+    or when limits on their number or size are reached. A transfer
+    whose chunk count could only fit in maxBytes with chunks smaller
+    than the PeerJS chunk size is refused before anything is allocated.
+    """
+
+    def __init__(self,
+                 timeout: float = 30.0,
+                 maxTransfers: int = 16,
+                 maxBytes: int = 64 * 1024 * 1024):
+        """Create chunk reassembler."""
+        self._timeout = timeout
+        self._maxTransfers = maxTransfers
+        self._maxBytes = maxBytes
+        # transfer id => transfer, in order of the first chunk
+        self._transfers: Dict[int, _Transfer] = {}
+        self._stats = ReassemblyStats()
+
+    @property
+    def stats(self) -> ReassemblyStats:
+        """Return transfer metrics."""
+        self._stats.pending = len(self._transfers)
+        self._stats.bytes = sum(t.allocated for t in self._transfers.values())
+        return self._stats
+
+    def __contains__(self, id: int) -> bool:
+        """Return True if the transfer is in progress."""
+        return id in self._transfers
+
+    def add(self, id: int, n: int, total: int, data) -> Optional[bytearray]:
+        """Add chunk n of total for a transfer.
+
+        Return the whole message once its last missing chunk arrived.
+        """
+        self._stats.chunks += 1
+        now = time.monotonic()
+        self.expire(now)
+        if not (isinstance(total, int) and isinstance(n, int) and
+                0 <= n < total):
+            log.warning('Dropping malformed chunk %r of %r', n, total)
+            return None
+        if total == 1:
+            self._stats.completed += 1
+            return bytearray(data)
+        transfer = self._transfers.get(id)
+        if transfer is None:
+            if (total - 1) * util.chunkedMTU >= self._maxBytes:
+                self._stats.dropped += 1
+                log.warning('Dropped chunked transfer %s of %d chunks. '
+                            'Chunked message too large.', id, total)
+                return None
+            while len(self._transfers) >= self._maxTransfers:
+                self._drop(next(iter(self._transfers)),
+                           'Too many chunked transfers.')
+            transfer = self._transfers[id] = _Transfer(total, now)
+        elif transfer.total != total:
+            self._drop(id, 'Chunk count changed.')
+            return None
+        if transfer.received[n]:
+            return None
+        size = len(data)
+        if n == total - 1:
+            if transfer.chunkSize is not None and size > transfer.chunkSize:
+                self._drop(id, 'Last chunk larger than the others.')
+                return None
+            transfer.last = data
+        elif transfer.chunkSize is None:
+            if not self._allocate(id, transfer, size):
+                return None
+        elif size != transfer.chunkSize:
+            self._drop(id, 'Chunks of unequal size.')
+            return None
+        if n < total - 1:
+            offset = n * transfer.chunkSize
+            transfer.buffer[offset:offset + size] = data
+        transfer.received[n] = 1
+        transfer.count += 1
+        if transfer.count < total:
+            return None
+        del self._transfers[id]
+        self._stats.completed += 1
+        return self._finish(transfer)
+
+    def _allocate(self, id: int, transfer: _Transfer, chunkSize: int) -> bool:
+        """Allocate the buffer of a transfer once the chunk size is known."""
+        size = chunkSize * transfer.total
+        if size > self._maxBytes:
+            self._drop(id, f'Chunked message of {size} bytes too large.')
+            return False
+        while self._transfers and next(iter(self._transfers)) != id and \
+                self.stats.bytes + size > self._maxBytes:
+            self._drop(next(iter(self._transfers)),
+                       'Chunked transfers too large.')
+        if transfer.last is not None and len(transfer.last) > chunkSize:
+            self._drop(id, 'Last chunk larger than the others.')
+            return False
+        transfer.chunkSize = chunkSize
+        transfer.buffer = bytearray(size)
+        return True
+
+    @staticmethod
+    def _finish(transfer: _Transfer) -> bytearray:
+        """Place the last chunk and trim the buffer to the message size."""
+        offset = (transfer.total - 1) * transfer.chunkSize
+        end = offset + len(transfer.last)
+        buffer = transfer.buffer
+        buffer[offset:end] = transfer.last
+        del buffer[end:]
+        return buffer
+
+    def _drop(self, id: int, reason: str) -> None:
+        transfer = self._transfers.pop(id)
+        self._stats.dropped += 1
+        log.warning('Dropped chunked transfer %s with %d of %d chunks. %s',
+                    id, transfer.count, transfer.total, reason)
+
+    def expire(self, now: float = None) -> int:
+        """Drop transfers older than the timeout.
+
+        Return the number of expired transfers.
+        """
+        deadline = (now or time.monotonic()) - self._timeout
+        expired = 0
+        while self._transfers:
+            id, transfer = next(iter(self._transfers.items()))
+            if transfer.started >= deadline:
+                break
+            del self._transfers[id]
+            expired += 1
+            log.warning('Chunked transfer %s timed out with %d of %d chunks',
+                        id, transfer.count, transfer.total)
+        self._stats.expired += expired
+        return expired
+
+    def clear(self) -> None:
+        """Forget all transfers in progress."""
+        self._transfers.clear()
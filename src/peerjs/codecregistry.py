@@ -0,0 +1,164 @@
+"""Codecs serializing data channel messages, by serialization name."""
+import json
+import logging
+from typing import Any, Dict
+
+from . import binarypack
+from .enums import SerializationType
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+log = logging.getLogger(__name__)
+
+
+class Codec:
+    """Serialization of data channel messages.
+
+    Subclasses set name and implement encode and decode.
+    decode raises ValueError for messages it cannot decode.
+    """
+
+    name: str = None
+    # encode returns str, sent as a text message
+    text: bool = False
+    # Messages may be batched and compressed. Only for codecs where
+    # no encoded message starts with a 00 byte and goes on.
+    framed: bool = False
+    # large messages are sent in PeerJS __peerData chunks
+    chunked: bool = False
+
+    def encode(self, data: Any) -> Any:
+        """Return the message to send for data."""
+        raise NotImplementedError
+
+    def decode(self, message: Any) -> Any:
+        """Return the data of a received message."""
+        raise NotImplementedError
+
+
+class RawCodec(Codec):
+    """Pass messages without any modifications."""
+
+    name = SerializationType.Raw
+
+    def encode(self, data: Any) -> Any:
+        """Return data as is."""
+        return data
+
+    def decode(self, message: Any) -> Any:
+        """Return message as is."""
+        return message
+
+
+class JsonCodec(Codec):
+    """JSON text messages, with orjson when it is installed.
+
+    orjson handles what stdlib json does, except that it writes NaN
+    and infinities as null, like JSON.stringify does. Data orjson
+    refuses, such as integers over 64 bits, is written by stdlib json,
+    and messages it cannot read, such as NaN, are read by it.
+    """
+
+    name = SerializationType.JSON
+    text = True
+    framed = True
+
+    def __init__(self, fast: bool = True):
+        """Create JSON codec."""
+        stdlibEncode = json.JSONEncoder().encode
+        stdlibDecode = json.JSONDecoder().decode
+
+        def decodeStdlib(message):
+            return stdlibDecode(message if isinstance(message, str)
+                                else str(message, 'utf-8'))
+
+        if fast and orjson is not None:
+            dumps, loads = orjson.dumps, orjson.loads
+            option = orjson.OPT_NON_STR_KEYS
+
+            def encode(data):
+                try:
+                    return dumps(data, option=option).decode('utf-8')
+                except TypeError:
+                    return stdlibEncode(data)
+
+            def decode(message):
+                try:
+                    return loads(message)
+                except ValueError:
+                    return decodeStdlib(message)
+
+            self.encode, self.decode = encode, decode
+            self.engine = 'orjson'
+        else:
+            self.encode, self.decode = stdlibEncode, decodeStdlib
+            self.engine = 'json'
+
+
+class BinaryPackCodec(Codec):
+    """BinaryPack messages, as the PeerJS JavaScript client packs them."""
+
+    framed = True
+    chunked = True
+
+    def __init__(self, name: str = SerializationType.Binary):
+        """Create BinaryPack codec."""
+        self.name = name
+
+    def encode(self, data: Any) -> bytes:
+        """Pack data."""
+        return binarypack.pack(data)
+
+    def decode(self, message: Any) -> Any:
+        """Unpack a binary message.
+
+        String fallback for browsers without binary support
+        is passed on as is.
+        """
+        if isinstance(message, (bytes, bytearray, memoryview)):
+            return binarypack.unpack(message)
+        return message
+
+
+class CodecRegistry:
+    """Codecs by serialization name."""
+
+    def __init__(self):
+        """Create registry with the PeerJS serializations."""
+        self._codecs: Dict[str, Codec] = {}
+        self.register(BinaryPackCodec(SerializationType.Binary))
+        self.register(BinaryPackCodec(SerializationType.BinaryUTF8))
+        self.register(JsonCodec())
+        self.register(RawCodec())
+
+    def register(self, codec: Codec) -> None:
+        """Add a codec, replacing any with the same name."""
+        self._codecs[codec.name] = codec
+
+    def get(self, name: str) -> Codec:
+        """Return the codec of a serialization, raw if unknown."""
+        codec = self._codecs.get(name)
+        if codec is None:
+            log.warning('Unknown serialization %r, passing data as is.', name)
+            codec = self._codecs[SerializationType.Raw]
+        return codec
+
+    def __contains__(self, name: str) -> bool:
+        """Return True if a codec is registered for name."""
+        return name in self._codecs
+
+
+codecRegistry = CodecRegistry()
+
+
+def encodeWith(name: str, data: Any) -> Any:
+    """Encode data with a registered codec, e.g. in a worker process."""
+    return codecRegistry.get(name).encode(data)
+
+
+def decodeWith(name: str, message: Any) -> Any:
+    """Decode a message with a registered codec."""
+    return codecRegistry.get(name).decode(message)
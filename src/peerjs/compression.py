@@ -0,0 +1,125 @@
+"""Per-message compression of data channel messages.
+
+A compressed message is the 4 byte magic 00 50 4a 5a ("\\0PJZ")
+followed by the serialized message as a zlib stream. As with batch
+frames, a JSON connection never otherwise receives binary messages,
+and a single BinaryPack value never starts with a 00 byte and goes on.
+"""
+import logging
+import time
+import zlib
+from dataclasses import dataclass
+
+log = logging.getLogger(__name__)
+
+COMPRESSED_MAGIC = b'\x00PJZ'
+
+# Content types which are compressed already, or nearly random.
+COMPRESSED_TYPES = (
+    'image/', 'video/', 'audio/', 'font/woff',
+    'application/zip', 'application/gzip', 'application/x-gzip',
+    'application/x-bzip2', 'application/x-xz', 'application/zstd',
+    'application/x-7z-compressed', 'application/x-rar-compressed',
+    'application/pdf', 'application/octet-stream',
+)
+
+
+def isCompressedType(contentType: str) -> bool:
+    """Return True if content of this type is not worth compressing."""
+    if not contentType:
+        return False
+    contentType = contentType.split(';', 1)[0].strip().lower()
+    if contentType == 'image/svg+xml':
+        return False
+    return contentType.startswith(COMPRESSED_TYPES)
+
+
+def isCompressed(data) -> bool:
+    """Return True if a received message is compressed."""
+    return isinstance(data, (bytes, bytearray, memoryview)) and \
+        len(data) >= len(COMPRESSED_MAGIC) and \
+        data[:len(COMPRESSED_MAGIC)] == COMPRESSED_MAGIC
+
+
+@dataclass
+class CompressionStats:
+    """Compression metrics of a connection."""
+
+    compressed: int = 0
+    # messages sent as is, below the threshold or not getting smaller
+    skipped: int = 0
+    # size of compressed messages before and after compression
+    bytesIn: int = 0
+    bytesOut: int = 0
+    decompressed: int = 0
+    # CPU seconds spent
+    compressTime: float = 0.0
+    decompressTime: float = 0.0
+
+    @property
+    def ratio(self) -> float:
+        """Return compressed size as a share of the original size."""
+        return self.bytesOut / self.bytesIn if self.bytesIn else 1.0
+
+
+class Compressor:
+    """Compress outgoing and decompress incoming messages with zlib."""
+
+    # Algorithms in order of preference, as negotiated in the offer.
+    ALGORITHMS = ('deflate',)
+
+    def __init__(self,
+                 threshold: int = 1024,
+                 level: int = 6,
+                 maxSize: int = 64 * 1024 * 1024):
+        """Create compressor."""
+        self._threshold = threshold
+        self._level = level
+        # limit on decompressed size, against decompression bombs
+        self._maxSize = maxSize
+        self._stats = CompressionStats()
+
+    @property
+    def stats(self) -> CompressionStats:
+        """Return compression metrics."""
+        return self._stats
+
+    def compress(self, data: bytes) -> bytes:
+        """Return the compressed message, or data if not worth it."""
+        stats = self._stats
+        size = len(data)
+        if size < self._threshold:
+            stats.skipped += 1
+            return data
+        started = time.process_time()
+        compressed = COMPRESSED_MAGIC + zlib.compress(data, self._level)
+        stats.compressTime += time.process_time() - started
+        if len(compressed) >= size:
+            stats.skipped += 1
+            return data
+        stats.compressed += 1
+        stats.bytesIn += size
+        stats.bytesOut += len(compressed)
+        return compressed
+
+    def decompress(self, data) -> bytes:
+        """Return the original of a compressed message.
+
+        Raise ValueError if it is corrupt or too large.
+        """
+        started = time.process_time()
+        decompressor = zlib.decompressobj()
+        try:
+            result = decompressor.decompress(
+                memoryview(data)[len(COMPRESSED_MAGIC):], self._maxSize)
+        except zlib.error as err:
+            raise ValueError(f'Corrupt compressed message: {err}')
+        finally:
+            self._stats.decompressTime += time.process_time() - started
+        if decompressor.unconsumed_tail:
+            raise ValueError('Compressed message larger than '
+                             f'{self._maxSize} bytes')
+        if not decompressor.eof:
+            raise ValueError('Truncated compressed message')
+        self._stats.decompressed += 1
+        return result
@@ -0,0 +1,129 @@
+"""Registry of direct peer connections with constant time lookups."""
+import logging
+from typing import Dict, Iterator, List
+
+from .baseconnection import BaseConnection
+from .enums import ConnectionEventType, ConnectionState
+
+log = logging.getLogger(__name__)
+
+
+class ConnectionRegistry:
+    """Index connections by connection id, remote peer id and state.
+
+    Connection states follow the connections' own Open and Close events.
+    """
+
+    def __init__(self):
+        """Create empty registry."""
+        # connectionId => connection
+        self._byId: Dict[str, BaseConnection] = {}
+        # peerId => {connectionId => connection}
+        self._byPeer: Dict[str, Dict[str, BaseConnection]] = {}
+        # state => {connectionId => connection}
+        self._byState: Dict[ConnectionState, Dict[str, BaseConnection]] = \
+            {state: {} for state in ConnectionState}
+        # connectionId => state
+        self._states: Dict[str, ConnectionState] = {}
+        # connectionId => (peerId, on open listener, on close listener)
+        self._entries: Dict[str, tuple] = {}
+
+    def add(self, peerId: str, connection: BaseConnection) -> None:
+        """Register a connection to a remote peer."""
+        connectionId = connection.connectionId
+        if connectionId in self._byId:
+            self.remove(self._byId[connectionId])
+        self._byId[connectionId] = connection
+        self._byPeer.setdefault(peerId, {})[connectionId] = connection
+        self._setState(connectionId,
+                       ConnectionState.Open if connection.open
+                       else ConnectionState.Negotiating)
+
+        def on_open():
+            self._setState(connectionId, ConnectionState.Open)
+
+        def on_close():
+            self._setState(connectionId, ConnectionState.Closed)
+
+        connection.on(ConnectionEventType.Open, on_open)
+        connection.on(ConnectionEventType.Close, on_close)
+        self._entries[connectionId] = (peerId, on_open, on_close)
+
+    def remove(self, connection: BaseConnection) -> bool:
+        """Unregister a connection.
+
+        Return False if the connection was not registered.
+        """
+        connectionId = connection.connectionId
+        if self._byId.get(connectionId) is not connection:
+            return False
+        del self._byId[connectionId]
+        peerId, on_open, on_close = self._entries.pop(connectionId)
+        connections = self._byPeer[peerId]
+        del connections[connectionId]
+        if not connections:
+            del self._byPeer[peerId]
+        state = self._states.pop(connectionId)
+        del self._byState[state][connectionId]
+        connection.remove_listener(ConnectionEventType.Open, on_open)
+        connection.remove_listener(ConnectionEventType.Close, on_close)
+        return True
+
+    def _setState(self, connectionId: str, state: ConnectionState) -> None:
+        if connectionId not in self._byId:
+            return
+        previous = self._states.get(connectionId)
+        if previous is not None:
+            del self._byState[previous][connectionId]
+        self._states[connectionId] = state
+        self._byState[state][connectionId] = self._byId[connectionId]
+
+    def get(self, peerId: str, connectionId: str) -> BaseConnection:
+        """Return connection to a remote peer by id or None."""
+        connections = self._byPeer.get(peerId)
+        return connections.get(connectionId) if connections else None
+
+    def getById(self, connectionId: str) -> BaseConnection:
+        """Return connection by id or None."""
+        return self._byId.get(connectionId)
+
+    def forPeer(self, peerId: str) -> List[BaseConnection]:
+        """Return all connections to a remote peer."""
+        return list(self._byPeer.get(peerId, {}).values())
+
+    def removePeer(self, peerId: str) -> List[BaseConnection]:
+        """Unregister and return all connections to a remote peer."""
+        connections = self.forPeer(peerId)
+        for connection in connections:
+            self.remove(connection)
+        return connections
+
+    def peerIds(self) -> List[str]:
+        """Return ids of remote peers with registered connections."""
+        return list(self._byPeer)
+
+    def state(self, connection: BaseConnection) -> ConnectionState:
+        """Return state of a registered connection or None."""
+        return self._states.get(connection.connectionId)
+
+    def byState(self, state: ConnectionState) -> Iterator[BaseConnection]:
+        """Iterate over connections in a given state."""
+        return iter(list(self._byState[state].values()))
+
+    def count(self, state: ConnectionState = None) -> int:
+        """Return number of connections, optionally in a given state."""
+        if state is None:
+            return len(self._byId)
+        return len(self._byState[state])
+
+    def __len__(self) -> int:
+        """Return number of registered connections."""
+        return len(self._byId)
+
+    def __iter__(self) -> Iterator[BaseConnection]:
+        """Iterate over all registered connections."""
+        return iter(list(self._byId.values()))
+
+    def __contains__(self, connection: BaseConnection) -> bool:
+        """Return True if the connection is registered."""
+        return self._byId.get(connection.connectionId) is connection
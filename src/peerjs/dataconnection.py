@@ -1,21 +1,36 @@
 """Convenience wrapper around RTCDataChannel."""
 import asyncio
 # from .encodingqueue import EncodingQueue
-import json
 import logging
-from typing import Any
+from collections import deque
+from concurrent.futures import Executor
+from typing import Any, Dict, Optional
 
 from aiortc import RTCDataChannel
 
 from .baseconnection import BaseConnection
+from .batchframe import (
+    BATCH_MAGIC,
+    BATCH_OVERHEAD,
+    isBatch,
+    packBatch,
+    splitBatch,
+)
+from .chunkreassembler import ChunkReassembler, ReassemblyStats
+from .codecregistry import Codec, codecRegistry, decodeWith, encodeWith
+from .compression import CompressionStats, Compressor, isCompressed
 from .enums import (
     ConnectionEventType,
     ConnectionType,
+    InboxOverflowPolicy,
     SerializationType,
     ServerMessageType,
 )
+from .inbox import Inbox, InboxStats
 from .negotiator import Negotiator
+from .offload import Offloader, TimingHistogram, estimateSize, messageSize
 from .servermessage import ServerMessage
+from .stripedchannels import STRIPE_SEPARATOR, StripedChannels
 from .util import util
 
 log = logging.getLogger(__name__)
@@ -25,7 +40,10 @@ class DataConnection(BaseConnection):
     """Wrap a DataChannel between two Peers."""
 
     ID_PREFIX = "dc_"
+    # Data channel buffered amount above which messages queue locally.
     MAX_BUFFERED_AMOUNT = 8 * 1024 * 1024
+    # Buffered amount at which queued messages resume flowing.
+    BUFFERED_AMOUNT_LOW = 1024 * 1024
 
     @property
     def type(self):
@@ -38,8 +56,8 @@ class DataConnection(BaseConnection):
         return self._dc
 
     def bufferSize(self) -> int:
-        """Return current data buffer size."""
-        return self._bufferSize
+        """Return number of messages queued until the data channel drains."""
+        return len(self._buffer)
 
     def __init__(self,
                  peerId: str = None,
@@ -55,7 +73,23 @@ class DataConnection(BaseConnection):
             label: str = None,
             serialization: str = None,
             reliable: bool = None,
+            ordered: bool = None,
+            maxRetransmits: int = None,
+            maxPacketLifeTime: int = None,
             _payload: Any = None,
+            bufferHighWaterMark: int = DataConnection.MAX_BUFFERED_AMOUNT,
+            bufferLowWaterMark: int = DataConnection.BUFFERED_AMOUNT_LOW,
+            inboxSize: int = 1024,
+            inboxPolicy: InboxOverflowPolicy = InboxOverflowPolicy.Block,
+            backlogSize: int = None,
+            coalesceDelay: float = 0,
+            coalesceMaxBytes: int = None,
+            stripes: int = 0,
+            compression: Any = False,
+            compressionThreshold: int = 1024,
+            compressionLevel: int = 6,
+            offloadThreshold: int = 1024 * 1024,
+            offloadExecutor: Executor = None,
             **kwargs
               ):
             self.connectionId: str = \
@@ -64,26 +98,84 @@ class DataConnection(BaseConnection):
             self.label: str = label or self.connectionId
             self.serialization: SerializationType = \
                 serialization or SerializationType.Binary
+            # Resolved once, rather than for every message.
+            self._codec: Codec = codecRegistry.get(self.serialization)
             self.reliable: bool = reliable
+            # Unordered channels deliver messages as they arrive.
+            # Without either of the limits below, the channel is reliable.
+            self.ordered: bool = bool(reliable) if ordered is None \
+                else ordered
+            # Times a lost message is sent again before it is abandoned.
+            self.maxRetransmits: int = maxRetransmits
+            # Milliseconds a message is sent again before it is abandoned.
+            self.maxPacketLifeTime: int = maxPacketLifeTime
+            if maxRetransmits is not None and maxPacketLifeTime is not None:
+                raise ValueError('Cannot specify both maxPacketLifeTime '
+                                 'and maxRetransmits')
             self._payload = _payload
+            self._highWaterMark = bufferHighWaterMark
+            self._lowWaterMark = min(bufferLowWaterMark, bufferHighWaterMark)
+            self._inbox = Inbox(inboxSize, InboxOverflowPolicy(inboxPolicy))
+            # Messages held back by a full inbox with the Block policy,
+            # beyond which the newest are dropped.
+            self._backlogSize = 16 * inboxSize if backlogSize is None \
+                else backlogSize
+            # Seconds a small message may wait to share a batch frame.
+            # Raw messages are never batched.
+            self._coalesceDelay = coalesceDelay if self._codec.framed else 0
+            self._coalesceMaxBytes = coalesceMaxBytes or util.chunkedMTU
+            # Auxiliary channels for large messages. They carry
+            # BinaryPack chunks, so other serializations do without.
+            self.stripes: int = stripes if self._codec.chunked else 0
+            # Compression algorithms to offer, True for all supported,
+            # or on the answering side those the remote peer offered.
+            if compression is True:
+                compression = Compressor.ALGORITHMS
+            self.compressionOffer: list = list(compression or ()) \
+                if self._codec.framed else []
+            # Negotiated algorithm, None while messages go uncompressed.
+            self.compression: str = None
+            if _payload is not None:
+                self.compression = next(
+                    (algorithm for algorithm in self.compressionOffer
+                     if algorithm in Compressor.ALGORITHMS), None)
+            self._compressor = Compressor(compressionThreshold,
+                                          compressionLevel)
+            # Messages from offloadThreshold bytes on are serialized
+            # and compressed in an executor, 0 keeps them inline.
+            self._offloader = Offloader(offloadThreshold, offloadExecutor)
 
         log.debug('Applying DataConnection options:\n%r', options)
         _apply_options(**options)
         self.peerId = peerId
         self._negotiator: Negotiator = None
-        self.stringify = lambda data: json.dumps(data)
-        self.parse = lambda jsn: json.loads(jsn)
-        self._buffer = []
-        self._bufferSize = 0
-        self._buffering = False
-        self._chunkedData = {}
-        # {
-        #     [id: number]: {
-        #         data: Blob[],
-        #         count: number,
-        #         total: number
-        #         }
-        # }
+        # Messages waiting for the data channel buffer to drain, in order.
+        self._buffer = deque()
+        # Set whenever the buffer has been handed to the data channel.
+        self._drained = asyncio.Event()
+        self._drained.set()
+        # Received messages held back by a full inbox, in order,
+        # and the task moving them in as it empties.
+        self._backlog = deque()
+        self._backlogPump: asyncio.Task = None
+        # Set while messages are dropped as the backlog is full.
+        self._backlogOverflow = False
+        # Received messages waiting for a large one to be decoded
+        # in the background, in order, and the task decoding them.
+        self._decoding = deque()
+        self._decodeTask: asyncio.Task = None
+        self._encodeKey = f'{self._codec.name} encode'
+        self._decodeKey = f'{self._codec.name} decode'
+        # Encoded messages waiting to go out as one batch frame,
+        # their framed size and the timer sending them.
+        self._batch = []
+        self._batchFirst = None
+        self._batchBytes = len(BATCH_MAGIC)
+        self._batchTimer: asyncio.TimerHandle = None
+        self._batchFlush: asyncio.Future = None
+        # Messages arriving in __peerData chunks.
+        self._chunks = ChunkReassembler()
+        self._stripes = StripedChannels(self.stripes, self._handleDataMessage)
 
         self._dc: RTCDataChannel = None
         self._encodingQueue = None  # EncodingQueue()
@@ -116,6 +208,26 @@ class DataConnection(BaseConnection):
         self._dc = dc
         await self._configureDataChannel()
 
+    def dataChannelInit(self) -> dict:
+        """Return createDataChannel options for this connection."""
+        return {
+            'ordered': self.ordered,
+            'maxRetransmits': self.maxRetransmits,
+            'maxPacketLifeTime': self.maxPacketLifeTime,
+        }
+
+    def isStripe(self, label: str) -> bool:
+        """Return True if label names an auxiliary channel of this one."""
+        return self.stripes > 0 and \
+            label.startswith(self.label + STRIPE_SEPARATOR)
+
+    def addStripe(self, dc: RTCDataChannel) -> None:
+        """Add an auxiliary channel for large messages.
+
+        Called by the Negotiator, in order of the channel index.
+        """
+        self._stripes.add(dc)
+
     async def _configureDataChannel(self) -> None:
         if not util.supports.binaryBlob or util.supports.reliable:
             self.dataChannel.binaryType = "arraybuffer"
@@ -136,87 +248,234 @@ class DataConnection(BaseConnection):
             # so lets not rely on that
             await on_datachannel_open()
 
+        self.dataChannel.bufferedAmountLowThreshold = self._lowWaterMark
+
+        @self.dataChannel.on('bufferedamountlow')
+        async def on_datachannel_bufferedamountlow():
+            await self._flushBuffer()
+
+        # Synchronous, so no task is created per message.
         @self.dataChannel.on('message')
-        async def on_datachannel_message(msg):
-            log.debug(f'DC#${self.connectionId} received message')
-            await self._handleDataMessage(msg)
+        def on_datachannel_message(msg):
+            log.debug('DC#%s received message', self.connectionId)
+            try:
+                self._handleDataMessage(msg)
+            except Exception as err:
+                # Runs in the SCTP receive path, which must go on.
+                self._onMessageError(err)
 
         @self.dataChannel.on('close')
         async def on_datachannel_close():
             log.debug(f'DC#${self.connectionId} dc closed for: {self.peer}')
             await self.close()
 
-    async def _handleDataMessage(self, data) -> None:
+    def _handleDataMessage(self, data) -> None:
         """Handle a DataChannel message."""
         log.debug('\n Received data (type %s) from remote peer: \n%r',
                   type(data),
                   data)
-        log.debug('Serialization type: %s', self.serialization)
-        isBinarySerialization = \
-            self.serialization == SerializationType.Binary or \
-            self.serialization == SerializationType.BinaryUTF8
-        log.debug('isBinarySerialization: %r',
-                  isBinarySerialization)
-        deserializedData = data
-        # Peerjs JavaScript version uses a messagepack library
-        #   which is not ported to Python yet
-        if isBinarySerialization:
-            #     if datatype == Blob:
-            #         # Datatype should never be blob
-            #         ab = await util.blobToArrayBuffer(data)
-            #         unpackedData = util.unpack(ab)
-            #         self.emit(ConnectionEventType.Data, unpackedData)
-            #         return
-            if isinstance(data, bytes):
-                log.warning('Unpacking data...')
-                deserializedData = util.unpack(data)
-            #     elif datatype == String:
-            #         # String fallback for binary data for browsers
-            #         # that don't support binary yet
-            #         ab = util.binaryStringToArrayBuffer(data)
-            #         deserializedData = util.unpack(ab)
-        if self.serialization == SerializationType.Raw:
-            # no special manipulation of deserialized data
-            pass
-        elif self.serialization == SerializationType.JSON:
-            deserializedData = self.parse(data)
-
-        # log.debug('\n Deserialized data (type %s): \n%r',
-        #           type(deserializedData),
-        #           deserializedData)
-        #
-        # if isinstance(deserializedData, str):
-        #     log.warning('\n Deserialized string %s',
-        #                 deserializedData)
+        codec = self._codec
+        if codec.framed and isBatch(data):
+            self._handleBatch(data)
+            return
+        if self._decodeTask is not None or \
+                (codec.name != SerializationType.Raw and
+                 self._offloader.offloads(messageSize(data))):
+            # Decoded in the background, later messages wait their turn.
+            self._decoding.append(data)
+            if self._decodeTask is None:
+                self._decodeTask = asyncio.create_task(self._decodeQueued())
+            return
+        try:
+            deserializedData = self._decode(data)
+        except (ValueError, UnicodeDecodeError) as err:
+            log.warning('DC#%s dropped undecodable message: %r',
+                        self.connectionId, err)
+            return
 
         # Check if we've chunked--if so, piece things back together.
-        # We're guaranteed that this isn't 0.
-        # if deserializedData.get('__peerData', None):
-        #     await self._handleChunk(deserializedData)
-        #     return
-
-        self.emit(ConnectionEventType.Data, deserializedData)
-
-    async def _handleChunk(self, data) -> None:
-        id = data.__peerData
-        chunkInfo = self._chunkedData[id] or {
-          'data': [],
-          'count': 0,
-          'total': data.total
-        }
-        chunkInfo.data[data.n] = data.data
-        chunkInfo.count += 1
-        self._chunkedData[id] = chunkInfo
-        if chunkInfo.total == chunkInfo.count:
-            # Clean up before making
-            # the recursive call to `_handleDataMessage`.
-            del self._chunkedData[id]
-            # We've received all the chunks--time
-            # to construct the complete data.
-            # Blog is a browser JavaScript type.
-            # Not applicable in the Python port.
-            # data = Blob(chunkInfo.data)
-            await self._handleDataMessage(data)
+        if self._isChunk(deserializedData):
+            message = self._handleChunk(deserializedData)
+            if message is not None:
+                self._handleDataMessage(memoryview(message))
+            return
+
+        self._deliver(deserializedData)
+
+    def _onMessageError(self, err: Exception) -> None:
+        """Drop a received message that failed, keep the channel open."""
+        log.warning('DC#%s dropped message that failed to handle: %r',
+                    self.connectionId, err)
+        self.emit(ConnectionEventType.Error, err)
+
+    def _decode(self, data) -> Any:
+        """Decompress and decode a message inline."""
+        codec = self._codec
+        measure = self._offloader.measure
+        if codec.framed and isCompressed(data):
+            data = measure('deflate decompress', messageSize(data),
+                           self._compressor.decompress, data)
+            if codec.text:
+                data = str(data, 'utf-8')
+        return measure(self._decodeKey, messageSize(data), codec.decode, data)
+
+    async def _decodeOffloaded(self, data) -> Any:
+        """Decompress and decode a message, in the executor if large."""
+        codec = self._codec
+        offloader = self._offloader
+        if codec.framed and isCompressed(data):
+            data = await offloader.call(
+                'deflate decompress', messageSize(data),
+                self._compressor.decompress, data, threads=True)
+            if codec.text:
+                data = str(data, 'utf-8')
+        size = messageSize(data)
+        if not offloader.offloads(size):
+            return offloader.measure(self._decodeKey, size, codec.decode, data)
+        return await offloader.call(self._decodeKey, size,
+                                    decodeWith, codec.name, data)
+
+    async def _decodeQueued(self) -> None:
+        """Decode queued messages in order, large ones in the executor."""
+        queue = self._decoding
+        try:
+            while queue:
+                data = queue.popleft()
+                try:
+                    deserializedData = await self._decodeOffloaded(data)
+                except (ValueError, UnicodeDecodeError) as err:
+                    log.warning('DC#%s dropped undecodable message: %r',
+                                self.connectionId, err)
+                    continue
+                except Exception as err:
+                    self._onMessageError(err)
+                    continue
+                try:
+                    if self._isChunk(deserializedData):
+                        message = self._handleChunk(deserializedData)
+                        if message is not None:
+                            # completes before the messages queued behind
+                            queue.appendleft(memoryview(message))
+                        continue
+                    self._deliver(deserializedData)
+                except Exception as err:
+                    self._onMessageError(err)
+        finally:
+            self._decodeTask = None
+
+    def _isChunk(self, data) -> bool:
+        return self._codec.chunked and isinstance(data, dict) and \
+            '__peerData' in data
+
+    def _handleBatch(self, data) -> None:
+        """Handle each message of a batch frame in order."""
+        try:
+            messages = splitBatch(data)
+        except ValueError as err:
+            log.warning('DC#%s dropped batch: %r', self.connectionId, err)
+            return
+        text = self._codec.text
+        for message in messages:
+            if text and not isCompressed(message):
+                try:
+                    message = str(message, 'utf-8')
+                except UnicodeDecodeError as err:
+                    log.warning('DC#%s dropped undecodable message: %r',
+                                self.connectionId, err)
+                    continue
+            self._handleDataMessage(message)
+
+    def _handleChunk(self, data: dict) -> Optional[bytearray]:
+        """Return the whole message once all its chunks arrived."""
+        chunk = data.get('data')
+        if not isinstance(chunk, bytes):
+            log.warning('DC#%s dropped chunk without data', self.connectionId)
+            return None
+        return self._chunks.add(data['__peerData'], data.get('n'),
+                                data.get('total'), chunk)
+
+    def _deliver(self, data) -> None:
+        """Emit data to listeners, or queue it for recv() without any."""
+        if self.listeners(ConnectionEventType.Data):
+            self.emit(ConnectionEventType.Data, data)
+        elif self._backlog or not self._inbox.putNowait(data):
+            if self._inbox.policy == InboxOverflowPolicy.Block:
+                # The SCTP receiver cannot be paused,
+                # so the backlog is bounded too.
+                if len(self._backlog) >= self._backlogSize:
+                    stats = self._inbox.stats
+                    stats.received += 1
+                    stats.dropped += 1
+                    if not self._backlogOverflow:
+                        self._backlogOverflow = True
+                        log.warning('DC#%s inbox and backlog full, dropping '
+                                    'received messages', self.connectionId)
+                    return
+                self._backlog.append(data)
+                if self._backlogPump is None or self._backlogPump.done():
+                    self._backlogPump = asyncio.create_task(
+                        self._pumpBacklog())
+
+    async def _pumpBacklog(self) -> None:
+        """Move held back messages into the inbox as it empties."""
+        backlog = self._backlog
+        while backlog:
+            await self._inbox.put(backlog[0])
+            backlog.popleft()
+        self._backlogOverflow = False
+
+    async def recv(self) -> Any:
+        """Return the next received message, waiting for one.
+
+        Messages are only queued for recv() while the connection
+        has no Data event listeners.
+        Raise ConnectionError once the connection is closed
+        and all received messages have been read.
+        """
+        return await self._inbox.get()
+
+    def __aiter__(self) -> 'DataConnection':
+        """Iterate over received messages until the connection closes."""
+        return self
+
+    async def __anext__(self) -> Any:
+        """Return the next received message."""
+        try:
+            return await self._inbox.get()
+        except ConnectionError:
+            raise StopAsyncIteration
+
+    @property
+    def inboxStats(self) -> InboxStats:
+        """Return metrics of the received message inbox."""
+        stats = self._inbox.stats
+        stats.backlog = len(self._backlog)
+        return stats
+
+    @property
+    def chunkStats(self) -> ReassemblyStats:
+        """Return metrics of messages received in chunks."""
+        return self._chunks.stats
+
+    @property
+    def codecTimings(self) -> Dict[str, TimingHistogram]:
+        """Return serialization and compression timing histograms."""
+        return self._offloader.timings
+
+    @property
+    def compressionStats(self) -> CompressionStats:
+        """Return compression metrics of this connection."""
+        return self._compressor.stats
+
+    @property
+    def stripeStats(self) -> ReassemblyStats:
+        """Return metrics of messages received over auxiliary channels."""
+        return self._stripes.stats
+
+    def housekeep(self) -> None:
+        """Drop chunked transfers that timed out."""
+        self._chunks.expire()
+        self._stripes.expire()
 
     #
     # Exposed functionality for users.
@@ -224,9 +483,26 @@ class DataConnection(BaseConnection):
 
     async def close(self) -> None:
         """Close this connection."""
-        self._buffer = []
-        self._bufferSize = 0
-        self._chunkedData = {}
+        if self._batch and self.open and self._dc is not None and \
+                self._dc.readyState == 'open':
+            # best effort for messages still waiting to be batched
+            await self._flushBatch()
+        self._takeBatch()
+        if self._batchFlush:
+            self._batchFlush.cancel()
+            self._batchFlush = None
+        self._buffer.clear()
+        self._chunks.clear()
+        self._stripes.close()
+        self._inbox.close()
+        self._backlog.clear()
+        self._decoding.clear()
+        if self._decodeTask:
+            self._decodeTask.cancel()
+            self._decodeTask = None
+        if self._backlogPump:
+            self._backlogPump.cancel()
+            self._backlogPump = None
         if self._negotiator:
             await self._negotiator.cleanup()
             self._negotiator = None
@@ -236,6 +512,8 @@ class DataConnection(BaseConnection):
         if self.dataChannel:
             self.dataChannel.remove_all_listeners()
             self._dc = None
+        # wake up drain() waiters
+        self._drained.set()
         if self._encodingQueue:
             self._encodingQueue.destroy()
             self._encodingQueue.remove_all_listeners()
@@ -245,8 +523,20 @@ class DataConnection(BaseConnection):
         self._open = False
         self.emit(ConnectionEventType.Close)
 
-    async def send(self, data, chunked: bool = False) -> None:
-        """Send data to the peer on the other side of this connection."""
+    async def send(self,
+                   data,
+                   chunked: bool = False,
+                   wait: bool = False,
+                   compress: bool = True) -> None:
+        """Send data to the peer on the other side of this connection.
+
+        Messages queue locally while the data channel buffer is full.
+        With wait True, return only once the queue has drained,
+        as drain() does.
+        If compression was negotiated, messages above the threshold
+        are compressed, unless compress is False, e.g. for content
+        that is compressed already.
+        """
         log.debug('DataConnection entered send(data): \n%r', data)
         if not self.open:
             log.warning('DataConnection not open')
@@ -260,88 +550,170 @@ class DataConnection(BaseConnection):
             )
             return
 
-        log.debug('Serialization: %r', self.serialization)
-
-        if self.serialization == SerializationType.JSON:
-            log.warning('DataConnection sending JSON data: \n%r', data)
-            await self._bufferedSend(self.stringify(data))
-        # Blob is a JavaScript browser type. Not supported in Python.
-        # elif \
-        #     self.serialization == SerializationType.Binary or \
-        #         self.serialization == SerializationType.BinaryUTF8:
-        #     blob = util.pack(data)
-        #     if not chunked and blob.size > util.chunkedMTU:
-        #         self._sendChunks(blob)
-        #         return
-        #
-        #     if not util.supports.binaryBlob:
-        #         # We only do this if we really need to
-        #         # (e.g. blobs are not supported),
-        #         # because this conversion is costly.
-        #         self._encodingQueue.enque(blob)
-        #     else:
-        #         self._bufferedSend(blob)
+        codec = self._codec
+        offloader = self._offloader
+        size = estimateSize(data) if offloader.threshold else 0
+        if offloader.offloads(size):
+            msg = await offloader.call(self._encodeKey, size,
+                                       encodeWith, codec.name, data)
         else:
-            # log.debug('DataConnection sending data: \n%r', data)
-            await self._bufferedSend(data)
+            msg = offloader.measure(self._encodeKey, size, codec.encode, data)
+        # message as bytes, for compression and batching
+        encoded = None
+        if self.compression and compress and not chunked:
+            encoded = msg.encode('utf-8') if codec.text else msg
+            compressed = await offloader.call(
+                'deflate compress', len(encoded),
+                self._compressor.compress, encoded, threads=True)
+            if compressed is not encoded:
+                msg = encoded = compressed
+        if codec.chunked and not chunked and len(msg) > util.chunkedMTU:
+            if self._stripes.ready:
+                await self._sendStriped(msg)
+            else:
+                await self._sendChunks(msg)
+        elif self._coalesceDelay:
+            if encoded is None:
+                encoded = msg.encode('utf-8') if codec.text else msg
+            await self._coalesce(encoded, msg)
+        else:
+            await self._bufferedSend(msg)
+        if wait:
+            await self.drain()
+
+    async def drain(self, limit: int = None) -> None:
+        """Wait until queued messages are handed to the data channel.
+
+        Return once the local queue is empty and the data channel
+        buffer is at most limit, the high water mark by default,
+        or the connection closed. A limit below the low water mark
+        counts as the low water mark.
+        Messages waiting to be batched are sent right away.
+        """
+        if limit is None:
+            limit = self._highWaterMark
+        else:
+            limit = max(limit, self._lowWaterMark)
+        await self._flushBatch()
+        while self.open and self._dc is not None and \
+                (self._buffer or self._dc.bufferedAmount > limit):
+            self._drained.clear()
+            await self._drained.wait()
 
     async def _bufferedSend(self, msg: any) -> None:
-        if self._buffering or not await self._trySend(msg):
+        if self._buffer or \
+                self.dataChannel.bufferedAmount > self._highWaterMark:
+            # Keep order behind already queued messages.
+            # The data channel tells when its buffer runs low.
             self._buffer.append(msg)
-            self._bufferSize = len(self._buffer)
+            self._drained.clear()
+            return
+        await self._trySend(msg)
+
+    async def _coalesce(self, encoded: bytes, msg) -> None:
+        """Add a message to the batch, or send it alone if too large.
+
+        The batch goes out when it is full, or coalesceDelay seconds
+        after its first message at the latest.
+        """
+        size = len(encoded) + BATCH_OVERHEAD
+        if len(BATCH_MAGIC) + size > self._coalesceMaxBytes:
+            # keep order behind the messages batched so far
+            await self._flushBatch()
+            await self._bufferedSend(msg)
+            return
+        if self._batchBytes + size > self._coalesceMaxBytes:
+            await self._flushBatch()
+        if not self._batch:
+            self._batchFirst = msg
+        self._batch.append(encoded)
+        self._batchBytes += size
+        if self._batchTimer is None:
+            self._batchTimer = asyncio.get_event_loop().call_later(
+                self._coalesceDelay, self._onBatchTimeout)
+
+    def _takeBatch(self) -> Any:
+        """Return the message to send for the batch and start a new one.
+
+        A batch of one message is sent as the message itself.
+        """
+        if self._batchTimer is not None:
+            self._batchTimer.cancel()
+            self._batchTimer = None
+        batch = self._batch
+        if not batch:
+            return None
+        self._batch = []
+        self._batchBytes = len(BATCH_MAGIC)
+        first, self._batchFirst = self._batchFirst, None
+        if len(batch) > 1:
+            return packBatch(batch)
+        return first
+
+    async def _flushBatch(self) -> None:
+        msg = self._takeBatch()
+        if msg is not None:
+            await self._bufferedSend(msg)
+
+    def _onBatchTimeout(self) -> None:
+        self._batchTimer = None
+        msg = self._takeBatch()
+        if msg is None or not self.open:
+            return
+        # Queued right away, so that later sends stay behind it.
+        self._buffer.append(msg)
+        self._drained.clear()
+        self._batchFlush = asyncio.ensure_future(self._flushBuffer())
 
     async def _trySend(self, msg) -> bool:
         """Return true if the send succeeds."""
         log.debug('DataChannel entered _trySend(msg): \n%r', msg)
         if not self.open:
             return False
-        if self.dataChannel.bufferedAmount > \
-           DataConnection.MAX_BUFFERED_AMOUNT:
-            self._buffering = True
-
-            async def delayBuf():
-                # wait for 50ms before trying buffer
-                await asyncio.sleep(0.05)
-                self._buffering = False
-                self._tryBuffer()
-            asyncio.create_task(delayBuf())
-            return False
         try:
             log.debug('DataChannel sending message: \n%r', msg)
             self.dataChannel.send(msg)
         except Exception as e:
             log.exception(f'DC#:${self.connectionId} Error when sending: {e}')
-            self._buffering = True
             await self.close()
             return False
         return True
 
-    def _tryBuffer(self) -> None:
-        """Try to send the first message in the buffer."""
-        if not self.open:
-            return
-        if len(self._buffer) == 0:
-            return
-
-        msg = self._buffer[0]
-
-        if self._trySend(msg):
-            self._buffer.pop()
-            self._bufferSize = len(self._buffer)
-            self._tryBuffer()
-
-    # def _sendChunks(self, blob: Blob) -> None:
-    #     blobs = util.chunk(blob)
-    #     log.debug(f'DC#${this.connectionId} '
-    #               f'Try to send ${blobs.length} chunks...')
-    #     for blob in blobs:
-    #         self.send(blob, True)
+    async def _flushBuffer(self) -> None:
+        """Send queued messages in order until the data channel is full."""
+        buffer = self._buffer
+        while buffer and self.open and \
+                self.dataChannel.bufferedAmount <= self._highWaterMark:
+            if not await self._trySend(buffer.popleft()):
+                break
+        if not buffer and (not self.open or self.dataChannel.bufferedAmount
+                           <= self._highWaterMark):
+            self._drained.set()
+
+    async def _sendChunks(self, blob: bytes) -> None:
+        blobs = util.chunk(blob)
+        log.debug('DC#%s Try to send %d chunks...',
+                  self.connectionId, len(blobs))
+        for blob in blobs:
+            await self.send(blob, True)
+
+    async def _sendStriped(self, blob: bytes) -> None:
+        log.debug('DC#%s Striping %d bytes over %d channels...',
+                  self.connectionId, len(blob), self.stripes)
+        try:
+            await self._stripes.send(blob)
+        except Exception as e:
+            log.exception(f'DC#:${self.connectionId} Error when sending: {e}')
+            await self.close()
 
     async def handleMessage(self, message: ServerMessage) -> None:
         """Handle signaling server message."""
         payload = message.payload
         if message.type == ServerMessageType.Answer:
-            await self._negotiator.handleSDP(message.type, payload.sdp)
+            compression = payload.get('compression')
+            if compression in self.compressionOffer:
+                self.compression = compression
+            await self._negotiator.handleSDP(message.type, payload['sdp'])
         elif message.type == ServerMessageType.Candidate:
             await self._negotiator.handleCandidate(payload['candidate'])
         else:
@@ -14,6 +14,15 @@ class ConnectionEventType(Enum):
     IceStateChanged = "iceStateChanged"
 
 
+@unique
+class ConnectionState(Enum):
+    """Lifecycle state of a peer connection."""
+
+    Negotiating = "negotiating"
+    Open = "open"
+    Closed = "closed"
+
+
 @unique
 class ConnectionType(Enum):
     """Connection type."""
@@ -22,6 +31,16 @@ class ConnectionType(Enum):
     Media = "media"
 
 
+@unique
+class InboxOverflowPolicy(Enum):
+    """What a full connection inbox does with another message."""
+
+    # hold the message back until the consumer catches up
+    Block = "block"
+    DropOldest = "drop-oldest"
+    DropNewest = "drop-newest"
+
+
 @unique
 class PeerEventType(Enum):
     """Peer event type."""
@@ -31,6 +50,7 @@ class PeerEventType(Enum):
     Connection = "connection"
     Call = "Call"
     Disconnected = "disconnected"
+    Reconnected = "reconnected"
     Error = "Error"
 
 
@@ -72,6 +92,8 @@ class SocketEventType(Enum):
 
     Message = "Message"
     Disconnected = "Disconnected"
+    Reconnecting = "Reconnecting"
+    Reconnected = "Reconnected"
     Error = "Error"
     Close = "Close"
 
@@ -2,19 +2,24 @@
 # import argparse
 import os
 import asyncio
+import collections
 import sys
 import json
+import struct
 import yaml
 import aiohttp
-from typing import Any
+from typing import Mapping, Tuple
 from pathlib import Path
 from loguru import logger
 
 # from aiortc import RTCIceCandidate, RTCSessionDescription
+from peerjs.compression import isCompressedType
 from peerjs.peer import Peer, PeerOptions
 from peerjs.peerroom import PeerRoom
 from peerjs.util import util, default_ice_servers
 from peerjs.enums import ConnectionEventType, PeerEventType
+from peerjs.ext.keepalive import KeepaliveScheduler
+from peerjs.ext.responsecache import CachedResponse, ResponseCache
 from aiortc.rtcconfiguration import RTCConfiguration, RTCIceServer
 
 print(sys.version)
@@ -29,12 +34,39 @@ AMBIANIC_PNP_SECURE = True  # False
 
 DEFAULT_LOG_LEVEL = 'INFO'
 
+# Upstream read size of streamed responses, one data channel message each.
+STREAM_CHUNK_SIZE = 64 * 1024
+# Data channel buffered amount above which streamed upstream reads pause.
+STREAM_BUFFER_LIMIT = 1024 * 1024
+# Requests forwarded at a time per peer connection, more wait their turn.
+MAX_CONCURRENT_REQUESTS = 8
+# Seconds between keepalives on a connection while requests wait.
+KEEPALIVE_INTERVAL = 1.0
+# Bytes of upstream responses cached, 0 turns caching off.
+RESPONSE_CACHE_BYTES = 16 * 1024 * 1024
+# Request body bytes a peer may send ahead of acknowledgements.
+UPLOAD_WINDOW = 1024 * 1024
+# Request headers that only concern the hop to the proxy.
+HOP_BY_HOP_HEADERS = frozenset((
+    'connection', 'content-length', 'host', 'keep-alive',
+    'proxy-authenticate', 'proxy-authorization', 'te', 'trailer',
+    'transfer-encoding', 'upgrade'))
+# Request headers the response cache answers itself.
+CACHE_REQUEST_HEADERS = ('cache-control', 'if-modified-since',
+                         'if-none-match')
+# Multiplexed request ids, prefixed to binary body messages.
+REQUEST_ID = struct.Struct('>I')
+MAX_REQUEST_ID = 2 ** 32 - 1
+
 config = {
     'signaling_server':   AMBIANIC_PNP_HOST,
     'port':   AMBIANIC_PNP_PORT,
     'secure': AMBIANIC_PNP_SECURE,
     'ice_servers': default_ice_servers,
     'log_level': "INFO",
+    'max_concurrent_requests': MAX_CONCURRENT_REQUESTS,
+    'response_cache_bytes': RESPONSE_CACHE_BYTES,
+    'keepalive_interval': KEEPALIVE_INTERVAL,
 }
 
 PEERID_FILE = '.peerjsrc'
@@ -50,6 +82,10 @@ peerConnectionStatus = None
 discoveryLoop = None
 # aiohttp session reusable throghout the http proxy lifecycle
 http_session = None
+# upstream GET responses, None if caching is off
+response_cache = None
+# keepalives of requests waiting on upstream, see _keepalive_scheduler()
+keepalive_scheduler = None
 # flags when user requests shutdown
 # via CTRL+C or another system signal
 _is_shutting_down: bool = False
@@ -123,6 +159,12 @@ def _loadConfig():
         config["secure"] = AMBIANIC_PNP_SECURE
     if "ice_servers" not in config.keys():
         config["ice_servers"] = default_ice_servers
+    if "max_concurrent_requests" not in config.keys():
+        config["max_concurrent_requests"] = MAX_CONCURRENT_REQUESTS
+    if "response_cache_bytes" not in config.keys():
+        config["response_cache_bytes"] = RESPONSE_CACHE_BYTES
+    if "keepalive_interval" not in config.keys():
+        config["keepalive_interval"] = KEEPALIVE_INTERVAL
 
     return exists
 
@@ -167,6 +209,11 @@ def _setPnPServiceConnectionHandlers(peer=None):
             peer._id = savedPeerId
         peer._lastServerId = savedPeerId
 
+    @peer.on(PeerEventType.Reconnected)
+    def peer_reconnected(peerId, elapsed):
+        logger.info('Peer {} reconnected to server in {:.3f} seconds.',
+                    peerId, elapsed)
+
     @peer.on(PeerEventType.Close)
     def peer_close():
         # peerConnection = null
@@ -187,48 +234,326 @@ def _setPnPServiceConnectionHandlers(peer=None):
         _setPeerConnectionHandlers(peerConnection)
 
 
-async def _fetch(url: str = None, method: str = 'GET') -> Any:
+async def _fetch(url: str = None, headers: dict = None,
+                 method: str = 'GET',
+                 body=None) -> Tuple[int, Mapping[str, str], bytes]:
     global http_session
-    if method == 'GET':
-        async with http_session.get(url) as response:
-            content = await response.read()
-        # response_content = {'name': 'Ambianic-Edge', 'version': '1.24.2020'}
-        # rjson = json.dumps(response_content)
-        return response, content
-    elif method == 'PUT':
-        async with http_session.put(url) as response:
-            content = await response.read()
-        return response, content
-    else:
-        raise NotImplementedError(
-            f'HTTP method ${method} not implemented.'
-            ' Contributions welcome!')
+    async with http_session.request(method, url, headers=headers,
+                                    data=body) as response:
+        content = await response.read()
+    # response_content = {'name': 'Ambianic-Edge', 'version': '1.24.2020'}
+    # rjson = json.dumps(response_content)
+    return response.status, response.headers, content
+
+
+class _Responder:
+    """Send the response to one proxy request.
+
+    Requests with an 'id' use the multiplexed protocol: JSON messages
+    carry the same 'id', and binary body messages start with the id
+    as a 4 byte big endian unsigned integer. Without an id, messages
+    go out untagged as in the original protocol.
+    """
+
+    def __init__(self, peer_connection=None, request_id: int = None):
+        self._peer_connection = peer_connection
+        self._request_id = request_id
+        self._prefix = None if request_id is None \
+            else REQUEST_ID.pack(request_id)
+
+    @property
+    def open(self) -> bool:
+        return self._peer_connection.open
+
+    @property
+    def tagged(self) -> bool:
+        return self._request_id is not None
+
+    async def send_json(self, message: dict) -> None:
+        if self._request_id is not None:
+            message = {'id': self._request_id, **message}
+        await self._peer_connection.send(json.dumps(message))
+
+    async def send_body(self, content, compress: bool = True) -> None:
+        if self._prefix is not None:
+            if isinstance(content, str):
+                content = content.encode('utf-8')
+            content = self._prefix + content
+        await self._peer_connection.send(content, compress=compress)
+
+    async def drain(self, limit: int = None) -> None:
+        await self._peer_connection.drain(limit)
+
+
+class _Upload:
+    """Request body arriving from the peer in binary messages.
+
+    The upstream request reads the body as it arrives. Every
+    UPLOAD_WINDOW // 4 bytes read, the peer gets a
+    {"status": 100, "received": <bytes read>} message, and it may send
+    at most UPLOAD_WINDOW bytes beyond what was acknowledged. A peer
+    sending more fails the upload, so an upload never holds more than
+    the window in memory.
+    """
+
+    def __init__(self, responder=None, length: int = 0):
+        self._responder = responder
+        self.length = length
+        # bytes still expected from the peer
+        self._remaining = length
+        self._chunks = collections.deque()
+        self._buffered = 0
+        self._read = 0
+        self._acknowledged = 0
+        self._arrived = asyncio.Event()
+        self._error = None
+
+    def feed(self, chunk) -> None:
+        if self._error is not None:
+            return
+        if len(chunk) > self._remaining:
+            self.fail('Request body longer than its body-length.')
+            return
+        self._remaining -= len(chunk)
+        self._chunks.append(bytes(chunk))
+        self._buffered += len(chunk)
+        if self._buffered > UPLOAD_WINDOW:
+            self.fail('Request body sent ahead of acknowledgements.')
+            return
+        self._arrived.set()
+
+    def fail(self, reason: str) -> None:
+        if self._error is None:
+            self._error = reason
+            self._chunks.clear()
+            self._arrived.set()
+
+    async def body(self):
+        """Yield the body as it arrives, raise IOError if it fails."""
+        while True:
+            while not self._chunks and self._remaining and \
+                    self._error is None:
+                self._arrived.clear()
+                await self._arrived.wait()
+            if self._error is not None:
+                raise IOError(self._error)
+            if not self._chunks:
+                return
+            chunk = self._chunks.popleft()
+            self._buffered -= len(chunk)
+            yield chunk
+            self._read += len(chunk)
+            if self._read - self._acknowledged >= UPLOAD_WINDOW // 4 or \
+                    self._read == self.length:
+                self._acknowledged = self._read
+                await self._responder.send_json(
+                    {'status': 100, 'received': self._read})
+
+
+def _forwarded_headers(request_headers: dict) -> dict:
+    return {name: value for name, value in request_headers.items()
+            if name not in HOP_BY_HOP_HEADERS}
+
+
+def _is_request_id(request_id) -> bool:
+    return isinstance(request_id, int) and \
+        not isinstance(request_id, bool) and \
+        0 <= request_id <= MAX_REQUEST_ID
+
+
+async def _stream(responder=None, url: str = None, method: str = 'GET',
+                  headers: dict = None, body=None, stop_flag=None) -> None:
+    """Forward an upstream response to the peer as it arrives.
+
+    The response header goes out as soon as the upstream headers are
+    in, with 'stream': true and without 'content-length' if upstream
+    does not know the decoded body length. The body follows in binary
+    messages of at most STREAM_CHUNK_SIZE bytes and ends with a text
+    message {"end": true, "length": <body bytes>}, or with
+    {"end": true, "error": <reason>} if upstream fails midway.
+    Upstream reads pause while more than STREAM_BUFFER_LIMIT bytes
+    wait in the data channel buffer, which bounds the memory held
+    for a request.
+    """
+    global http_session
+    async with http_session.request(method, url, headers=headers,
+                                    data=body) as response:
+        # headers are in, the client needs no more keepalive pings
+        stop_flag.set()
+        content_type = response.headers.get('content-type', 'None')
+        response_header = {
+            'status': response.status,
+            'content-type': content_type,
+            'stream': True,
+        }
+        # the body is streamed decoded, so an encoded length is no use
+        if response.content_length is not None and \
+                'content-encoding' not in response.headers:
+            response_header['content-length'] = response.content_length
+        logger.info('Streaming response with header: \n {}', response_header)
+        await responder.send_json(response_header)
+        compress = not isCompressedType(content_type)
+        length = 0
+        try:
+            async for chunk in response.content.iter_chunked(
+                    STREAM_CHUNK_SIZE):
+                if not responder.open:
+                    logger.info('Peer closed while streaming {}', url)
+                    return
+                await responder.send_body(chunk, compress=compress)
+                length += len(chunk)
+                await responder.drain(STREAM_BUFFER_LIMIT)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning('Upstream failed while streaming {}: {}', url, e)
+            await responder.send_json({'end': True, 'error': str(e)})
+            return
+        await responder.send_json({'end': True, 'length': length})
 
 
-async def _pong(peer_connection=None):
+async def _pong(responder=None):
     """Respond to client ping."""
     response_header = {
         'status': 200,
     }
-    header_as_json = json.dumps(response_header)
     logger.debug('sending keepalive pong back to remote peer')
-    await peer_connection.send(header_as_json)
-    await peer_connection.send('pong')
-
-
-async def _ping(peer_connection=None, stop_flag=None):
-    while not stop_flag.is_set():
-        # send HTTP 202 Accepted status code to inform
-        # client that we are still waiting on the http
-        # server to complete its response
-        ping_as_json = json.dumps({'status': 202})
-        await peer_connection.send(ping_as_json)
-        logger.info('webrtc peer: http proxy response to client ping. '
-                 'Keeping datachannel alive.')
-        await asyncio.sleep(1)
+    await responder.send_json(response_header)
+    await responder.send_body('pong')
+
+
+def _keepalive_scheduler() -> KeepaliveScheduler:
+    """Return the keepalive scheduler shared by all connections."""
+    global keepalive_scheduler
+    if keepalive_scheduler is None:
+        keepalive_scheduler = KeepaliveScheduler(interval=config.get(
+            'keepalive_interval', KEEPALIVE_INTERVAL))
+    return keepalive_scheduler
+
+
+async def _proxy(responder=None, request=None, waiting_on_fetch=None):
+    """Forward a request upstream and send the response to the peer.
+
+    The request has a 'url', and may have a 'method', 'headers' and a
+    'body', as text, as JSON or as an _Upload arriving from the peer.
+    Set waiting_on_fetch once the response header is in.
+    """
+    stream = request.get('stream', False)
+    request_headers = {name.lower(): value for name, value
+                       in (request.get('headers') or {}).items()}
+    url = request.get('url')
+    method = request.get('method', 'GET').upper()
+    headers = _forwarded_headers(request_headers)
+    body = request.get('body')
+    if isinstance(body, _Upload):
+        headers['content-length'] = str(body.length)
+        body = body.body()
+    elif isinstance(body, str):
+        body = body.encode('utf-8')
+    elif body is not None:
+        body = json.dumps(body).encode('utf-8')
+        headers.setdefault('content-type', 'application/json')
+    # partial and authorized responses are not for everyone
+    cached = response_cache is not None and method == 'GET' and \
+        body is None and not any(name in request_headers for name in
+                                 ('authorization', 'range', 'if-range'))
+    if response_cache is not None and method != 'GET':
+        response_cache.invalidate(url)
+    if stream:
+        try:
+            await _stream(responder=responder, url=url, method=method,
+                          headers=headers, body=body,
+                          stop_flag=waiting_on_fetch)
+        except Exception as e:
+            logger.exception('Error {} while streaming response'
+                             ' with request: \n {}',
+                             e, request)
+            if not waiting_on_fetch.is_set():
+                # no header sent yet
+                await responder.send_json({'status': 500})
+        finally:
+            waiting_on_fetch.set()
+        return
+    response = None
+    try:
+        logger.debug(f'Proxy forwarding HTTP request: {request}.')
+        if cached:
+            # The cache asks upstream with its own validators.
+            for name in CACHE_REQUEST_HEADERS:
+                headers.pop(name, None)
+
+            async def fetch(url, conditional):
+                return await _fetch(url, {**headers, **conditional})
+            response = await response_cache.get(url, fetch, request_headers)
+        else:
+            response = CachedResponse(
+                *await _fetch(url, headers, method, body))
+        logger.debug(f'Proxy received HTTP response: {response.status}.')
+    except Exception as e:
+        logger.exception('Error {} while fetching response'
+                      ' with request: \n {}',
+                      e, request)
+    finally:
+        # fetch completed, cancel pings
+        waiting_on_fetch.set()
+    if not response:
+        response_header = {
+            # internal server error code
+            'status': 500
+        }
+        response_content = None
+        if responder.tagged:
+            # multiplexed clients wait for every request id
+            await responder.send_json(response_header)
+        return
+    response_content = response.body
+    response_header = {
+        'status': response.status,
+        'content-type': response.headers.get('content-type', 'None'),
+        'content-length': len(response_content)
+    }
+    # validators for conditional requests
+    for name in ('etag', 'last-modified', 'cache-control'):
+        if name in response.headers:
+            response_header[name] = response.headers[name]
+    if cached and response_cache.notModified(response, request_headers):
+        response_header['status'] = 304
+        del response_header['content-length']
+    logger.info('Proxy fetched response with headers: \n{}', response.headers)
+    logger.info('Answering request: \n{} '
+             'response header: \n {}',
+             request, response_header)
+    await responder.send_json(response_header)
+    if response_header['status'] not in (204, 304):
+        # HTTP status 204 means: Success. No content.
+        # 304 means: Not modified, the client has the content.
+        await responder.send_body(
+            response_content,
+            compress=not isCompressedType(response_header['content-type']))
 
 
 def _setPeerConnectionHandlers(peerConnection):
+    # requests in flight on this connection
+    in_flight = asyncio.Semaphore(config.get(
+        'max_concurrent_requests', MAX_CONCURRENT_REQUESTS))
+    # request bodies arriving, by request id
+    uploads = {}
+
+    async def reject(request_id, status):
+        message = {'status': status}
+        if request_id is not None:
+            message['id'] = request_id
+        await peerConnection.send(json.dumps(message))
+
+    def feed_upload(data):
+        data = memoryview(data)
+        request_id = None
+        if None not in uploads and len(data) >= REQUEST_ID.size:
+            request_id, = REQUEST_ID.unpack_from(data)
+            data = data[REQUEST_ID.size:]
+        upload = uploads.get(request_id)
+        if upload is None:
+            logger.debug('Dropped body data of request {}', request_id)
+            return
+        upload.feed(data)
 
     @peerConnection.on(ConnectionEventType.Open)
     async def pc_open():
@@ -237,58 +562,62 @@ def _setPeerConnectionHandlers(peerConnection):
     # Handle incoming data (messages only since this is the signal sender)
     @peerConnection.on(ConnectionEventType.Data)
     async def pc_data(data):
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            # request body
+            feed_upload(data)
+            return
         logger.debug('data received from remote peer \n{}', data)
         request = json.loads(data)
+        request_id = request.pop('id', None)
+        if request_id is not None and not _is_request_id(request_id):
+            logger.warning('Invalid proxy request id {}', request_id)
+            await reject(request_id, 400)
+            return
+        responder = _Responder(peer_connection=peerConnection,
+                               request_id=request_id)
         # check if the request is just a keepalive ping
         if (request['url'].startswith('ping')):
             logger.debug('received keepalive ping from remote peer')
-            await _pong(peer_connection=peerConnection)
+            await _pong(responder=responder)
             return
+        body_length = request.pop('body-length', None)
+        upload = None
+        if body_length is not None:
+            # registered right away, before its data is handled
+            if not isinstance(body_length, int) or body_length < 0 or \
+                    request_id in uploads or None in uploads or \
+                    (request_id is None and uploads):
+                logger.warning('Invalid proxy upload {}', request)
+                await reject(request_id, 400)
+                return
+            upload = request['body'] = uploads[request_id] = \
+                _Upload(responder=responder, length=body_length)
         logger.info('webrtc peer: http proxy request: \n{}', request)
-        # schedule frequent pings while waiting on response_header
-        # to keep the peer data channel open
-        waiting_on_fetch = asyncio.Event()
-
-        asyncio.create_task(_ping(peer_connection=peerConnection,
-                                  stop_flag=waiting_on_fetch))
-        response = None
+        # send HTTP 202 Accepted status code to inform client
+        # that we are still waiting on the http server to complete
+        # its response, also while the request waits for its turn,
+        # and to keep the peer data channel open
+        waiting_on_fetch = _keepalive_scheduler().waiting(
+            peerConnection, request_id)
         try:
-            logger.debug(f'Proxy forwarding HTTP request: {request}.')
-            response, content = await _fetch(**request)
-            logger.debug(f'Proxy received HTTP response: {response}.')
-        except Exception as e:
-            logger.exception('Error {} while fetching response'
-                          ' with request: \n {}',
-                          e, request)
+            async with in_flight:
+                await _proxy(responder=responder, request=request,
+                             waiting_on_fetch=waiting_on_fetch)
         finally:
-            # fetch completed, cancel pings
             waiting_on_fetch.set()
-        if not response:
-            response_header = {
-                # internal server error code
-                'status': 500
-            }
-            response_content = None
-            return
-        response_content = content
-        response_header = {
-            'status': response.status,
-            'content-type': response.headers.get('content-type', 'None'),
-            'content-length': len(response_content)
-        }
-        logger.info('Proxy fetched response with headers: \n{}', response.headers)
-        logger.info('Answering request: \n{} '
-                 'response header: \n {}',
-                 request, response_header)
-        header_as_json = json.dumps(response_header)
-        await peerConnection.send(header_as_json)
-        if (response.status != 204):
-            # HTTP status 204 means: Success. No content.
-            await peerConnection.send(response_content)
+            if upload is not None:
+                upload.fail('Request finished.')
+                del uploads[request_id]
 
     @peerConnection.on(ConnectionEventType.Close)
     async def pc_close():
         logger.info('Connection to remote peer closed')
+        for upload in uploads.values():
+            upload.fail('Peer connection closed.')
+        if response_cache is not None:
+            logger.info('Response cache stats: {}', response_cache.stats)
+        if keepalive_scheduler is not None:
+            logger.info('Keepalive stats: {}', keepalive_scheduler.stats)
 
 
 async def pnp_service_connect() -> Peer:
@@ -338,14 +667,23 @@ async def make_discoverable(peer=None):
                 logger.info('Peer destroyed. Will create a new peer.')
                 peer = await pnp_service_connect()
             elif peer.open:
-                await join_peer_room(peer=peer)
+                try:
+                    await join_peer_room(peer=peer)
+                except Exception as e:
+                    # The signaling connection is fine,
+                    # no need to tear down live peer connections.
+                    logger.warning('Error while trying to join local '
+                                   'peer room. Will retry in a few moments. '
+                                   'Error: \n{}', e)
             elif peer.disconnected:
                 logger.info('Peer disconnected. Will try to reconnect.')
                 await peer.reconnect()
             else:
+                # Either connecting for the first time
+                # or automatically reconnecting to the signaling server.
                 logger.info('Peer still establishing connection. {}', peer)
         except Exception as e:
-            logger.exception('Error while trying to join local peer room. '
+            logger.exception('Error while trying to connect peer. '
                           'Will retry in a few moments. '
                           'Error: \n{}', e)
             if peer and not peer.destroyed:
@@ -371,6 +709,9 @@ def _config_logger():
 async def _start():
     global http_session
     http_session = aiohttp.ClientSession()
+    global response_cache
+    if config['response_cache_bytes']:
+        response_cache = ResponseCache(maxBytes=config['response_cache_bytes'])
     global peer
     logger.info('Calling make_discoverable')
     await make_discoverable(peer=peer)
@@ -391,6 +732,8 @@ async def _shutdown():
     # loop.run_until_complete(signaling.close())
     global http_session
     await http_session.close()
+    if keepalive_scheduler is not None:
+        keepalive_scheduler.close()
 
 @logger.catch
 def main():
@@ -0,0 +1,170 @@
+"""Keepalive messages for HTTP proxy requests waiting on upstream."""
+import asyncio
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Set
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class KeepaliveStats:
+    """Keepalive scheduler metrics."""
+
+    # keepalive messages sent
+    sent: int = 0
+    # keepalives saved by sending one per connection
+    # instead of one per waiting request
+    coalesced: int = 0
+    # connections that were closed while requests waited
+    dropped: int = 0
+    # timer wheel wakeups
+    ticks: int = 0
+    # connections and requests waiting now
+    connections: int = 0
+    waiting: int = 0
+
+
+class WaitingRequest:
+    """A request that keeps its connection alive until set."""
+
+    __slots__ = ('_scheduler', '_connection', '_requestId', '_set')
+
+    def __init__(self, scheduler: 'KeepaliveScheduler',
+                 connection: Any, requestId: int = None):
+        self._scheduler = scheduler
+        self._connection = connection
+        self._requestId = requestId
+        self._set = False
+
+    def set(self) -> None:
+        """Stop keepalives for this request, e.g. as its header is in."""
+        if not self._set:
+            self._set = True
+            self._scheduler._done(self._connection, self._requestId)
+
+    def is_set(self) -> bool:
+        """Return True once the request no longer waits."""
+        return self._set
+
+
+class _Waiting:
+    """Requests waiting on one connection."""
+
+    __slots__ = ('slot', 'untagged', 'ids')
+
+    def __init__(self, slot: int):
+        self.slot = slot
+        # requests without an id, and ids of multiplexed requests
+        self.untagged = 0
+        self.ids: List[int] = []
+
+    def __len__(self) -> int:
+        return self.untagged + len(self.ids)
+
+
+class KeepaliveScheduler:
+    """Send keepalives on connections with requests waiting on upstream.
+
+    A connection gets one {"status": 202} message per interval while
+    any of its requests wait, however many they are. The ids of
+    waiting multiplexed requests are listed in its 'pending' field.
+    A single task serves all connections from a timer wheel of slots
+    per interval. A connection takes the slot one interval after its
+    first waiting request, and the task only runs while requests wait.
+    """
+
+    def __init__(self, interval: float = 1.0, slots: int = 8):
+        """Create keepalive scheduler."""
+        self._interval = interval
+        self._slots = slots
+        self._wheel: List[Set[Any]] = [set() for _ in range(slots)]
+        # slot the next tick serves
+        self._cursor = 0
+        self._connections: Dict[Any, _Waiting] = {}
+        self._task: asyncio.Task = None
+        self._stats = KeepaliveStats()
+
+    @property
+    def interval(self) -> float:
+        """Return the seconds between keepalives on a connection."""
+        return self._interval
+
+    @property
+    def stats(self) -> KeepaliveStats:
+        """Return scheduler metrics."""
+        self._stats.connections = len(self._connections)
+        self._stats.waiting = sum(map(len, self._connections.values()))
+        return self._stats
+
+    def waiting(self, connection: Any,
+                requestId: int = None) -> WaitingRequest:
+        """Keep connection alive until the returned request is set."""
+        waiting = self._connections.get(connection)
+        if waiting is None:
+            # due after a full turn of the wheel
+            slot = (self._cursor + self._slots - 1) % self._slots
+            waiting = self._connections[connection] = _Waiting(slot)
+            self._wheel[slot].add(connection)
+        if requestId is None:
+            waiting.untagged += 1
+        else:
+            waiting.ids.append(requestId)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        return WaitingRequest(self, connection, requestId)
+
+    def _done(self, connection: Any, requestId: int) -> None:
+        waiting = self._connections.get(connection)
+        if waiting is None:
+            return
+        if requestId is None:
+            waiting.untagged -= 1
+        else:
+            waiting.ids.remove(requestId)
+        if not waiting:
+            self._forget(connection)
+
+    def _forget(self, connection: Any) -> None:
+        waiting = self._connections.pop(connection)
+        self._wheel[waiting.slot].discard(connection)
+
+    async def _run(self) -> None:
+        tick = self._interval / self._slots
+        while self._connections:
+            await asyncio.sleep(tick)
+            self._stats.ticks += 1
+            slot = self._wheel[self._cursor]
+            self._cursor = (self._cursor + 1) % self._slots
+            for connection in list(slot):
+                await self._keepalive(connection)
+
+    async def _keepalive(self, connection: Any) -> None:
+        waiting = self._connections.get(connection)
+        if waiting is None:
+            return
+        if not connection.open:
+            self._stats.dropped += 1
+            self._forget(connection)
+            return
+        message = {'status': 202}
+        if waiting.ids:
+            message['pending'] = sorted(waiting.ids)
+        try:
+            await connection.send(json.dumps(message))
+        except Exception as e:
+            log.warning('Failed to send keepalive: %r', e)
+            return
+        self._stats.sent += 1
+        self._stats.coalesced += len(waiting) - 1
+        log.debug('Sent keepalive for %d waiting requests', len(waiting))
+
+    def close(self) -> None:
+        """Stop sending keepalives."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for slot in self._wheel:
+            slot.clear()
+        self._connections.clear()
@@ -0,0 +1,274 @@
+"""Cache of upstream HTTP responses for the HTTP proxy."""
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Mapping, Tuple
+
+log = logging.getLogger(__name__)
+
+# (url, request headers) => (status, response headers, body)
+Fetch = Callable[[str, Dict[str, str]],
+                 Awaitable[Tuple[int, Mapping[str, str], bytes]]]
+
+# Upper bound of the freshness guessed from Last-Modified, in seconds.
+HEURISTIC_MAX_AGE = 24 * 60 * 60
+# Response headers a 304 Not Modified updates on the cached response.
+REVALIDATED_HEADERS = ('cache-control', 'date', 'etag', 'expires',
+                       'last-modified', 'age')
+
+
+def cacheDirectives(value: str) -> Dict[str, str]:
+    """Return the directives of a Cache-Control header by name."""
+    directives = {}
+    for directive in (value or '').split(','):
+        name, _, argument = directive.partition('=')
+        name = name.strip().lower()
+        if name:
+            directives[name] = argument.strip().strip('"')
+    return directives
+
+
+def _httpDate(value: str) -> float:
+    """Return an HTTP date as a timestamp, None if invalid."""
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _seconds(value: str) -> int:
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def freshnessLifetime(headers: Mapping[str, str]) -> float:
+    """Return how many seconds a response stays fresh after it is sent.
+
+    From s-maxage or max-age, else Expires, else a tenth of the time
+    since Last-Modified.
+    """
+    directives = cacheDirectives(headers.get('cache-control'))
+    if 'no-cache' in directives:
+        return 0
+    for name in ('s-maxage', 'max-age'):
+        if name in directives:
+            return _seconds(directives[name])
+    date = _httpDate(headers.get('date')) or time.time()
+    if 'expires' in headers:
+        expires = _httpDate(headers['expires'])
+        return max(0.0, expires - date) if expires is not None else 0
+    lastModified = _httpDate(headers.get('last-modified'))
+    if lastModified is not None:
+        return min(HEURISTIC_MAX_AGE, max(0.0, (date - lastModified) / 10))
+    return 0
+
+
+def _etagMatches(etags: str, etag: str) -> bool:
+    """Return True if an If-None-Match list matches, weakly, an ETag."""
+    if not etag:
+        return False
+    etag = etag.strip()
+    if etag.startswith('W/'):
+        etag = etag[2:]
+    for candidate in etags.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+@dataclass
+class ResponseCacheStats:
+    """Response cache metrics."""
+
+    # served from fresh entries
+    hits: int = 0
+    # served from entries upstream confirmed with 304 Not Modified
+    revalidated: int = 0
+    # fetched from upstream in full
+    misses: int = 0
+    # answered with 304 Not Modified to the peer, without the body
+    notModified: int = 0
+    stored: int = 0
+    # entries dropped to stay within the byte limit
+    evicted: int = 0
+    # body bytes not downloaded from upstream
+    upstreamBytesSaved: int = 0
+    # body bytes not sent to the peer
+    peerBytesSaved: int = 0
+    # body bytes of cached responses
+    bytes: int = 0
+
+    @property
+    def hitRatio(self) -> float:
+        """Return the share of requests answered with a cached body."""
+        served = self.hits + self.revalidated
+        total = served + self.misses
+        return served / total if total else 0.0
+
+
+@dataclass
+class CachedResponse:
+    """An upstream response, cached or not."""
+
+    status: int
+    # lower case names
+    headers: Dict[str, str]
+    body: bytes
+    # monotonic time until which the response is fresh
+    expires: float = field(default=0.0, compare=False)
+
+    @property
+    def fresh(self) -> bool:
+        """Return True if the response can be served without asking."""
+        return time.monotonic() < self.expires
+
+    def refresh(self) -> None:
+        """Compute expires from the headers, as received just now."""
+        lifetime = freshnessLifetime(self.headers) - \
+            _seconds(self.headers.get('age'))
+        self.expires = time.monotonic() + lifetime
+
+
+class ResponseCache:
+    """LRU cache of upstream GET responses, bounded in bytes.
+
+    Follows the rules of a shared cache: responses marked no-store or
+    private, with Vary or Set-Cookie, and other statuses than 200 are
+    not stored. Fresh responses are served as they are. Stale ones
+    with an ETag or Last-Modified are revalidated with a conditional
+    request, and a 304 Not Modified from upstream renews them without
+    downloading the body again. Concurrent misses of the same url
+    each go upstream.
+    """
+
+    def __init__(self,
+                 maxBytes: int = 16 * 1024 * 1024,
+                 maxEntryBytes: int = 1024 * 1024):
+        """Create response cache."""
+        self._maxBytes = maxBytes
+        self._maxEntryBytes = min(maxEntryBytes, maxBytes)
+        # url => response, least recently used first
+        self._entries: 'OrderedDict[str, CachedResponse]' = OrderedDict()
+        self._stats = ResponseCacheStats()
+
+    @property
+    def stats(self) -> ResponseCacheStats:
+        """Return cache metrics."""
+        return self._stats
+
+    def __len__(self) -> int:
+        """Return the number of cached responses."""
+        return len(self._entries)
+
+    async def get(self,
+                  url: str,
+                  fetch: Fetch,
+                  requestHeaders: Mapping[str, str] = None
+                  ) -> CachedResponse:
+        """Return the response to a GET of url.
+
+        fetch performs the upstream request. Cache-Control no-cache
+        and no-store in the request headers force revalidation and
+        bypass the cache, in that order.
+        """
+        request = cacheDirectives(
+            (requestHeaders or {}).get('cache-control'))
+        entry = None if 'no-store' in request else self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+            if entry.fresh and 'no-cache' not in request:
+                self._stats.hits += 1
+                self._stats.upstreamBytesSaved += len(entry.body)
+                return entry
+        conditional = {}
+        if entry is not None:
+            if 'etag' in entry.headers:
+                conditional['If-None-Match'] = entry.headers['etag']
+            if 'last-modified' in entry.headers:
+                conditional['If-Modified-Since'] = \
+                    entry.headers['last-modified']
+        status, headers, body = await fetch(url, conditional)
+        headers = {name.lower(): value for name, value in headers.items()}
+        if status == 304 and entry is not None and url in self._entries:
+            for name in REVALIDATED_HEADERS:
+                if name in headers:
+                    entry.headers[name] = headers[name]
+            entry.refresh()
+            self._stats.revalidated += 1
+            self._stats.upstreamBytesSaved += len(entry.body)
+            return entry
+        self._stats.misses += 1
+        response = CachedResponse(status, headers, body)
+        response.refresh()
+        if 'no-store' not in request:
+            self._store(url, response)
+        return response
+
+    def _storable(self, response: CachedResponse) -> bool:
+        headers = response.headers
+        directives = cacheDirectives(headers.get('cache-control'))
+        return response.status == 200 and \
+            len(response.body) <= self._maxEntryBytes and \
+            'no-store' not in directives and \
+            'private' not in directives and \
+            'vary' not in headers and 'set-cookie' not in headers and \
+            (response.fresh or 'etag' in headers or
+             'last-modified' in headers)
+
+    def _store(self, url: str, response: CachedResponse) -> None:
+        self.invalidate(url)
+        if not self._storable(response):
+            return
+        self._entries[url] = response
+        self._stats.stored += 1
+        self._stats.bytes += len(response.body)
+        while self._stats.bytes > self._maxBytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._stats.bytes -= len(evicted.body)
+            self._stats.evicted += 1
+
+    def invalidate(self, url: str) -> None:
+        """Forget the response of url, e.g. after a PUT to it."""
+        entry = self._entries.pop(url, None)
+        if entry is not None:
+            self._stats.bytes -= len(entry.body)
+
+    def notModified(self,
+                    response: CachedResponse,
+                    requestHeaders: Mapping[str, str]) -> bool:
+        """Return True if the peer already has this response.
+
+        Compares If-None-Match, or else If-Modified-Since,
+        to the response validators.
+        """
+        if response.status != 200 or not requestHeaders:
+            return False
+        headers = response.headers
+        if 'if-none-match' in requestHeaders:
+            matches = _etagMatches(requestHeaders['if-none-match'],
+                                   headers.get('etag'))
+        else:
+            since = _httpDate(requestHeaders.get('if-modified-since'))
+            lastModified = _httpDate(headers.get('last-modified'))
+            matches = since is not None and lastModified is not None and \
+                lastModified <= since
+        if matches:
+            self._stats.notModified += 1
+            self._stats.peerBytesSaved += len(response.body)
+        return matches
+
+    def clear(self) -> None:
+        """Forget all cached responses."""
+        self._entries.clear()
+        self._stats.bytes = 0
@@ -0,0 +1,118 @@
+"""Bounded inbox of received messages for pull based consumers."""
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+
+from .enums import InboxOverflowPolicy
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class InboxStats:
+    """Connection inbox metrics."""
+
+    received: int = 0
+    delivered: int = 0
+    dropped: int = 0
+    # messages currently waiting in the inbox
+    depth: int = 0
+    maxDepth: int = 0
+    # messages held back by a full inbox with the Block policy
+    backlog: int = 0
+
+
+class Inbox:
+    """Bounded FIFO of messages with an overflow policy."""
+
+    def __init__(self,
+                 maxsize: int = 1024,
+                 policy: InboxOverflowPolicy = InboxOverflowPolicy.Block):
+        """Create an inbox holding up to maxsize messages."""
+        self._maxsize = maxsize
+        self._policy = policy
+        self._messages = deque()
+        self._closed = False
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self._stats = InboxStats()
+
+    @property
+    def policy(self) -> InboxOverflowPolicy:
+        """Return the overflow policy."""
+        return self._policy
+
+    @property
+    def stats(self) -> InboxStats:
+        """Return inbox metrics."""
+        self._stats.depth = len(self._messages)
+        return self._stats
+
+    def __len__(self) -> int:
+        """Return number of waiting messages."""
+        return len(self._messages)
+
+    def full(self) -> bool:
+        """Return True if another message would overflow the inbox."""
+        return len(self._messages) >= self._maxsize
+
+    def putNowait(self, message: Any) -> bool:
+        """Add a message, applying the overflow policy if full.
+
+        Return False if the message was not added.
+        """
+        if self._closed:
+            return False
+        messages = self._messages
+        if len(messages) >= self._maxsize:
+            if self._policy == InboxOverflowPolicy.DropOldest:
+                messages.popleft()
+                self._stats.dropped += 1
+            elif self._policy == InboxOverflowPolicy.DropNewest:
+                self._stats.received += 1
+                self._stats.dropped += 1
+                return False
+            else:
+                return False
+        messages.append(message)
+        self._stats.received += 1
+        if len(messages) > self._stats.maxDepth:
+            self._stats.maxDepth = len(messages)
+        self._readable.set()
+        return True
+
+    async def put(self, message: Any) -> bool:
+        """Add a message, waiting for room with the Block policy."""
+        while self._policy == InboxOverflowPolicy.Block and \
+                self.full() and not self._closed:
+            self._writable.clear()
+            await self._writable.wait()
+        return self.putNowait(message)
+
+    async def get(self) -> Any:
+        """Remove and return the oldest message, waiting for one.
+
+        Raise ConnectionError once closed and empty.
+        """
+        messages = self._messages
+        while not messages:
+            if self._closed:
+                raise ConnectionError('Connection closed')
+            self._readable.clear()
+            await self._readable.wait()
+        message = messages.popleft()
+        self._stats.delivered += 1
+        self._writable.set()
+        return message
+
+    def close(self) -> None:
+        """Stop accepting messages and wake up all waiters.
+
+        Messages already in the inbox can still be read.
+        """
+        self._closed = True
+        self._readable.set()
+        self._writable.set()
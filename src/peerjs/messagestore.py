@@ -0,0 +1,153 @@
+"""Bounded store for signaling messages that arrive before their connection."""
+import json
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List
+
+from .servermessage import ServerMessage
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class MessageStoreStats:
+    """Early signaling message store metrics."""
+
+    stored: int = 0
+    replayed: int = 0
+    # rejected or evicted to stay within size limits
+    dropped: int = 0
+    # evicted after waiting longer than the time to live
+    expired: int = 0
+    # currently held
+    messages: int = 0
+    bytes: int = 0
+
+
+def _messageSize(message: ServerMessage) -> int:
+    """Return approximate wire size of a message in bytes."""
+    try:
+        return len(json.dumps(message.payload)) + 64
+    except (TypeError, ValueError):
+        return 1024
+
+
+class MessageStore:
+    """Hold messages for unknown connection ids until claimed.
+
+    Limits the number of messages per connection,
+    the total number and size of all messages,
+    and evicts messages older than a time to live.
+    """
+
+    def __init__(self,
+                 maxPerConnection: int = 64,
+                 maxMessages: int = 1024,
+                 maxBytes: int = 1024 * 1024,
+                 ttl: float = 30.0):
+        """Create message store."""
+        self._maxPerConnection = maxPerConnection
+        self._maxMessages = maxMessages
+        self._maxBytes = maxBytes
+        self._ttl = ttl
+        # connectionId => deque of (arrival time, size, message).
+        # Dict order is the arrival order of each connection's first message.
+        self._messages: Dict[str, deque] = {}
+        self._stats = MessageStoreStats()
+
+    @property
+    def stats(self) -> MessageStoreStats:
+        """Return store metrics."""
+        return self._stats
+
+    def __len__(self) -> int:
+        """Return number of held messages."""
+        return self._stats.messages
+
+    def __contains__(self, connectionId: str) -> bool:
+        """Return True if messages are held for a connection id."""
+        return connectionId in self._messages
+
+    def store(self, connectionId: str, message: ServerMessage) -> bool:
+        """Store a message for a connection id.
+
+        Return False if the message was dropped to stay within limits.
+        """
+        stats = self._stats
+        bucket = self._messages.get(connectionId)
+        if bucket is not None and len(bucket) >= self._maxPerConnection:
+            stats.dropped += 1
+            log.warning('Dropped early message for connection %s. '
+                        'Per connection limit %d reached.',
+                        connectionId, self._maxPerConnection)
+            return False
+        size = _messageSize(message)
+        # Make room by evicting the connections waiting the longest.
+        while stats.messages >= self._maxMessages or \
+                stats.bytes + size > self._maxBytes:
+            oldest = next((id for id in self._messages
+                           if id != connectionId), None)
+            if oldest is None:
+                stats.dropped += 1
+                return False
+            self._evict(oldest)
+        if bucket is None:
+            bucket = self._messages[connectionId] = deque()
+        bucket.append((time.monotonic(), size, message))
+        stats.stored += 1
+        stats.messages += 1
+        stats.bytes += size
+        return True
+
+    def _evict(self, connectionId: str) -> None:
+        """Drop all messages of a connection to stay within limits."""
+        bucket = self._remove(connectionId)
+        self._stats.dropped += len(bucket)
+        log.warning('Evicted %d early messages for connection %s. '
+                    'Store limits reached.', len(bucket), connectionId)
+
+    def _remove(self, connectionId: str) -> deque:
+        bucket = self._messages.pop(connectionId, None) or deque()
+        self._stats.messages -= len(bucket)
+        self._stats.bytes -= sum(size for _, size, _ in bucket)
+        return bucket
+
+    def pop(self, connectionId: str) -> List[ServerMessage]:
+        """Claim all messages of a connection in arrival order."""
+        messages = [message for _, _, message in self._remove(connectionId)]
+        self._stats.replayed += len(messages)
+        return messages
+
+    def discard(self, connectionId: str) -> None:
+        """Forget all messages of a connection."""
+        self._remove(connectionId)
+
+    def clear(self) -> None:
+        """Forget all messages."""
+        self._messages.clear()
+        self._stats.messages = 0
+        self._stats.bytes = 0
+
+    def expire(self, now: float = None) -> int:
+        """Evict messages older than the time to live.
+
+        Return the number of expired messages.
+        """
+        deadline = (now or time.monotonic()) - self._ttl
+        stats = self._stats
+        expired = 0
+        for connectionId in list(self._messages):
+            bucket = self._messages[connectionId]
+            while bucket and bucket[0][0] < deadline:
+                _, size, _ = bucket.popleft()
+                stats.messages -= 1
+                stats.bytes -= size
+                expired += 1
+            if not bucket:
+                del self._messages[connectionId]
+        stats.expired += expired
+        if expired:
+            log.debug('Expired %d early signaling messages', expired)
+        return expired
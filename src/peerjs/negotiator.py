@@ -3,12 +3,17 @@ import logging
 
 # from .dataconnection import DataConnection
 from aiortc import RTCIceCandidate, RTCPeerConnection, RTCSessionDescription
-from aiortc.sdp import candidate_from_sdp, candidate_to_sdp
+from aiortc.sdp import (
+    SessionDescription,
+    candidate_from_sdp,
+    candidate_to_sdp,
+)
 from pyee import AsyncIOEventEmitter
 # import { MediaConnection } from "./mediaconnection";
 from .enums import ConnectionEventType, ConnectionType, PeerErrorType, ServerMessageType
 from .util import util
 from .baseconnection import BaseConnection
+from .stripedchannels import stripeLabel
 
 log = logging.getLogger(__name__)
 
@@ -29,6 +34,25 @@ def object_to_dict(obj):
     return message
 
 
+def supportsTrickleIce(sdp: str) -> bool:
+    """Return True if a session description advertises trickle ICE."""
+    for line in sdp.splitlines():
+        if line.startswith('a=ice-options:') and \
+           'trickle' in line[len('a=ice-options:'):].split():
+            return True
+    return False
+
+
+def withTrickleIce(sdp: str) -> str:
+    """Advertise trickle ICE support in a session description."""
+    if supportsTrickleIce(sdp):
+        return sdp
+    media = sdp.find('\r\nm=')
+    if media < 0:
+        return sdp
+    return sdp[:media] + '\r\na=ice-options:trickle' + sdp[media:]
+
+
 class Negotiator:
     """Manages all negotiations between Peers."""
 
@@ -57,11 +81,17 @@ class Negotiator:
                 dataConnection: DataConnection = self.connection  # NOQA
                 # Pass RTCDataChannelInit dictionary
                 # https://developer.mozilla.org/en-US/docs/Web/API/RTCPeerConnection/createDataChannel#RTCDataChannelInit_dictionary
-                log.info('creating datachannel with label=%s and ordered=%s',
-                         dataConnection.label, reliable)
+                dataChannelInit = dataConnection.dataChannelInit()
+                log.info('creating datachannel with label=%s and options %r',
+                         dataConnection.label, dataChannelInit)
                 dataChannel = peerConnection.createDataChannel(
-                    dataConnection.label, ordered=reliable)
+                    dataConnection.label, **dataChannelInit)
                 await dataConnection.initialize(dataChannel)
+                # Auxiliary channels for large messages stay ordered,
+                # so that their chunks arrive in the order sent.
+                for index in range(dataConnection.stripes):
+                    dataConnection.addStripe(peerConnection.createDataChannel(
+                        stripeLabel(dataConnection.label, index)))
             await self._makeOffer()
         else:
             # receive connection offer originated by remote peer
@@ -69,9 +99,9 @@ class Negotiator:
 
     def _startPeerConnection(self) -> RTCPeerConnection:
         """Start a Peer Connection."""
-        config = self.connection.provider.options.config
-        log.debug("Creating RTCPeerConnection with config:\n%r", config)
-        peerConnection = RTCPeerConnection(config)
+        log.debug("Creating RTCPeerConnection with config:\n%r",
+                  self.connection.provider.options.config)
+        peerConnection = self.connection.provider.newPeerConnection()
         self._setupListeners(peerConnection)
         return peerConnection
 
@@ -164,7 +194,10 @@ class Negotiator:
         async def peerconn_ondatachanel(dataChannel):
             log.debug("Received data channel %r", dataChannel)
             connection = provider.getConnection(peerId, connectionId)
-            await connection.initialize(dataChannel)
+            if connection.isStripe(dataChannel.label):
+                connection.addStripe(dataChannel)
+            else:
+                await connection.initialize(dataChannel)
 
         # MEDIACONNECTION.
         log.debug("Listening for remote stream.")
@@ -205,51 +238,71 @@ class Negotiator:
         peerConnection = self.connection.peerConnection
         provider = self.connection.provider
         try:
-            offer = await peerConnection.createOffer(
-                self.connection.options.constraints)
+            offer = await peerConnection.createOffer()
             log.info("Created offer.")
-
-            if self.connection.options.sdpTransform and \
-               callable(self.connection.options.sdpTransform):
-                tSDP = self.connection.options.sdpTransform(offer.sdp)
-                if tSDP:
-                    offer.sdp = tSDP
+            sdpTransformFunction = \
+                self.connection.options.get('sdpTransform', None)
+            if sdpTransformFunction and \
+               callable(sdpTransformFunction):
+                offer.sdp = sdpTransformFunction(offer.sdp) or offer.sdp
             try:
-                await peerConnection.setLocalDescription(offer)
+                if provider.options.trickleIce:
+                    # Send the offer right away
+                    # and trickle candidates once gathered.
+                    await self._sendOffer(offer, trickle=True)
+                    await peerConnection.setLocalDescription(offer)
+                    await self._sendLocalCandidates()
+                else:
+                    log.info('Gathering ICE candidates to complete offer...')
+                    await peerConnection.setLocalDescription(offer)
+                    await self._sendOffer(peerConnection.localDescription)
                 log.info(f"Set localDescription:{offer} "
                          f"for: {self.connection.peer}")
-                payload = {
-                    'sdp': offer,
-                    'type': self.connection.type,
-                    'connectionId': self.connection.connectionId,
-                    'metadata': self.connection.metadata,
-                    'browser': util.browser
-                    }
-                if self.connection.type == ConnectionType.Data:
-                    dataConnection = self.connection
-                    payload.update({
-                        'label': dataConnection.label,
-                        'reliable': dataConnection.reliable,
-                        'serialization': dataConnection.serialization
-                        })
-                await provider.socket.send({
-                  'type': ServerMessageType.Offer.value,
-                  'payload': payload,
-                  'dst': self.connection.peer
-                })
             except Exception as err:
-                # TODO: investigate why _makeOffer
-                # is being called from the answer
-                if err != \
-                  "OperationError: Failed to set local offer sdp: " \
-                  "Called in wrong state: kHaveRemoteOffer":
-                    provider.emitError(PeerErrorType.WebRTC, err)
-                    log.debug("Failed to setLocalDescription, ", err)
+                provider.emitError(PeerErrorType.WebRTC, err)
+                log.exception("Failed to setLocalDescription, %r", err)
         except Exception as err_1:
             provider.emitError(PeerErrorType.WebRTC, err_1)
-            log.debug("Failed to createOffer, ", err_1)
+            log.exception("Failed to createOffer, %r", err_1)
 
-    async def _makeAnswer(self) -> None:
+    async def _sendOffer(self,
+                         offer: RTCSessionDescription,
+                         trickle: bool = False) -> None:
+        """Send SDP offer to the remote peer via the signaling server."""
+        json_offer = object_to_dict(offer)
+        if trickle:
+            json_offer['sdp'] = withTrickleIce(json_offer['sdp'])
+        payload = {
+            'sdp': json_offer,
+            'type': self.connection.type.value,
+            'connectionId': self.connection.connectionId,
+            'metadata': self.connection.metadata,
+            'browser': util.browser
+            }
+        if self.connection.type == ConnectionType.Data:
+            dataConnection = self.connection
+            payload.update({
+                'label': dataConnection.label,
+                'reliable': dataConnection.reliable,
+                'serialization': dataConnection.serialization
+                })
+            # Partial reliability, as the data channel was created with.
+            payload.update({
+                key: value
+                for key, value in dataConnection.dataChannelInit().items()
+                if value is not None
+                })
+            if dataConnection.stripes:
+                payload['stripes'] = dataConnection.stripes
+            if dataConnection.compressionOffer:
+                payload['compression'] = dataConnection.compressionOffer
+        await self.connection.provider.socket.send({
+          'type': ServerMessageType.Offer.value,
+          'payload': payload,
+          'dst': self.connection.peer
+        })
+
+    async def _makeAnswer(self, trickle: bool = False) -> None:
         peerConnection = self.connection.peerConnection
         provider = self.connection.provider
         try:
@@ -263,29 +316,86 @@ class Negotiator:
             log.debug('\n Created answer header: \n %r', answer)
             log.debug('\n Connection options: %r', self.connection.options)
             try:
-                log.info('Gathering ICE candidates to complete answer...')
-                await peerConnection.setLocalDescription(answer)
-                answer = peerConnection.localDescription
-                json_answer = object_to_dict(answer)
-                log.debug('\n Sending SDP ANSWER to peer id %s: \n %r ',
-                          self.connection.peer,
-                          json_answer)
-                await provider.socket.send({
-                    'type': ServerMessageType.Answer.value,
-                    'payload': {
-                        'sdp': json_answer,
-                        'type': self.connection.type.value,
-                        'connectionId': self.connection.connectionId,
-                        'browser': util.browser
-                        },
-                    'dst': self.connection.peer
-                    })
+                if trickle:
+                    # Don't hold the answer back while STUN lookups
+                    # complete, candidates follow once gathered.
+                    await self._sendAnswer(answer, trickle=True)
+                    await peerConnection.setLocalDescription(answer)
+                    await self._sendLocalCandidates()
+                else:
+                    log.info('Gathering ICE candidates to complete answer...')
+                    await peerConnection.setLocalDescription(answer)
+                    await self._sendAnswer(peerConnection.localDescription)
             except Exception as err:
                 provider.emitError(PeerErrorType.WebRTC, err)
-                log.exception("Failed to setLocalDescription, ", err)
+                log.exception("Failed to setLocalDescription, %r", err)
         except Exception as err_1:
             provider.emitError(PeerErrorType.WebRTC, err_1)
-            log.exception("Failed to create answer, ", err_1)
+            log.exception("Failed to create answer, %r", err_1)
+
+    async def _sendAnswer(self,
+                          answer: RTCSessionDescription,
+                          trickle: bool = False) -> None:
+        """Send SDP answer to the remote peer via the signaling server."""
+        json_answer = object_to_dict(answer)
+        if trickle:
+            json_answer['sdp'] = withTrickleIce(json_answer['sdp'])
+        log.debug('\n Sending SDP ANSWER to peer id %s: \n %r ',
+                  self.connection.peer,
+                  json_answer)
+        payload = {
+            'sdp': json_answer,
+            'type': self.connection.type.value,
+            'connectionId': self.connection.connectionId,
+            'browser': util.browser
+            }
+        if self.connection.type == ConnectionType.Data and \
+                self.connection.compression:
+            # the algorithm picked from the offer
+            payload['compression'] = self.connection.compression
+        await self.connection.provider.socket.send({
+            'type': ServerMessageType.Answer.value,
+            'payload': payload,
+            'dst': self.connection.peer
+            })
+
+    async def _sendLocalCandidates(self) -> None:
+        """Send gathered local ICE candidates as CANDIDATE messages.
+
+        Each media section ends with an empty candidate,
+        so the remote ICE agent knows when all pairs have failed.
+        """
+        localDescription = self.connection.peerConnection.localDescription
+        description = SessionDescription.parse(localDescription.sdp)
+        count = 0
+        for index, media in enumerate(description.media):
+            for candidate in media.ice_candidates:
+                await self._sendCandidate(
+                    'candidate:' + candidate_to_sdp(candidate),
+                    media.rtp.muxId, index)
+                count += 1
+            # end of candidates
+            await self._sendCandidate('', media.rtp.muxId, index)
+        log.debug('Trickled %d local ICE candidates to peer id %s',
+                  count, self.connection.peer)
+
+    async def _sendCandidate(self,
+                             candidate: str,
+                             sdpMid: str,
+                             sdpMLineIndex: int) -> None:
+        await self.connection.provider.socket.send({
+            'type': ServerMessageType.Candidate.value,
+            'payload': {
+                'candidate': {
+                    'candidate': candidate,
+                    'sdpMid': sdpMid,
+                    'sdpMLineIndex': sdpMLineIndex,
+                    },
+                'type': self.connection.type.value,
+                'connectionId': self.connection.connectionId,
+                },
+            'dst': self.connection.peer
+            })
 
     async def handleSDP(self,
                         type: ServerMessageType = None,
@@ -301,19 +411,31 @@ class Negotiator:
                       '\n for peer: %r',
                       type, self.connection.peer)
             if type == ServerMessageType.Offer:
-                await self._makeAnswer()
+                trickle = provider.options.trickleIce and \
+                    supportsTrickleIce(rsd.sdp)
+                await self._makeAnswer(trickle=trickle)
         except Exception as err:
             provider.emitError(PeerErrorType.WebRTC, err)
             log.exception("Failed to setRemoteDescription", err)
 
     async def handleCandidate(self, ice=None):
         """Handle new peer candidate."""
-        log.debug(f'handleCandidate:', ice)
+        log.debug('handleCandidate: %r', ice)
         candidate = ice['candidate']
-        sdpMLineIndex = ice['sdpMLineIndex']
-        sdpMid = ice['sdpMid']
         peerConnection = self.connection.peerConnection
         provider = self.connection.provider
+        if not candidate:
+            # end of candidates, ICE can stop waiting for more
+            try:
+                await peerConnection.addIceCandidate(None)
+            except Exception as err:
+                provider.emitError(PeerErrorType.WebRTC, err)
+                log.exception("Failed to handleCandidate, ", err)
+            return
+        if candidate.startswith('candidate:'):
+            candidate = candidate[len('candidate:'):]
+        sdpMLineIndex = ice['sdpMLineIndex']
+        sdpMid = ice['sdpMid']
         try:
             log.debug('Adding ICE candidate for peer id %s',
                       self.connection.peer)
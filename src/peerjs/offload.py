@@ -0,0 +1,149 @@
+"""Run serialization of large messages off the event loop."""
+import asyncio
+import bisect
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List
+
+# Upper bounds in bytes of the message size buckets, the last is open.
+SIZE_BUCKETS = (1024, 16 * 1024, 256 * 1024, 1024 * 1024,
+                4 * 1024 * 1024, 16 * 1024 * 1024)
+
+
+def messageSize(message: Any) -> int:
+    """Return the size of a received message, 0 if not text or bytes."""
+    if isinstance(message, memoryview):
+        return message.nbytes
+    if isinstance(message, (str, bytes, bytearray)):
+        return len(message)
+    return 0
+
+
+def estimateSize(value: Any, depth: int = 1) -> int:
+    """Return roughly the encoded size of value.
+
+    Strings and bytes count by length. Containers are looked into
+    depth levels deep, deeper ones count a few bytes per item.
+    """
+    cls = type(value)
+    if cls is str or cls is bytes or cls is bytearray:
+        return len(value)
+    if cls is dict:
+        items = value.values()
+    elif cls is list or cls is tuple:
+        items = value
+    elif cls is memoryview:
+        return value.nbytes
+    else:
+        return 8
+    if not depth:
+        return 32 * len(items)
+    size = 8 * len(items)
+    depth -= 1
+    for item in items:
+        cls = type(item)
+        if cls is str or cls is bytes:
+            size += len(item)
+        elif cls is dict or cls is list or cls is tuple or \
+                cls is bytearray or cls is memoryview:
+            size += estimateSize(item, depth)
+    return size
+
+
+@dataclass
+class TimingHistogram:
+    """Time spent on one operation, by message size."""
+
+    # calls and seconds per size bucket, see SIZE_BUCKETS
+    counts: List[int] = field(
+        default_factory=lambda: [0] * (len(SIZE_BUCKETS) + 1))
+    seconds: List[float] = field(
+        default_factory=lambda: [0.0] * (len(SIZE_BUCKETS) + 1))
+    # calls run in the executor
+    offloaded: int = 0
+
+    def observe(self, size: int, seconds: float) -> None:
+        """Count a call on a message of size bytes."""
+        bucket = bisect.bisect_left(SIZE_BUCKETS, size)
+        self.counts[bucket] += 1
+        self.seconds[bucket] += seconds
+
+    @property
+    def meanSeconds(self) -> List[float]:
+        """Return the mean time of a call per size bucket."""
+        return [seconds / count if count else 0.0
+                for count, seconds in zip(self.counts, self.seconds)]
+
+
+class Offloader:
+    """Run calls on large messages in an executor, small ones inline.
+
+    Codec calls go to the executor, a thread pool by default. There,
+    pure Python codecs like BinaryPack give the event loop its turn
+    every few milliseconds. C JSON engines hold the GIL while they
+    run, and a ProcessPoolExecutor spends about as long pickling the
+    message on the event loop, so large JSON still stalls it, if for
+    shorter spells. Compression always runs in the default thread
+    pool, as zlib releases the GIL. Timing histograms per codec and
+    operation help to pick the size threshold.
+    """
+
+    def __init__(self,
+                 threshold: int = 1024 * 1024,
+                 executor: Executor = None):
+        """Create offloader, threshold 0 keeps every call inline."""
+        self._threshold = threshold
+        self._executor = executor
+        self._processes = isinstance(executor, ProcessPoolExecutor)
+        self._timings: Dict[str, TimingHistogram] = {}
+
+    @property
+    def threshold(self) -> int:
+        """Return the message size from which calls are offloaded."""
+        return self._threshold
+
+    @property
+    def timings(self) -> Dict[str, TimingHistogram]:
+        """Return timing histograms by '<codec> <operation>'."""
+        return self._timings
+
+    def offloads(self, size: int) -> bool:
+        """Return True if a call on a message of this size is offloaded."""
+        return 0 < self._threshold <= size
+
+    def _timing(self, key: str) -> TimingHistogram:
+        timing = self._timings.get(key)
+        if timing is None:
+            timing = self._timings[key] = TimingHistogram()
+        return timing
+
+    def measure(self, key: str, size: int,
+                func: Callable, *args) -> Any:
+        """Call func inline and record the time it took."""
+        started = time.perf_counter()
+        result = func(*args)
+        self._timing(key).observe(size, time.perf_counter() - started)
+        return result
+
+    async def call(self, key: str, size: int, func: Callable, *args,
+                   threads: bool = False) -> Any:
+        """Call func, in the executor if size is above the threshold.
+
+        With threads True, use the default thread pool instead.
+        Arguments are picklable for a process pool, memoryviews
+        are copied to bytes.
+        """
+        if not self.offloads(size):
+            return self.measure(key, size, func, *args)
+        executor = None if threads else self._executor
+        if executor is not None and self._processes:
+            args = tuple(arg.tobytes() if isinstance(arg, memoryview)
+                         else arg for arg in args)
+        started = time.perf_counter()
+        result = await asyncio.get_event_loop().run_in_executor(
+            executor, func, *args)
+        timing = self._timing(key)
+        timing.observe(size, time.perf_counter() - started)
+        timing.offloaded += 1
+        return result
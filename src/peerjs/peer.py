@@ -4,14 +4,18 @@
 # from websockets import WebSocket, ConnectionClosed
 import asyncio
 import logging
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
 from typing import Any, List
 import traceback
 
+import aiohttp
+from aiortc import RTCPeerConnection
 from pyee import AsyncIOEventEmitter
 
 from .api import API
 from .baseconnection import BaseConnection
+from .certificatecache import CertificateCache, CertificateCacheStats
+from .connectionregistry import ConnectionRegistry
 from .dataconnection import DataConnection
 from .enums import (
     ConnectionType,
@@ -20,8 +24,11 @@ from .enums import (
     ServerMessageType,
     SocketEventType,
 )
+from .messagestore import MessageStore, MessageStoreStats
+from .peerconnectionpool import PeerConnectionPool, PeerConnectionPoolStats
 from .servermessage import ServerMessage
-from .socket import Socket
+from .socket import DEFAULT_SEND_QUEUE_SIZE, ReconnectStats, Socket
+from .stuncache import StunCache, StunCacheStats
 from .util import util
 
 log = logging.getLogger(__name__)
@@ -35,6 +42,19 @@ class PeerConnectOption:
     metadata: Any = None
     serialization: str = None
     reliable: bool = None
+    # Data channel delivery, as in RTCDataChannelInit.
+    # ordered defaults to reliable. At most one of maxRetransmits
+    # and maxPacketLifeTime (milliseconds) limits retransmissions,
+    # for data like live sensor readings that is useless once stale.
+    ordered: bool = None
+    maxRetransmits: int = None
+    maxPacketLifeTime: int = None
+    # Offer zlib compression of large messages, for peerjs-python peers.
+    compression: bool = False
+    # Auxiliary data channels striping large binary messages.
+    # The remote peer must be peerjs-python, as PeerJS in the browser
+    # takes every data channel for the connection itself.
+    stripes: int = 0
 
 
 PEER_DEFAULT_KEY = "peerjs"
@@ -52,6 +72,40 @@ class PeerOptions:
     config: Any = field(default_factory=lambda: util.defaultConfig)
     secure: bool = False
     pingInterval: int = 5  # ping to signaling server in seconds
+    # max signaling messages waiting to be sent to the server
+    sendQueueSize: int = DEFAULT_SEND_QUEUE_SIZE
+    # reconnect to the signaling server when the websocket drops,
+    # keeping all peer connections alive
+    reconnect: bool = True
+    reconnectDelay: float = 0.1  # initial backoff in seconds
+    reconnectMaxDelay: float = 10.0  # backoff cap in seconds
+    reconnectAttempts: int = 10
+    # permessage-deflate on the signaling websocket
+    signalingCompression: bool = True
+    # send SDP before ICE gathering completes and trickle candidates;
+    # answers fall back to full gathering for remote peers
+    # that do not advertise trickle support; off by default, as peers
+    # before end-of-candidates support wait on failed ICE forever
+    trickleIce: bool = False
+    # limits for signaling messages that arrive before their connection
+    lostMessagesPerConnection: int = 64
+    lostMessagesMax: int = 1024
+    lostMessagesMaxBytes: int = 1024 * 1024
+    lostMessagesTtl: float = 30.0  # seconds
+    housekeepingInterval: float = 5.0  # seconds
+    # RTCPeerConnection objects kept ready ahead of new connections,
+    # 0 builds each one on demand
+    peerConnectionPoolSize: int = 0
+    # seconds before an unused pooled connection is replaced
+    peerConnectionPoolMaxIdle: float = 60.0
+    # seconds one DTLS certificate is reused across peer connections,
+    # 0 generates one per connection
+    certificateLifetime: float = 24 * 3600
+    # PEM file keeping the certificate across restarts
+    certificatePath: str = None
+    # seconds STUN server addresses and our public address are cached,
+    # 0 leaves STUN entirely to ICE gathering
+    stunCacheTtl: float = 300.0
 
 
 class Peer(AsyncIOEventEmitter):
@@ -59,8 +113,16 @@ class Peer(AsyncIOEventEmitter):
 
     def __init__(self,
                  id: str = None,
-                 peer_options: PeerOptions = None):
-        """Create a peer instance."""
+                 peer_options: PeerOptions = None,
+                 http_session: aiohttp.ClientSession = None,
+                 housekeeping: bool = True):
+        """Create a peer instance.
+
+        Pass an http_session to share its connection pool
+        with other peers, e.g. in a PeerPool.
+        With housekeeping False, the owner is expected to call
+        housekeep() periodically instead of the peer's own timer.
+        """
         super().__init__()
 
         # Configure options
@@ -80,11 +142,41 @@ class Peer(AsyncIOEventEmitter):
         # When True, websocket to signaling server is open.
         self._open = False
         # All direct peer connections from this peer.
-        self._connections: dict = {}
+        self._connections = ConnectionRegistry()
         # Messages received from the signaling server
-        # waiting to be sent out to remote peers.
-        # dic: connectionId => [list of server messages]
-        self._lostMessages: dict = {}
+        # for connections that are not set up yet.
+        self._lostMessages = MessageStore(
+            maxPerConnection=self._options.lostMessagesPerConnection,
+            maxMessages=self._options.lostMessagesMax,
+            maxBytes=self._options.lostMessagesMaxBytes,
+            ttl=self._options.lostMessagesTtl)
+        # DTLS certificate shared by this peer's connections.
+        self._certificates: CertificateCache = None
+        if self._options.certificateLifetime > 0:
+            self._certificates = CertificateCache(
+                lifetime=self._options.certificateLifetime,
+                path=self._options.certificatePath)
+        # Resolved STUN servers and the public address they report.
+        self._stunCache: StunCache = None
+        if self._options.stunCacheTtl > 0:
+            self._stunCache = StunCache(ttl=self._options.stunCacheTtl)
+        # Pre-built RTCPeerConnections, created on start if enabled.
+        self._peerConnections: PeerConnectionPool = None
+        # Periodic maintenance task, unless driven by a PeerPool.
+        self._ownsHousekeeping = housekeeping
+        self._housekeeper: asyncio.Task = None
+        # Precompiled dispatch table for messages from the signaling server.
+        # Types not listed here belong to a peer connection.
+        self._serverMessageHandlers = {
+            ServerMessageType.Open: self._onServerOpen,
+            ServerMessageType.Error: self._onServerError,
+            ServerMessageType.IdTaken: self._onServerIdTaken,
+            ServerMessageType.InvalidKey: self._onServerInvalidKey,
+            ServerMessageType.Leave: self._onServerLeave,
+            ServerMessageType.Expire: self._onServerExpire,
+            ServerMessageType.Offer: self._onServerOffer,
+            ServerMessageType.Heartbeat: self._onServerHeartbeat,
+        }
 
         self._id = id
 
@@ -95,7 +187,7 @@ class Peer(AsyncIOEventEmitter):
             if self._options.path[len(self._options.path) - 1] != "/":
                 self._options.path += "/"
 
-        self._api = API(self._options)
+        self._api = API(self._options, http_session=http_session)
 
     async def start(self):
         """Activate Peer instance."""
@@ -115,6 +207,17 @@ class Peer(AsyncIOEventEmitter):
                 await self._abort(PeerErrorType.ServerError, e)
                 return
         await self.socket.start(self._id, self._options.token)
+        if self._stunCache:
+            self._stunCache.update(self._options.config)
+        if self._options.peerConnectionPoolSize > 0 and \
+                not self._peerConnections:
+            self._peerConnections = PeerConnectionPool(
+                self._buildPeerConnection,
+                size=self._options.peerConnectionPoolSize,
+                maxIdle=self._options.peerConnectionPoolMaxIdle)
+            self._peerConnections.fill()
+        if self._ownsHousekeeping and not self._housekeeper:
+            self._housekeeper = asyncio.create_task(self._housekeeping())
         log.info('Peer started with UUID: %s', self._id)
 
     @property
@@ -137,24 +240,50 @@ class Peer(AsyncIOEventEmitter):
         """Return peer's websocket wrapper for the signaling connection."""
         return self._socket
 
+    @property
+    def reconnectStats(self) -> ReconnectStats:
+        """Return signaling server reconnect metrics."""
+        return self._socket.reconnectStats if self._socket else None
+
+    @property
+    def peerConnectionPoolStats(self) -> PeerConnectionPoolStats:
+        """Return pre-built peer connection metrics or None if disabled."""
+        return self._peerConnections.stats if self._peerConnections else None
+
+    def newPeerConnection(self) -> RTCPeerConnection:
+        """Return a new RTCPeerConnection for a direct connection."""
+        if self._peerConnections:
+            return self._peerConnections.take()
+        return self._buildPeerConnection()
+
+    def _buildPeerConnection(self) -> RTCPeerConnection:
+        """Build an RTCPeerConnection with the shared caches applied."""
+        config = self._options.config
+        if self._stunCache:
+            config = self._stunCache.apply(config)
+        if self._certificates:
+            return self._certificates.createPeerConnection(config)
+        return RTCPeerConnection(config)
+
+    @property
+    def stunCacheStats(self) -> StunCacheStats:
+        """Return STUN cache metrics or None if disabled."""
+        return self._stunCache.stats if self._stunCache else None
+
+    @property
+    def certificateStats(self) -> CertificateCacheStats:
+        """Return DTLS certificate cache metrics or None if disabled."""
+        return self._certificates.stats if self._certificates else None
+
     @property
     def http_api(self):
         """Return peer's active http API resource."""
         return self._api
     
-    # #
-    #  * @deprecated
-    #  * Return type will change from Object to Map<string,[]>
-    #  */
-    # get connections(): Object {
-    #   const plainConnections = Object.create(null);
-    #
-    #   for (let [k, v] of this._connections) {
-    #     plainConnections[k] = v;
-    #   }
-    #
-    #   return plainConnections;
-    # }
+    @property
+    def connections(self) -> ConnectionRegistry:
+        """Return registry of all direct peer connections."""
+        return self._connections
 
     @property
     def destroyed(self):
@@ -173,7 +302,13 @@ class Peer(AsyncIOEventEmitter):
             self._options.port,
             self._options.path,
             self._options.key,
-            self._options.pingInterval)
+            self._options.pingInterval,
+            self._options.sendQueueSize,
+            self._options.reconnect,
+            self._options.reconnectDelay,
+            self._options.reconnectMaxDelay,
+            self._options.reconnectAttempts,
+            self._options.signalingCompression)
 
         @socket.on(SocketEventType.Message)
         async def on_message(data: ServerMessage):
@@ -190,6 +325,16 @@ class Peer(AsyncIOEventEmitter):
             self.emitError(PeerErrorType.Network, "Lost connection to server.")
             await self.disconnect()
 
+        @socket.on(SocketEventType.Reconnecting)
+        def on_reconnecting():
+            # P2P connections stay up while the signaling link heals.
+            log.info('Lost signaling server connection. Reconnecting.')
+            self._open = False
+
+        @socket.on(SocketEventType.Reconnected)
+        def on_reconnected(elapsed: float):
+            self.emit(PeerEventType.Reconnected, self._lastServerId, elapsed)
+
         @socket.on(SocketEventType.Close)
         async def on_close():
             if self.disconnected:
@@ -200,81 +345,72 @@ class Peer(AsyncIOEventEmitter):
 
     async def _handleMessage(self, message: ServerMessage) -> None:
         """Handle messages from the server."""
-        type = message.type
-        peerId = message.src
-        payload = message.payload
-
         log.debug('\n Handling server message \n type %s, '
-                  '\n source peer/client id %s, \n message payload %s, '
-                  '\n full message %r',
-                  type, peerId, payload, message)
-
-        server_messenger = AsyncIOEventEmitter()
-
-        # The connection to the server is open.
-        @server_messenger.once(ServerMessageType.Open)
-        def _on_server_open():
-            self._lastServerId = self.id
-            self._open = True
-            log.info('Signaling server connection open.')
-            self.emit(PeerEventType.Open, self.id)
-
-        # Server error.
-        @server_messenger.once(ServerMessageType.Error)
-        async def _on_server_error():
-            await self._abort(PeerErrorType.ServerError, payload.msg)
-
-        # The selected ID is taken.
-        @server_messenger.once(ServerMessageType.IdTaken)
-        async def _on_server_idtaken():
-            await self._abort(PeerErrorType.UnavailableID,
-                              f'ID "${self.id}" is taken')
-
-        # The given API key cannot be found.
-        @server_messenger.once(ServerMessageType.InvalidKey)
-        async def _on_server_invalidkey():
-            await self._abort(PeerErrorType.InvalidKey,
-                              f'API KEY "${self._options.key}" is invalid')
-
-        # Another peer has closed its connection to this peer.
-        @server_messenger.once(ServerMessageType.Leave)
-        async def _on_server_leave():
-            log.debug(f'Received leave message from ${peerId}')
-            await self._cleanupPeer(peerId)
-            self._connections.delete(peerId)
-
-        # The offer sent to a peer has expired without response.
-        @server_messenger.once(ServerMessageType.Expire)
-        def _on_server_expire():
-            self.emitError(PeerErrorType.PeerUnavailable,
-                           f'Could not connect to peer ${peerId}')
-
-        # Server relaying offer for a direct connection from a remote peer
-        @server_messenger.once(ServerMessageType.Offer)
-        async def _on_server_offer():
-            await self._handle_offer(peerId, payload)
-
-        # Something went wrong during emit message handling
-        # @server_messenger.once('error')
-        # def on_error(error_message):
-        #     log.error('Error on server message emit: %r', error_message)
-
-        is_handled = server_messenger.emit(type)
-        if not is_handled:
-            if not payload:
-                log.warn(f'You received a malformed message '
-                         f'from ${peerId} of type ${type}')
-                return
-            connectionId = payload['connectionId']
-            connection = self.getConnection(peerId, connectionId)
-            if connection and connection.peerConnection:
-                # Pass it on.
-                await connection.handleMessage(message)
-            elif connectionId:
-                # Store for possible later use
-                self._storeMessage(connectionId, message)
-            else:
-                log.warn("You received an unrecognized message:", message)
+                  '\n source peer/client id %s, \n message payload %s',
+                  message.type, message.src, message.payload)
+        handler = self._serverMessageHandlers.get(
+            message.type, self._onConnectionMessage)
+        await handler(message.src, message.payload, message)
+
+    # Handlers for server message types,
+    # dispatched via the table built in __init__.
+
+    async def _onServerOpen(self, peerId, payload, message) -> None:
+        """The connection to the server is open."""
+        self._lastServerId = self.id
+        self._open = True
+        log.info('Signaling server connection open.')
+        self.emit(PeerEventType.Open, self.id)
+
+    async def _onServerError(self, peerId, payload, message) -> None:
+        """Server error."""
+        msg = payload.get('msg') if isinstance(payload, dict) else payload
+        await self._abort(PeerErrorType.ServerError, msg)
+
+    async def _onServerIdTaken(self, peerId, payload, message) -> None:
+        """The selected ID is taken."""
+        await self._abort(PeerErrorType.UnavailableID,
+                          f'ID "{self.id}" is taken')
+
+    async def _onServerInvalidKey(self, peerId, payload, message) -> None:
+        """The given API key cannot be found."""
+        await self._abort(PeerErrorType.InvalidKey,
+                          f'API KEY "{self._options.key}" is invalid')
+
+    async def _onServerLeave(self, peerId, payload, message) -> None:
+        """Another peer has closed its connection to this peer."""
+        log.debug('Received leave message from %s', peerId)
+        await self._cleanupPeer(peerId)
+        self._connections.removePeer(peerId)
+
+    async def _onServerExpire(self, peerId, payload, message) -> None:
+        """The offer sent to a peer has expired without response."""
+        self.emitError(PeerErrorType.PeerUnavailable,
+                       f'Could not connect to peer {peerId}')
+
+    async def _onServerOffer(self, peerId, payload, message) -> None:
+        """Server relaying offer for a direct connection from a remote peer."""
+        await self._handle_offer(peerId, payload)
+
+    async def _onServerHeartbeat(self, peerId, payload, message) -> None:
+        """Heartbeats keep the signaling link alive. Nothing to do."""
+
+    async def _onConnectionMessage(self, peerId, payload, message) -> None:
+        """Pass a message on to the connection it belongs to."""
+        if not payload:
+            log.warning('You received a malformed message '
+                        'from %s of type %s', peerId, message.type)
+            return
+        connectionId = payload.get('connectionId')
+        connection = self.getConnection(peerId, connectionId)
+        if connection and connection.peerConnection:
+            # Pass it on.
+            await connection.handleMessage(message)
+        elif connectionId:
+            # Store for possible later use
+            self._storeMessage(connectionId, message)
+        else:
+            log.warning("You received an unrecognized message: %r", message)
 
     async def _handle_offer(self, peerId=None, payload=None):
         """Handle remote peer offer for a direct connection."""
@@ -310,6 +446,11 @@ class Peer(AsyncIOEventEmitter):
                 label=payload['label'],
                 serialization=payload['serialization'],
                 reliable=payload['reliable'],
+                ordered=payload.get('ordered', None),
+                maxRetransmits=payload.get('maxRetransmits', None),
+                maxPacketLifeTime=payload.get('maxPacketLifeTime', None),
+                stripes=payload.get('stripes', 0),
+                compression=payload.get('compression', None),
                 _payload=payload,
                 metadata=payload.get('metadata', None)
                 )
@@ -329,15 +470,38 @@ class Peer(AsyncIOEventEmitter):
     def _storeMessage(self,
                       connectionId: str, message: ServerMessage) -> None:
         """Store messages without a set up connection, to be claimed later."""
-        if connectionId not in self._lostMessages:
-            self._lostMessages[connectionId] = []
-        message_list = self._lostMessages.get(connectionId)
-        message_list.append(message)
+        self._lostMessages.store(connectionId, message)
 
     def _getMessages(self, connectionId: str) -> List[ServerMessage]:
         """Retrieve messages from lost message store."""
-        messages = self._lostMessages.pop(connectionId, [])
-        return messages
+        return self._lostMessages.pop(connectionId)
+
+    @property
+    def lostMessageStats(self) -> MessageStoreStats:
+        """Return metrics of messages held for unknown connections."""
+        return self._lostMessages.stats
+
+    def housekeep(self) -> None:
+        """Run periodic maintenance."""
+        self._lostMessages.expire()
+        for connection in self._connections:
+            connection.housekeep()
+        if self._stunCache and self._stunCache.checkNetwork():
+            self._stunCache.update(self._options.config)
+            if self._peerConnections:
+                # pooled connections gathered candidates on the old network
+                self._peerConnections.expire(float('inf'))
+        if self._peerConnections:
+            self._peerConnections.expire()
+
+    async def _housekeeping(self) -> None:
+        """Timer driving periodic maintenance."""
+        try:
+            while True:
+                await asyncio.sleep(self._options.housekeepingInterval)
+                self.housekeep()
+        except asyncio.CancelledError:
+            log.debug('Peer housekeeping cancelled.')
 
     async def connect(self,
                       peer: str,
@@ -361,7 +525,9 @@ class Peer(AsyncIOEventEmitter):
             )
             return
 
-        dataConnection = DataConnection(peer, self, options)
+        if isinstance(options, PeerConnectOption):
+            options = asdict(options)
+        dataConnection = DataConnection(peer, self, **options)
         await dataConnection.start()
         self._addConnection(peer, dataConnection)
         return dataConnection
@@ -406,36 +572,23 @@ class Peer(AsyncIOEventEmitter):
     def _addConnection(self,
                        peerId: str, connection: BaseConnection) -> None:
         """Add a data/media connection to this peer."""
-        log.debug(f"add connection ${connection.type}:"
-                  f"${connection.connectionId} to peerId:${peerId}")
-        if peerId not in self._connections:
-            self._connections[peerId] = []
-        self._connections[peerId].append(connection)
+        log.debug("add connection %s:%s to peerId:%s",
+                  connection.type, connection.connectionId, peerId)
+        self._connections.add(peerId, connection)
 
     def _removeConnection(self, connection: BaseConnection) -> None:
-        connections = self._connections.get(connection.peer, None)
-        if connections:
-            try:
-                connections.remove(connection)
-            except ValueError as err:
-                log.warning('Error removing connection peer id %s. '
-                            'Connection not found in managed connections list.'
-                            '\n%r',
-                            connection.peer, err)
+        if not self._connections.remove(connection):
+            log.warning('Error removing connection peer id %s. '
+                        'Connection not found in managed connections.',
+                        connection.peer)
         # remove from lost messages
-        self._lostMessages.pop(connection.connectionId, None)
+        self._lostMessages.discard(connection.connectionId)
 
     def getConnection(self,
                       peerId: str,
                       connectionId: str) -> BaseConnection:
         """Retrieve a data/media connection for this peer."""
-        connections = self._connections.get(peerId, None)
-        if not connections:
-            return None
-        for connection in connections:
-            if connection.connectionId == connectionId:
-                return connection
-        return None
+        return self._connections.get(peerId, connectionId)
 
     async def _delayedAbort(self, type: PeerErrorType, message: str) -> None:
         asyncio.asyncio.create_task(self._abort(type, message))
@@ -488,21 +641,24 @@ class Peer(AsyncIOEventEmitter):
 
     async def _cleanup(self) -> None:
         """Disconnects every connection on this peer."""
-        # we need to iterate over a copy
-        # in order to remove elements from the original dict
-        keys_copy = list(self._connections.keys())
-        for peerId in keys_copy:
+        for peerId in self._connections.peerIds():
             await self._cleanupPeer(peerId)
-            self._connections.pop(peerId, None)
+            self._connections.removePeer(peerId)
         self.socket.remove_all_listeners()
+        if self._housekeeper:
+            self._housekeeper.cancel()
+            self._housekeeper = None
+        self._lostMessages.clear()
+        if self._peerConnections:
+            await self._peerConnections.close()
+            self._peerConnections = None
+        if self._stunCache:
+            self._stunCache.close()
         await self._api.close()
 
     async def _cleanupPeer(self, peerId: str) -> None:
         """Close all connections to this peer."""
-        connections = self._connections.get(peerId)
-        if not connections:
-            return
-        for connection in connections:
+        for connection in self._connections.forPeer(peerId):
             await connection.close()
 
     async def disconnect(self) -> None:
@@ -0,0 +1,157 @@
+"""Pool of pre-built RTCPeerConnection objects for fast offer handling."""
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable
+
+from aiortc import RTCPeerConnection
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class PeerConnectionPoolStats:
+    """Peer connection pool metrics."""
+
+    # connections served from the pool
+    hits: int = 0
+    # connections built on demand because the pool was empty
+    misses: int = 0
+    # connections built by the background refill
+    created: int = 0
+    # pooled connections closed unused, e.g. after idling too long
+    discarded: int = 0
+    # currently pooled
+    available: int = 0
+
+    @property
+    def hitRate(self) -> float:
+        """Return share of requests served from the pool."""
+        total = self.hits + self.misses
+        return self.hits / total if total else None
+
+
+class PeerConnectionPool:
+    """Keep RTCPeerConnection objects ready for new data connections.
+
+    Pooled connections have their DTLS certificate generated,
+    their SCTP transport created and local ICE candidates gathered,
+    so answering an offer does not pay for any of it.
+    The pool refills in the background. Connections are handed out
+    unused and never returned. Pooled connections idle longer than
+    maxIdle seconds are replaced on expire(), as their gathered
+    candidates may be stale.
+    """
+
+    def __init__(self,
+                 factory: Callable[[], RTCPeerConnection] = RTCPeerConnection,
+                 size: int = 2,
+                 maxIdle: float = 60.0,
+                 refillDelay: float = 0.1):
+        """Create a pool of size connections built by factory.
+
+        Refills start refillDelay seconds after a connection is taken,
+        to stay off the event loop while that connection negotiates.
+        """
+        self._factory = factory
+        self._size = size
+        self._maxIdle = maxIdle
+        self._refillDelay = refillDelay
+        # (time built, connection) in build order
+        self._available: deque = deque()
+        # expired connections waiting to be closed by the refill task
+        self._stale: list = []
+        self._refiller: asyncio.Task = None
+        self._closed = False
+        self._stats = PeerConnectionPoolStats()
+
+    @property
+    def stats(self) -> PeerConnectionPoolStats:
+        """Return pool metrics."""
+        self._stats.available = len(self._available)
+        return self._stats
+
+    def __len__(self) -> int:
+        """Return number of pooled connections."""
+        return len(self._available)
+
+    async def _prewarm(self) -> RTCPeerConnection:
+        """Build a connection with its data transport ready."""
+        peerConnection = self._factory()
+        # aiortc creates the SCTP transport lazily on the first data channel
+        # or remote offer. It has no public way to do it ahead of time.
+        createSctpTransport = getattr(
+            peerConnection, '_RTCPeerConnection__createSctpTransport', None)
+        if createSctpTransport:
+            createSctpTransport()
+            await peerConnection.sctp.transport.transport.iceGatherer.gather()
+        return peerConnection
+
+    def take(self) -> RTCPeerConnection:
+        """Return a fresh peer connection, pooled if one is ready."""
+        if self._available:
+            _, peerConnection = self._available.popleft()
+            self._stats.hits += 1
+        else:
+            peerConnection = self._factory()
+            self._stats.misses += 1
+            log.debug('Peer connection pool empty. Built one on demand.')
+        self.fill(self._refillDelay)
+        return peerConnection
+
+    def fill(self, delay: float = 0) -> None:
+        """Start refilling the pool in the background if needed."""
+        if self._closed or \
+                (len(self._available) >= self._size and not self._stale):
+            return
+        if self._refiller is None or self._refiller.done():
+            self._refiller = asyncio.create_task(self._refill(delay))
+
+    async def _refill(self, delay: float = 0) -> None:
+        """Build connections one at a time until the pool is full."""
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            while self._stale:
+                await self._stale.pop().close()
+            while not self._closed and len(self._available) < self._size:
+                peerConnection = await self._prewarm()
+                if self._closed:
+                    await peerConnection.close()
+                    break
+                self._available.append((time.monotonic(), peerConnection))
+                self._stats.created += 1
+        except asyncio.CancelledError:
+            log.debug('Peer connection pool refill cancelled.')
+        except Exception as err:
+            log.warning('Error pre-building peer connection: %r', err)
+
+    def expire(self, now: float = None) -> int:
+        """Replace connections idle longer than maxIdle in the background.
+
+        Return the number of discarded connections.
+        """
+        deadline = (now or time.monotonic()) - self._maxIdle
+        expired = 0
+        while self._available and self._available[0][0] < deadline:
+            _, peerConnection = self._available.popleft()
+            self._stale.append(peerConnection)
+            self._stats.discarded += 1
+            expired += 1
+        self.fill()
+        return expired
+
+    async def close(self) -> None:
+        """Stop refilling and close all pooled connections."""
+        self._closed = True
+        if self._refiller:
+            self._refiller.cancel()
+            self._refiller = None
+        while self._stale:
+            await self._stale.pop().close()
+        while self._available:
+            _, peerConnection = self._available.popleft()
+            self._stats.discarded += 1
+            await peerConnection.close()
@@ -0,0 +1,196 @@
+"""Host many peer identities on one event loop with shared resources."""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, Iterator
+
+import aiohttp
+
+from .peer import Peer, PeerOptions
+from .util import util
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class PeerPoolStats:
+    """Pool wide peer metrics."""
+
+    peers: int = 0
+    # peers with an open signaling server connection
+    open: int = 0
+    # direct peer connections across all peers
+    connections: int = 0
+    started: int = 0
+    failedStarts: int = 0
+    removed: int = 0
+    signalingReconnects: int = 0
+    # seconds spent in Peer.start()
+    lastStartupTime: float = None
+    totalStartupTime: float = 0.0
+
+    @property
+    def avgStartupTime(self) -> float:
+        """Return average Peer.start() time in seconds."""
+        return self.totalStartupTime / self.started if self.started else None
+
+
+class PeerPool:
+    """Manage many Peer instances sharing one set of resources.
+
+    All peers share one aiohttp connection pool and DNS cache
+    for REST calls to the signaling server, the ICE configuration
+    of the pool's peer options and a single housekeeping timer.
+    Signaling websockets are uncompressed by default to keep
+    per identity memory low.
+    """
+
+    def __init__(self,
+                 peer_options: PeerOptions = None,
+                 connectionLimit: int = 100,
+                 dnsCacheTtl: int = 300,
+                 housekeepingInterval: float = 5.0,
+                 signalingCompression: bool = False):
+        """Create a peer pool.
+
+        peer_options is the template for pooled peers.
+        Its config (ICE servers) object is shared, not copied.
+        """
+        self._options: PeerOptions = peer_options or PeerOptions()
+        self._connectionLimit = connectionLimit
+        self._dnsCacheTtl = dnsCacheTtl
+        self._housekeepingInterval = housekeepingInterval
+        self._signalingCompression = signalingCompression
+        self._http_session: aiohttp.ClientSession = None
+        self._housekeeper: asyncio.Task = None
+        # peer id => Peer
+        self._peers: Dict[str, Peer] = {}
+        self._stats = PeerPoolStats()
+
+    @property
+    def http_session(self) -> aiohttp.ClientSession:
+        """Return the http session shared by all pooled peers."""
+        if self._http_session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self._connectionLimit,
+                ttl_dns_cache=self._dnsCacheTtl)
+            self._http_session = aiohttp.ClientSession(connector=connector)
+        return self._http_session
+
+    def _createPeer(self,
+                    id: str = None,
+                    peer_options: PeerOptions = None) -> Peer:
+        """Create a peer bound to the shared resources.
+
+        The peer has no housekeeping timer of its own,
+        addPeer tracks it for the pool's timer.
+
+        Each peer gets its own copy of the options
+        and its own session token unless one is given.
+        The pool's signalingCompression only applies
+        to peers created from the pool's options.
+        """
+        if peer_options is None:
+            options = replace(
+                self._options,
+                signalingCompression=self._signalingCompression)
+        else:
+            options = replace(peer_options)
+        if not options.token:
+            options.token = util.randomToken()
+        return Peer(id=id, peer_options=options,
+                    http_session=self.http_session,
+                    housekeeping=False)
+
+    async def addPeer(self,
+                      id: str = None,
+                      peer_options: PeerOptions = None) -> Peer:
+        """Create, start and track a peer.
+
+        Return the started peer, or None if it failed to start.
+        """
+        peer = self._createPeer(id, peer_options)
+        started = time.perf_counter()
+        try:
+            await peer.start()
+        except Exception as err:
+            log.exception('Error starting pooled peer %s: %r', id, err)
+            await peer.destroy()
+        elapsed = time.perf_counter() - started
+        if peer.destroyed or not peer.id:
+            self._stats.failedStarts += 1
+            return None
+        self._stats.started += 1
+        self._stats.lastStartupTime = elapsed
+        self._stats.totalStartupTime += elapsed
+        self._peers[peer.id] = peer
+        if self._housekeeper is None:
+            self._housekeeper = asyncio.create_task(self._housekeeping())
+        log.debug('Pooled peer %s started in %.3f seconds', peer.id, elapsed)
+        return peer
+
+    def getPeer(self, id: str) -> Peer:
+        """Return pooled peer by id or None."""
+        return self._peers.get(id)
+
+    async def removePeer(self, id: str) -> None:
+        """Destroy a pooled peer and stop tracking it."""
+        peer = self._peers.pop(id, None)
+        if peer:
+            await peer.destroy()
+            self._stats.removed += 1
+
+    def __len__(self) -> int:
+        """Return number of pooled peers."""
+        return len(self._peers)
+
+    def __iter__(self) -> Iterator[Peer]:
+        """Iterate over pooled peers."""
+        return iter(list(self._peers.values()))
+
+    @property
+    def stats(self) -> PeerPoolStats:
+        """Return pool wide peer metrics."""
+        stats = self._stats
+        stats.peers = len(self._peers)
+        stats.open = 0
+        stats.connections = 0
+        stats.signalingReconnects = 0
+        for peer in self._peers.values():
+            if peer.open:
+                stats.open += 1
+            stats.connections += len(peer.connections)
+            if peer.reconnectStats:
+                stats.signalingReconnects += peer.reconnectStats.reconnects
+        return stats
+
+    def _housekeep(self) -> None:
+        """Run periodic maintenance for all pooled peers."""
+        for id, peer in list(self._peers.items()):
+            if peer.destroyed:
+                log.debug('Dropping destroyed peer %s from pool', id)
+                del self._peers[id]
+                self._stats.removed += 1
+            else:
+                peer.housekeep()
+
+    async def _housekeeping(self) -> None:
+        """Shared timer driving maintenance of all pooled peers."""
+        try:
+            while True:
+                await asyncio.sleep(self._housekeepingInterval)
+                self._housekeep()
+        except asyncio.CancelledError:
+            log.debug('Peer pool housekeeping cancelled.')
+
+    async def close(self) -> None:
+        """Destroy all pooled peers and release shared resources."""
+        if self._housekeeper:
+            self._housekeeper.cancel()
+            self._housekeeper = None
+        for id in list(self._peers):
+            await self.removePeer(id)
+        if self._http_session:
+            await self._http_session.close()
+            self._http_session = None
@@ -1,17 +1,58 @@
 """Wrapper fro messages from a signaling server."""
-from dataclasses import dataclass
+import json
 from typing import Any, Optional
 
-from dataclasses_json import dataclass_json
-
 from .enums import ServerMessageType
 
+# Wire value => enum member, resolved once instead of per message.
+_MESSAGE_TYPES = {t.value: t for t in ServerMessageType}
+
 
-@dataclass_json
-@dataclass
 class ServerMessage:
-    """Wrapper for messages from the signaling server."""
+    """Wrapper for messages from the signaling server.
+
+    Decoded straight from the wire JSON into a slotted object,
+    avoiding per message reflection on the hot signaling path.
+    """
+
+    __slots__ = ('type', 'payload', 'src')
+
+    def __init__(self,
+                 type: ServerMessageType = None,
+                 payload: Optional[Any] = None,
+                 src: Optional[str] = None):
+        """Create server message."""
+        self.type = type
+        self.payload = payload
+        self.src = src
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ServerMessage':
+        """Create a server message from a decoded JSON object."""
+        try:
+            type = _MESSAGE_TYPES[data['type']]
+        except KeyError:
+            raise ValueError(
+                f'Unknown server message type: {data.get("type")!r}')
+        return cls(type, data.get('payload'), data.get('src'))
+
+    @classmethod
+    def from_json(cls, message) -> 'ServerMessage':
+        """Decode a server message from its wire JSON format."""
+        data = json.loads(message)
+        if not isinstance(data, dict):
+            raise ValueError(f'Server message is not an object: {data!r}')
+        return cls.from_dict(data)
+
+    def __eq__(self, other) -> bool:
+        """Return True if both messages carry the same content."""
+        if not isinstance(other, ServerMessage):
+            return NotImplemented
+        return self.type == other.type and \
+            self.payload == other.payload and \
+            self.src == other.src
 
-    type: ServerMessageType = None
-    payload: Optional[Any] = None
-    src: Optional[str] = None
+    def __repr__(self) -> str:
+        """Return debug representation of the message."""
+        return f'ServerMessage(type={self.type}, ' \
+            f'payload={self.payload!r}, src={self.src!r})'
@@ -2,16 +2,45 @@
 import asyncio
 import json
 import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
 
 import websockets
 from pyee import AsyncIOEventEmitter
-from websockets.exceptions import ConnectionClosedError
+from websockets.exceptions import (
+    ConnectionClosed,
+    ConnectionClosedError,
+    WebSocketException,
+)
 
 from .enums import SocketEventType
 from .servermessage import ServerMessage
 
 log = logging.getLogger(__name__)
 
+DEFAULT_SEND_QUEUE_SIZE = 256
+
+
+def backoffDelay(attempt: int, base: float, cap: float) -> float:
+    """Return a full jitter exponential backoff delay in seconds."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+@dataclass
+class ReconnectStats:
+    """Signaling server reconnect metrics."""
+
+    # websocket closed without close() being called
+    drops: int = 0
+    reconnects: int = 0
+    failedAttempts: int = 0
+    # time to reconnect in seconds
+    lastReconnectTime: float = None
+    maxReconnectTime: float = 0.0
+    totalReconnectTime: float = 0.0
+
 
 class Socket(AsyncIOEventEmitter):
     """An abstraction on top of WebSockets.
@@ -26,24 +55,50 @@ class Socket(AsyncIOEventEmitter):
         port: int = None,
         path: str = None,
         key: str = None,
-        pingInterval: int = 5000
+        pingInterval: int = 5000,
+        sendQueueSize: int = DEFAULT_SEND_QUEUE_SIZE,
+        reconnect: bool = True,
+        reconnectDelay: float = 0.1,
+        reconnectMaxDelay: float = 10.0,
+        reconnectAttempts: int = 10,
+        compression: bool = True
     ) -> None:
         """Create new wrapper around websocket."""
         super().__init__()
         wsProtocol = "wss://" if secure else "ws://"
         self._baseUrl: str = f"{wsProtocol}{host}:{port}{path}peerjs?key={key}"
         self._disconnected: bool = True
+        # When True, the socket was explicitly closed and drops new messages.
+        self._closed: bool = False
         self._id: str = None
-        self._messagesQueue: list = []
+        self._wsUrl: str = None
+        # Reconnect automatically when the websocket drops.
+        self._reconnect: bool = reconnect
+        self._reconnectDelay: float = reconnectDelay
+        self._reconnectMaxDelay: float = reconnectMaxDelay
+        self._reconnectAttempts: int = reconnectAttempts
+        self._reconnectStats = ReconnectStats()
+        # permessage-deflate costs ~200KB of zlib state per websocket
+        self._compression: bool = compression
+        # Outbound messages waiting for the writer task, oldest first.
+        self._messagesQueue: deque = deque()
+        self._sendQueueSize: int = sendQueueSize
+        # Set when messages are waiting in the queue.
+        self._queueReady = asyncio.Event()
+        # Set when the writer made room in the queue.
+        self._queueSpace = asyncio.Event()
         self._websocket: websockets.client.WebSocketClientProtocol = None
         self._receiver: asyncio.Task = None
+        self._writer: asyncio.Task = None
 
     async def _connect(self, wss_url=None):
         """Connect to WebSockets server."""
         assert wss_url
         # connect to websocket
-        websocket = await websockets.connect(wss_url, ping_interval=5)
-        self._sendQueuedMessages()
+        websocket = await websockets.connect(
+            wss_url,
+            ping_interval=5,
+            compression="deflate" if self._compression else None)
         log.debug("WebSockets open")
         await websocket.send(
             json.dumps({"ping": "once"})
@@ -74,62 +129,146 @@ class Socket(AsyncIOEventEmitter):
         finally:
             # remote peer closed websocket connection
             # or this socket was explicitly closed via close().
-            # If its the former case, let's close our end and cleanup.
-            if not self._disconnected:
+            # If its the former case, let's reconnect
+            # or close our end and cleanup.
+            if not self._closed:
                 log.debug("Websocket connection closed")
-                await self.close()
+                if self._reconnect:
+                    await self._reconnectWebSocket()
+                else:
+                    await self.close()
+
+    async def _reconnectWebSocket(self) -> None:
+        """Reopen a dropped websocket with jittered exponential backoff.
+
+        Queued outbound messages are kept and flushed once reconnected.
+        Closes the socket after running out of attempts.
+        """
+        stats = self._reconnectStats
+        stats.drops += 1
+        started = time.monotonic()
+        if self._writer:
+            self._writer.cancel()
+            self._writer = None
+        self._websocket = None
+        self.emit(SocketEventType.Reconnecting)
+        for attempt in range(self._reconnectAttempts):
+            await asyncio.sleep(backoffDelay(attempt,
+                                             self._reconnectDelay,
+                                             self._reconnectMaxDelay))
+            if self._closed:
+                return
+            try:
+                websocket = await self._connect(wss_url=self._wsUrl)
+            except (OSError, WebSocketException, asyncio.TimeoutError) as err:
+                stats.failedAttempts += 1
+                log.warning("Signaling reconnect attempt %d failed: %s",
+                            attempt + 1, err)
+                continue
+            self._startStreams(websocket)
+            elapsed = time.monotonic() - started
+            stats.reconnects += 1
+            stats.lastReconnectTime = elapsed
+            stats.maxReconnectTime = max(stats.maxReconnectTime, elapsed)
+            stats.totalReconnectTime += elapsed
+            log.info("Signaling websocket reconnected in %.3f seconds.",
+                     elapsed)
+            self.emit(SocketEventType.Reconnected, elapsed)
+            return
+        log.warning("Giving up signaling reconnect after %d attempts.",
+                    self._reconnectAttempts)
+        await self.close()
 
     async def start(self, id: str, token: str) -> None:
         """Start socket connection."""
         self._id = id
-        _ws_url = f"{self._baseUrl}&id={id}&token={token}"
+        self._wsUrl = f"{self._baseUrl}&id={id}&token={token}"
         if (self._websocket or not self._disconnected):
             # socket already connected
             return
-        self._websocket = await self._connect(wss_url=_ws_url)
+        self._startStreams(await self._connect(wss_url=self._wsUrl))
+
+    def _startStreams(self, websocket) -> None:
+        """Start receiving from and writing to an open websocket."""
+        self._websocket = websocket
         # ask asyncio to schedule a receiver soon
         # it will end when the socket closes
         self._receiver = asyncio.create_task(
             self._receive())
+        # single writer flushing queued messages in order
+        self._writer = asyncio.create_task(
+            self._write(websocket))
+
+    @property
+    def reconnectStats(self) -> ReconnectStats:
+        """Return signaling reconnect metrics."""
+        return self._reconnectStats
 
     # Is the websocket currently open?
     def _wsOpen(self) -> bool:
         return self._websocket and self._websocket.open
 
-    # Send queued messages.
-    def _sendQueuedMessages(self) -> None:
-        # Create copy of queue and clear it,
-        # because send method push the message back to queue
-        # if something goes wrong
-        copiedQueue = [*self._messagesQueue]
-        self._messagesQueue = []
-        for message in copiedQueue:
-            self.send(message)
+    @property
+    def queuedMessages(self) -> int:
+        """Return the number of messages waiting to be sent."""
+        return len(self._messagesQueue)
+
+    async def _write(self, websocket) -> None:
+        """Flush queued messages to the websocket in order.
+
+        All messages queued by the time the writer wakes up are sent
+        as one batch and room in the queue is announced once per batch.
+        The websocket only suspends in its drain while its write buffer
+        is above the high water mark, which in turn holds back senders
+        waiting for queue space.
+        """
+        queue = self._messagesQueue
+        try:
+            while True:
+                if not queue:
+                    self._queueReady.clear()
+                    await self._queueReady.wait()
+                for _ in range(len(queue)):
+                    message = queue[0]
+                    log.debug('Message sent to signaling server: \n %r',
+                              message)
+                    await websocket.send(message)
+                    # Only dequeue after a successful send,
+                    # so that the message survives a failed write.
+                    queue.popleft()
+                self._queueSpace.set()
+        except asyncio.CancelledError:
+            log.debug('Websocket send loop cancelled.')
+        except ConnectionClosed as err:
+            log.debug("Websocket closed while sending. %s", err)
 
     async def send(self, data: any) -> None:
-        """Expose send for DC & Peer."""
+        """Expose send for DC & Peer.
+
+        Messages are queued and flushed in order once the websocket is open.
+        While it is open and the queue is full, waits for the writer
+        to make room. Until then the oldest queued message is dropped
+        to make room for new ones.
+        """
         # If the socket was already closed, nothing to do
-        if self._disconnected:
+        if self._closed:
+            log.debug('Socket closed. Dropping message %r.', data)
             return
 
         log.debug('Socket sending data: \n%r', data)
-
-        # If we didn't get an ID yet,
-        # we can't yet send anything so we should queue
-        # up these messages.
-        if not self._id:
-            self._messagesQueue.push(data)
-            return
-        # if not data['type']:
-        #     self.emit(SocketEventType.Error, "Invalid message")
-        #     return
-        if not self._wsOpen():
-            log.warning("Signaling websocket closed. Cannot send message %r.",
-                        data)
-            return
         message = json.dumps(data)
-        log.debug('Message sent to signaling server: \n %r', message)
-        await self._websocket.send(message)
+        queue = self._messagesQueue
+        while self._wsOpen() and len(queue) >= self._sendQueueSize:
+            self._queueSpace.clear()
+            await self._queueSpace.wait()
+        if self._closed:
+            return
+        if len(queue) >= self._sendQueueSize:
+            dropped = queue.popleft()
+            log.warning("Signaling send queue full while websocket "
+                        "is not open. Dropped oldest message %r.", dropped)
+        queue.append(message)
+        self._queueReady.set()
 
     async def close(self) -> None:
         """Close socket and stop any pending communication."""
@@ -140,6 +279,13 @@ class Socket(AsyncIOEventEmitter):
             self.emit(SocketEventType.Disconnected)
 
     async def _cleanup(self) -> None:
+        self._closed = True
+        self._messagesQueue.clear()
+        # wake up senders waiting for room in the queue
+        self._queueSpace.set()
+        if self._writer:
+            self._writer.cancel()
+            self._writer = None
         if self._receiver:
             self._receiver.cancel()
         if self._websocket:
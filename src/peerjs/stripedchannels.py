@@ -0,0 +1,153 @@
+"""Stripe large messages across auxiliary data channels."""
+import asyncio
+import logging
+from typing import Callable, Dict, List
+
+from aiortc import RTCDataChannel
+
+from .chunkreassembler import ChunkReassembler, ReassemblyStats
+from .util import util
+
+log = logging.getLogger(__name__)
+
+STRIPE_SEPARATOR = '/stripe/'
+
+
+def stripeLabel(label: str, index: int) -> str:
+    """Return the label of auxiliary channel index of a connection."""
+    return f'{label}{STRIPE_SEPARATOR}{index}'
+
+
+class StripedChannels:
+    """Auxiliary data channels carrying large messages of a connection.
+
+    A large message is split in PeerJS chunks which go round robin
+    over the channels, starting with the first one for every message.
+    The channels are ordered, so a message only completes after all
+    the chunks of earlier ones arrived or were dropped, and received
+    messages are handed on in the order they were sent.
+
+    aiortc sends the messages of all channels first in, first out,
+    so the channels keep little buffered. Messages on the connection's
+    own channel then don't wait behind megabytes of chunks.
+    """
+
+    # Buffered amount per channel above which sending waits.
+    HIGH_WATER_MARK = 256 * 1024
+    # Buffered amount at which sending resumes.
+    LOW_WATER_MARK = 64 * 1024
+    # Transfers ahead of the next one to hand on that are accepted.
+    # The sender sends one message at a time, so a peer going further
+    # ahead is broken or hostile.
+    MAX_AHEAD = 16
+
+    def __init__(self,
+                 count: int,
+                 onMessage: Callable[[memoryview], None],
+                 highWaterMark: int = HIGH_WATER_MARK,
+                 lowWaterMark: int = LOW_WATER_MARK):
+        """Create striped channels."""
+        self.count = count
+        self._onMessage = onMessage
+        self._highWaterMark = highWaterMark
+        self._lowWaterMark = lowWaterMark
+        self._channels: List[RTCDataChannel] = []
+        # one message at a time, so that chunks keep their order
+        self._sending = asyncio.Lock()
+        self._bufferLow = asyncio.Event()
+        self._closed = False
+        # transfer id of the next message to send and to hand on
+        self._sent = 0
+        self._next = 0
+        # messages completed ahead of an earlier one, by transfer id
+        self._completed: Dict[int, bytearray] = {}
+        self._chunks = ChunkReassembler()
+
+    @property
+    def ready(self) -> bool:
+        """Return True if all channels are open."""
+        return not self._closed and self.count > 0 and \
+            len(self._channels) == self.count and \
+            all(dc.readyState == 'open' for dc in self._channels)
+
+    @property
+    def stats(self) -> ReassemblyStats:
+        """Return metrics of messages received over the channels."""
+        return self._chunks.stats
+
+    def add(self, dc: RTCDataChannel) -> None:
+        """Add an auxiliary channel, in order of its index."""
+        self._channels.append(dc)
+        dc.bufferedAmountLowThreshold = self._lowWaterMark
+        dc.on('bufferedamountlow', self._bufferLow.set)
+        dc.on('message', self._receive)
+
+    async def send(self, blob: bytes) -> None:
+        """Send a packed message in chunks over all channels."""
+        async with self._sending:
+            id = self._sent
+            self._sent += 1
+            channels = self._channels
+            for index, chunk in enumerate(util.chunk(blob)):
+                chunk['__peerData'] = id
+                dc = channels[index % len(channels)]
+                while dc.bufferedAmount > self._highWaterMark:
+                    if self._closed:
+                        return
+                    self._bufferLow.clear()
+                    await self._bufferLow.wait()
+                if self._closed:
+                    return
+                dc.send(util.pack(chunk))
+
+    def _receive(self, data) -> None:
+        try:
+            chunk = util.unpack(data)
+        except (ValueError, UnicodeDecodeError) as err:
+            log.warning('Dropped undecodable stripe chunk: %r', err)
+            return
+        if not isinstance(chunk, dict) or \
+                not isinstance(chunk.get('__peerData'), int) or \
+                not isinstance(chunk.get('data'), bytes):
+            log.warning('Dropped malformed stripe chunk')
+            return
+        id = chunk['__peerData']
+        if not self._next <= id < self._next + self.MAX_AHEAD:
+            log.warning('Dropped stripe chunk of transfer %s, expecting '
+                        '%d to %d', id, self._next,
+                        self._next + self.MAX_AHEAD - 1)
+            return
+        message = self._chunks.add(id, chunk.get('n'), chunk.get('total'),
+                                   chunk['data'])
+        if message is not None and id >= self._next:
+            self._completed[id] = message
+        self._release()
+
+    def _release(self) -> None:
+        """Hand on completed messages in order."""
+        completed = self._completed
+        while completed:
+            message = completed.pop(self._next, None)
+            if message is None and self._next in self._chunks:
+                # still arriving
+                return
+            # Without a message, the transfer was dropped:
+            # a later one completed, so its first chunk arrived.
+            self._next += 1
+            if message is not None:
+                self._onMessage(memoryview(message))
+
+    def expire(self) -> None:
+        """Drop transfers that timed out."""
+        if self._chunks.expire():
+            self._release()
+
+    def close(self) -> None:
+        """Stop sending and forget transfers in progress."""
+        self._closed = True
+        self._bufferLow.set()
+        for dc in self._channels:
+            dc.remove_all_listeners()
+        self._channels = []
+        self._completed.clear()
+        self._chunks.clear()
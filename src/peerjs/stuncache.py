@@ -0,0 +1,248 @@
+"""Cache STUN server addresses and the public address they report."""
+import asyncio
+import logging
+import socket
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, FrozenSet, Tuple
+
+from aioice import stun
+from aioice.ice import get_host_addresses
+from aiortc.rtcconfiguration import RTCConfiguration, RTCIceServer
+from aiortc.rtcicetransport import parse_stun_turn_uri
+
+log = logging.getLogger(__name__)
+
+Address = Tuple[str, int]
+
+# Initial retransmission timeout of STUN probes in seconds, RFC 5389.
+STUN_RTO = 0.5
+
+
+def hostAddresses() -> FrozenSet[str]:
+    """Return local interface addresses, as ICE host candidates use."""
+    return frozenset(get_host_addresses(use_ipv4=True, use_ipv6=True))
+
+
+@dataclass
+class StunCacheStats:
+    """STUN cache metrics."""
+
+    # binding requests sent to STUN servers
+    probes: int = 0
+    # binding requests without a usable response
+    failedProbes: int = 0
+    # configurations served from fresh cache entries
+    hits: int = 0
+    # configurations served without a STUN server,
+    # as it reports a local address
+    skipped: int = 0
+    networkChanges: int = 0
+
+
+@dataclass
+class StunMapping:
+    """What a STUN server told us about our public address."""
+
+    # resolved server address
+    server: Address
+    # public address of the probe socket, None if the server did not answer
+    mapped: Address = None
+    time: float = field(default_factory=time.monotonic)
+
+
+class _BindingProtocol(asyncio.DatagramProtocol):
+    """Send one STUN binding request and wait for its response."""
+
+    def __init__(self):
+        self.request = stun.Message(message_method=stun.Method.BINDING,
+                                    message_class=stun.Class.REQUEST)
+        self.response = asyncio.get_running_loop().create_future()
+
+    def datagram_received(self, data, addr):
+        try:
+            message = stun.parse_message(data)
+        except ValueError:
+            return
+        if message.transaction_id == self.request.transaction_id and \
+                not self.response.done():
+            self.response.set_result(message)
+
+    def error_received(self, exc):
+        if not self.response.done():
+            self.response.set_exception(exc)
+
+
+class StunCache:
+    """Per peer cache of STUN server DNS results and mapped addresses.
+
+    ICE gathering resolves the STUN host and queries it for every
+    connection. The cache resolves and probes each STUN server once
+    per ttl, in the background, and rewrites ICE configurations to use
+    the resolved address. STUN servers are left out entirely when they
+    report one of our own interface addresses, as there is no NAT to
+    discover. Servers that did not answer the probe, retransmitted as
+    RFC 5389 clients do, stay in the configuration as they were, since
+    the probe may just have been unlucky. Entries are dropped when the
+    set of local interface addresses changes.
+
+    Server reflexive candidates themselves are not reused: their port
+    belongs to the socket a connection gathers on.
+    """
+
+    def __init__(self,
+                 ttl: float = 300.0,
+                 failureTtl: float = 30.0,
+                 probeTimeout: float = 2.0,
+                 addresses: Callable[[], FrozenSet[str]] = hostAddresses):
+        """Create STUN cache.
+
+        Servers that did not answer are retried after failureTtl.
+        addresses returns the local interface addresses
+        watched for network changes.
+        """
+        self._ttl = ttl
+        self._failureTtl = failureTtl
+        self._probeTimeout = probeTimeout
+        self._addresses = addresses
+        self._localAddresses: FrozenSet[str] = addresses()
+        # (host, port) from the ICE server url => mapping
+        self._mappings: Dict[Address, StunMapping] = {}
+        self._refresher: asyncio.Task = None
+        self._stats = StunCacheStats()
+
+    @property
+    def stats(self) -> StunCacheStats:
+        """Return cache metrics."""
+        return self._stats
+
+    def mapping(self, host: str, port: int) -> StunMapping:
+        """Return the fresh mapping for a STUN server or None."""
+        mapping = self._mappings.get((host, port))
+        if mapping is None:
+            return None
+        ttl = self._ttl if mapping.mapped else self._failureTtl
+        return mapping if time.monotonic() - mapping.time < ttl else None
+
+    def apply(self, config: RTCConfiguration) -> RTCConfiguration:
+        """Return config rewritten with cached STUN results.
+
+        Start a background refresh of missing or expired entries.
+        """
+        if config is None or not config.iceServers:
+            return config
+        iceServers = []
+        stale = False
+        for server in config.iceServers:
+            urls = server.urls if isinstance(server.urls, list) \
+                else [server.urls]
+            rewritten = []
+            for url in urls:
+                if not url.startswith('stun:'):
+                    rewritten.append(url)
+                    continue
+                parsed = parse_stun_turn_uri(url)
+                mapping = self.mapping(parsed['host'], parsed['port'])
+                if mapping is None:
+                    stale = True
+                    rewritten.append(url)
+                elif mapping.mapped is None:
+                    # unknown, let ICE gathering try for itself
+                    rewritten.append(url)
+                elif mapping.mapped[0] in self._localAddresses:
+                    self._stats.skipped += 1
+                else:
+                    self._stats.hits += 1
+                    rewritten.append('stun:%s:%d' % mapping.server)
+            if rewritten:
+                iceServers.append(RTCIceServer(
+                    urls=rewritten,
+                    username=server.username,
+                    credential=server.credential,
+                    credentialType=server.credentialType))
+        if stale:
+            self.update(config)
+        return RTCConfiguration(iceServers=iceServers,
+                                bundlePolicy=config.bundlePolicy)
+
+    def update(self, config: RTCConfiguration) -> None:
+        """Refresh missing or expired entries in the background."""
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self.refresh(config))
+
+    async def refresh(self, config: RTCConfiguration) -> None:
+        """Resolve and probe STUN servers of config without fresh entries."""
+        servers = set()
+        for server in config.iceServers if config else []:
+            urls = server.urls if isinstance(server.urls, list) \
+                else [server.urls]
+            for url in urls:
+                if url.startswith('stun:'):
+                    parsed = parse_stun_turn_uri(url)
+                    servers.add((parsed['host'], parsed['port']))
+        for host, port in servers:
+            if self.mapping(host, port) is None:
+                self._mappings[(host, port)] = await self._probe(host, port)
+
+    async def _probe(self, host: str, port: int) -> StunMapping:
+        """Resolve a STUN server and ask it for our public address."""
+        loop = asyncio.get_running_loop()
+        self._stats.probes += 1
+        try:
+            infos = await loop.getaddrinfo(
+                host, port, family=socket.AF_INET, type=socket.SOCK_DGRAM)
+        except OSError as err:
+            log.warning('Could not resolve STUN server %s: %r', host, err)
+            self._stats.failedProbes += 1
+            return StunMapping(server=(host, port))
+        server = infos[0][4][:2]
+        transport = None
+        try:
+            transport, protocol = await loop.create_datagram_endpoint(
+                _BindingProtocol, family=socket.AF_INET)
+            # Retransmit with a doubling timeout, as RFC 5389 7.2.1
+            # does, within the probe timeout.
+            request = bytes(protocol.request)
+            deadline = loop.time() + self._probeTimeout
+            rto = STUN_RTO
+            while not protocol.response.done():
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                transport.sendto(request, server)
+                await asyncio.wait((protocol.response,),
+                                   timeout=min(rto, remaining))
+                rto *= 2
+            response = protocol.response.result()
+            mapped = response.attributes['XOR-MAPPED-ADDRESS']
+        except (asyncio.TimeoutError, OSError, KeyError) as err:
+            log.info('STUN server %s:%d did not answer: %r',
+                     host, port, err)
+            self._stats.failedProbes += 1
+            mapped = None
+        finally:
+            if transport:
+                transport.close()
+        log.debug('STUN server %s:%d at %s maps us to %s',
+                  host, port, server, mapped)
+        return StunMapping(server=server, mapped=mapped)
+
+    def checkNetwork(self) -> bool:
+        """Drop all entries if local addresses changed.
+
+        Return True on a network change.
+        """
+        addresses = self._addresses()
+        if addresses == self._localAddresses:
+            return False
+        log.info('Network change detected. Dropping cached STUN results.')
+        self._localAddresses = addresses
+        self._mappings.clear()
+        self._stats.networkChanges += 1
+        return True
+
+    def close(self) -> None:
+        """Stop any background refresh."""
+        if self._refresher:
+            self._refresher.cancel()
+            self._refresher = None
@@ -5,10 +5,11 @@ import re
 from dataclasses import dataclass
 from uuid import uuid4
 import os
-# import msgpack
 
 from aiortc.rtcconfiguration import RTCConfiguration, RTCIceServer
 
+from . import binarypack
+
 # import asyncio
 # import aiofiles
 
@@ -61,8 +62,9 @@ class Util:
         # Binary stuff
         self._dataCount: int = 1
         self._supports = UtilSupports()
-        # self.pack = msgpack.packb
-        # self.unpack = msgpack.unpackb
+        # BinaryPack, as the PeerJS JavaScript client uses
+        self.pack = binarypack.pack
+        self.unpack = binarypack.unpack
 
     def validateId(self, id: str = None) -> bool:
         """Ensure alphanumeric ids."""
@@ -76,29 +78,26 @@ class Util:
         """Return dict of supported WebRTC features."""
         return self._supports
 
-    def chunk(self, blob):
-        """Break up a blob into a list of smaller chunks for the wire."""
-        # return type hint:
-        #   { __peerData: number, n: number, total: number, data: Blob }[]
-        chunks = []
-        size = blob.size
-        total = math.ceil(size / util.chunkedMTU)
-
-        index = 0
-        start = 0
-
-        while (start < size):
-            end = math.min(size, start + util.chunkedMTU)
-            b = blob.slice(start, end)
-            chunk = {
+    def chunk(self, blob) -> list:
+        """Break up a blob into a list of smaller chunks for the wire.
+
+        Chunks follow PeerJS framing:
+        {'__peerData': transfer id, 'n': index, 'data': slice, 'total': count}
+        Slices are memoryviews of the blob, not copies.
+        """
+        view = memoryview(blob)
+        size = view.nbytes
+        mtu = self.chunkedMTU
+        total = math.ceil(size / mtu)
+        chunks = [
+            {
                 '__peerData': self._dataCount,
                 'n': index,
-                'data': b,
+                'data': view[start:start + mtu],
                 'total': total
-                }
-            chunks.push(chunk)
-            start = end
-            index += 1
+            }
+            for index, start in enumerate(range(0, size, mtu))
+        ]
         self._dataCount += 1
         return chunks
 
@@ -0,0 +1,57 @@
+"""Test BinaryPack wire compatibility with js-binarypack."""
+import pytest
+
+from peerjs.binarypack import pack, unpack
+
+
+@pytest.mark.parametrize('value, wire', [
+    (1, b'\x01'),
+    (-1, b'\xff'),
+    (-33, b'\xd0\xdf'),
+    (200, b'\xcc\xc8'),
+    (-200, b'\xd1\xff\x38'),
+    (70000, b'\xce\x00\x01\x11\x70'),
+    (2 ** 40, b'\xd3\x00\x00\x01\x00\x00\x00\x00\x00'),
+    (2 ** 63, b'\xcf\x80\x00\x00\x00\x00\x00\x00\x00'),
+    (1.5, b'\xcb\x3f\xf8\x00\x00\x00\x00\x00\x00'),
+    (None, b'\xc0'),
+    (True, b'\xc3'),
+    (False, b'\xc2'),
+    ('hi', b'\xb2hi'),
+    ('x' * 16, b'\xd8\x00\x10' + b'x' * 16),
+    (b'\x00\x01', b'\xa2\x00\x01'),
+    ([1, 2], b'\x92\x01\x02'),
+    ({'a': 1}, b'\x81\xb1a\x01'),
+])
+def test_wire_format(value, wire):
+    """Values encode as js-binarypack does and decode back."""
+    assert pack(value) == wire
+    assert unpack(wire) == value
+
+
+def test_round_trip_from_memoryview():
+    """Nested values decode from a slice of a larger buffer."""
+    value = {'label': 'person', 'box': [12, 40, 220, 310],
+             'score': 0.87, 'thumbnail': bytes(range(256)) * 300,
+             'tags': ['é' * 20] * 20, 'ids': list(range(70000))}
+    buf = memoryview(b'junk' + pack(value))
+    assert unpack(buf[4:]) == value
+
+
+def test_errors():
+    """Truncated data and unsupported types raise."""
+    with pytest.raises(ValueError):
+        unpack(pack('hello world')[:-1])
+    with pytest.raises(TypeError):
+        pack(object())
+
+
+@pytest.mark.parametrize('data', [
+    b'\xdd\xff\xff\xff\xff',
+    b'\x91' * 5000 + b'\x00',
+    b'\xde\x00\x01\x91\x00\x00',
+])
+def test_malformed_data_raises_value_error(data):
+    """Hostile sizes, nesting and keys all raise ValueError."""
+    with pytest.raises(ValueError):
+        unpack(data)
@@ -0,0 +1,38 @@
+"""Test the shared DTLS certificate cache."""
+import asyncio
+import time
+
+from peerjs.certificatecache import CertificateCache
+
+
+def _fingerprint(peerConnection):
+    return peerConnection._RTCPeerConnection__certificates[0] \
+        .getFingerprints()[0].value
+
+
+def test_reuse_and_rotate():
+    """Connections share a certificate until its lifetime ends."""
+    async def run():
+        cache = CertificateCache(lifetime=60)
+        first = cache.createPeerConnection()
+        second = cache.createPeerConnection()
+        assert _fingerprint(first) == _fingerprint(second)
+        assert cache.stats.generated == 1
+        old = cache.certificate()
+        assert cache.certificate(time.time() + 61) is not old
+        assert cache.stats.rotations == 1
+        await first.close()
+        await second.close()
+
+    asyncio.run(run())
+
+
+def test_persist(tmp_path):
+    """A restarted cache loads the saved certificate."""
+    path = str(tmp_path / 'dtls.pem')
+    certificate = CertificateCache(path=path).certificate()
+    reloaded = CertificateCache(path=path)
+    assert reloaded.certificate().getFingerprints() == \
+        certificate.getFingerprints()
+    assert reloaded.stats.loaded == 1
+    assert reloaded.stats.generated == 0
@@ -0,0 +1,55 @@
+"""Test chunked transfer framing and reassembly."""
+import random
+
+from peerjs.binarypack import pack, unpack
+from peerjs.chunkreassembler import ChunkReassembler
+from peerjs.util import util
+
+
+def _wire(chunks):
+    """Chunks as the remote side receives them."""
+    return [unpack(pack(chunk)) for chunk in chunks]
+
+
+def test_round_trip_any_order():
+    """A multi chunk message reassembles in any arrival order."""
+    message = pack({'snapshot': bytes(range(256)) * 1000})
+    chunks = _wire(util.chunk(message))
+    assert len(chunks) == -(-len(message) // util.chunkedMTU)
+    assert isinstance(util.chunk(message)[0]['data'], memoryview)
+    random.Random(1).shuffle(chunks)
+    reassembler = ChunkReassembler()
+    results = [reassembler.add(c['__peerData'], c['n'], c['total'], c['data'])
+               for c in chunks]
+    assert results[:-1] == [None] * (len(chunks) - 1)
+    assert results[-1] == message
+    assert reassembler.stats.completed == 1
+    assert reassembler.stats.pending == 0
+
+
+def test_timeout_and_limits():
+    """Incomplete transfers expire and are evicted over limits."""
+    reassembler = ChunkReassembler(timeout=10, maxTransfers=2)
+    for id in (1, 2, 3):
+        reassembler.add(id, 0, 2, b'x' * 10)
+    assert reassembler.stats.dropped == 1
+    assert reassembler.stats.pending == 2
+    assert reassembler.expire(now=10 ** 9) == 2
+    assert reassembler.stats.pending == 0
+    # a too large message is refused before allocating it
+    small = ChunkReassembler(maxBytes=100)
+    assert small.add(1, 0, 20, b'x' * 10) is None
+    assert small.stats.dropped == 1
+
+
+def test_huge_chunk_count_refused_before_allocating():
+    """The remote chunk count is checked before any buffer is built."""
+    reassembler = ChunkReassembler(maxBytes=100 * util.chunkedMTU)
+    assert reassembler.add(1, 0, 3 * 10 ** 9, b'x') is None
+    # last chunk first, no chunk size known yet
+    assert reassembler.add(2, 10 ** 8 - 1, 10 ** 8, b'x') is None
+    assert reassembler.stats.dropped == 2
+    assert reassembler.stats.pending == 0
+    assert reassembler.add(3, 99, 100, b'x') is None
+    # the bitmap of received chunks counts too
+    assert reassembler.stats.bytes == 100 + 1
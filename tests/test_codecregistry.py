@@ -0,0 +1,85 @@
+"""Test the serialization codec registry."""
+import asyncio
+import json
+import math
+
+import pytest
+
+from peerjs.codecregistry import Codec, CodecRegistry, JsonCodec, codecRegistry
+from peerjs.dataconnection import DataConnection
+
+
+def test_default_codecs():
+    """PeerJS serializations are registered, unknown ones pass as raw."""
+    registry = CodecRegistry()
+    for name in ('binary', 'binary-utf8', 'json', 'raw'):
+        assert name in registry
+        assert registry.get(name).name == name
+    assert registry.get('unknown').name == 'raw'
+    assert registry.get('binary').chunked
+    assert registry.get('json').text
+
+
+def test_json_engines_agree():
+    """The fast engine reads what stdlib writes and the other way round."""
+    data = {'event': 'motion', 'score': 0.25, 'tags': ['a', 'ü'], 'n': None}
+    fast, stdlib = JsonCodec(), JsonCodec(fast=False)
+    assert stdlib.engine == 'json'
+    assert stdlib.encode(data) == json.dumps(data)
+    for writer, reader in ((fast, stdlib), (stdlib, fast)):
+        message = writer.encode(data)
+        assert isinstance(message, str)
+        assert reader.decode(message) == data
+        assert reader.decode(message.encode('utf-8')) == data
+
+
+def test_json_engines_agree_on_edge_values():
+    """Non-str keys, big integers and NaN do not fail the fast engine."""
+    fast, stdlib = JsonCodec(), JsonCodec(fast=False)
+    for data in ({1: 'a'}, {'n': 2 ** 70 + 1}, [-2 ** 70, True]):
+        expected = json.loads(json.dumps(data))
+        assert json.loads(fast.encode(data)) == expected
+        assert stdlib.decode(fast.encode(data)) == expected
+    # as JSON.stringify writes it
+    if fast.engine == 'orjson':
+        assert fast.encode([float('nan')]) == '[null]'
+    assert math.isnan(fast.decode(stdlib.encode(float('nan'))))
+    assert fast.decode(b'{"inf": Infinity}') == {'inf': float('inf')}
+    with pytest.raises(ValueError):
+        fast.decode('{"truncated": ')
+
+
+class UpperCodec(Codec):
+    """Custom codec sending text in upper case."""
+
+    name = 'upper'
+    text = True
+
+    def encode(self, data):
+        return data.upper()
+
+    def decode(self, message):
+        if not isinstance(message, str):
+            raise ValueError('text expected')
+        return message.lower()
+
+
+def test_custom_codec(monkeypatch):
+    """Connections use codecs registered under their serialization."""
+    # registered for this test only
+    monkeypatch.setitem(codecRegistry._codecs, UpperCodec.name, UpperCodec())
+
+    async def run():
+        connection = DataConnection('remote', None, serialization='upper')
+        sent = []
+        connection._dc = type('Channel', (), {
+            'bufferedAmount': 0, 'send': lambda self, m: sent.append(m)})()
+        connection._open = True
+        await connection.send('hello')
+        assert sent == ['HELLO']
+        connection._handleDataMessage(b'\x00')
+        connection._handleDataMessage('WORLD')
+        assert await connection.recv() == 'world'
+        assert connection.inboxStats.received == 1
+
+    asyncio.run(run())
@@ -0,0 +1,47 @@
+"""Test per-message compression."""
+import os
+
+import pytest
+
+from peerjs.compression import Compressor, isCompressed, isCompressedType
+
+
+def test_round_trip_and_stats():
+    """Large compressible messages shrink and come back whole."""
+    compressor = Compressor(threshold=100)
+    data = b'{"event": "motion", "score": 0.9}' * 100
+    compressed = compressor.compress(data)
+    assert isCompressed(compressed)
+    assert compressor.decompress(compressed) == data
+    stats = compressor.stats
+    assert (stats.compressed, stats.decompressed) == (1, 1)
+    assert stats.bytesIn == len(data)
+    assert stats.ratio < 0.1
+
+
+def test_skips_small_and_incompressible():
+    """Messages below the threshold or not shrinking go as they are."""
+    compressor = Compressor(threshold=100)
+    small = b'x' * 99
+    noise = os.urandom(4096)
+    assert compressor.compress(small) is small
+    assert compressor.compress(noise) is noise
+    assert compressor.stats.skipped == 2
+    assert compressor.stats.ratio == 1.0
+
+
+def test_rejects_oversized_and_corrupt():
+    """Decompression is bounded and validates the stream."""
+    compressed = Compressor(threshold=0).compress(b'\0' * 100000)
+    with pytest.raises(ValueError):
+        Compressor(maxSize=1000).decompress(compressed)
+    with pytest.raises(ValueError):
+        Compressor().decompress(compressed[:-10])
+
+
+def test_compressed_types():
+    assert isCompressedType('image/jpeg')
+    assert isCompressedType('Video/MP4; codecs="avc1"')
+    assert not isCompressedType('image/svg+xml')
+    assert not isCompressedType('application/json; charset=utf-8')
+    assert not isCompressedType(None)
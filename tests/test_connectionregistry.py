@@ -0,0 +1,54 @@
+"""Test the connection registry indexes."""
+from pyee import AsyncIOEventEmitter
+
+from peerjs.connectionregistry import ConnectionRegistry
+from peerjs.enums import ConnectionEventType, ConnectionState
+
+
+class FakeConnection(AsyncIOEventEmitter):
+    """Connection stand in emitting open and close events."""
+
+    def __init__(self, peer, connectionId, open=False):
+        super().__init__()
+        self.peer = peer
+        self.connectionId = connectionId
+        self.open = open
+
+
+def test_lookup_and_remove():
+    """Connections are found by id and peer until removed."""
+    registry = ConnectionRegistry()
+    a1 = FakeConnection('a', 'dc_1')
+    a2 = FakeConnection('a', 'dc_2')
+    b1 = FakeConnection('b', 'dc_3')
+    for connection in (a1, a2, b1):
+        registry.add(connection.peer, connection)
+    assert registry.get('a', 'dc_2') is a2
+    assert registry.get('b', 'dc_2') is None
+    assert registry.getById('dc_3') is b1
+    assert registry.forPeer('a') == [a1, a2]
+    assert sorted(registry.peerIds()) == ['a', 'b']
+    assert registry.remove(a1)
+    assert not registry.remove(a1)
+    assert a1 not in registry
+    assert registry.removePeer('a') == [a2]
+    assert registry.peerIds() == ['b']
+    assert len(registry) == 1
+
+
+def test_state_follows_events():
+    """State buckets follow connection open and close events."""
+    registry = ConnectionRegistry()
+    connection = FakeConnection('a', 'dc_1')
+    registry.add('a', connection)
+    assert registry.state(connection) == ConnectionState.Negotiating
+    connection.emit(ConnectionEventType.Open)
+    assert registry.count(ConnectionState.Open) == 1
+    assert list(registry.byState(ConnectionState.Open)) == [connection]
+    connection.emit(ConnectionEventType.Close)
+    assert registry.state(connection) == ConnectionState.Closed
+    assert registry.count(ConnectionState.Open) == 0
+    registry.remove(connection)
+    assert registry.count(ConnectionState.Closed) == 0
+    # listeners are detached once removed
+    assert not connection.listeners(ConnectionEventType.Close)
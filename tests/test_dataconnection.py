@@ -0,0 +1,270 @@
+"""Test DataConnection send buffering and backpressure."""
+import asyncio
+
+import pytest
+from pyee import AsyncIOEventEmitter
+
+from peerjs.binarypack import pack
+from peerjs.dataconnection import DataConnection
+from peerjs.enums import ConnectionEventType
+
+
+class FakeDataChannel(AsyncIOEventEmitter):
+    """Data channel stand in that only buffers what is sent."""
+
+    def __init__(self):
+        super().__init__()
+        self.readyState = 'connecting'
+        self.bufferedAmount = 0
+        self.bufferedAmountLowThreshold = 0
+        self.sent = []
+
+    def send(self, data):
+        self.sent.append(data)
+        self.bufferedAmount += len(data)
+
+    def drainTo(self, amount):
+        self.bufferedAmount = amount
+        if amount <= self.bufferedAmountLowThreshold:
+            self.emit('bufferedamountlow')
+
+
+def test_backpressure_keeps_order_and_drains():
+    """Messages queue in order while full and flow on buffered low."""
+    async def run():
+        connection = DataConnection('remote', None, serialization='raw',
+                                    bufferHighWaterMark=100,
+                                    bufferLowWaterMark=10)
+        channel = FakeDataChannel()
+        await connection.initialize(channel)
+        connection._open = True
+        assert channel.bufferedAmountLowThreshold == 10
+        for n in range(4):
+            await connection.send(bytes([n]) * 60)
+        assert [m[0] for m in channel.sent] == [0, 1]
+        assert connection.bufferSize() == 2
+        drained = asyncio.create_task(connection.drain())
+        channel.drainTo(0)
+        await asyncio.sleep(0)
+        assert [m[0] for m in channel.sent] == [0, 1, 2, 3]
+        assert not drained.done()
+        channel.drainTo(5)
+        await asyncio.wait_for(drained, 1)
+        assert connection.bufferSize() == 0
+
+    asyncio.run(run())
+
+
+def test_close_releases_drain():
+    """Waiting senders return when the connection closes."""
+    async def run():
+        connection = DataConnection('remote', None, serialization='raw',
+                                    bufferHighWaterMark=10)
+        channel = FakeDataChannel()
+        await connection.initialize(channel)
+        connection._open = True
+        await connection.send(b'x' * 20)
+        waiting = asyncio.create_task(connection.send(b'y', wait=True))
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        await connection.close()
+        await asyncio.wait_for(waiting, 1)
+
+    asyncio.run(run())
+
+
+def test_drain_to_limit():
+    """drain(limit) waits below the high water mark."""
+    async def run():
+        connection = DataConnection('remote', None, serialization='raw',
+                                    bufferHighWaterMark=100,
+                                    bufferLowWaterMark=10)
+        channel = FakeDataChannel()
+        await connection.initialize(channel)
+        connection._open = True
+        await connection.send(b'x' * 50)
+        await asyncio.wait_for(connection.drain(), 1)
+        drained = asyncio.create_task(connection.drain(20))
+        await asyncio.sleep(0)
+        channel.drainTo(30)
+        await asyncio.sleep(0)
+        assert not drained.done()
+        channel.drainTo(10)
+        await asyncio.wait_for(drained, 1)
+
+    asyncio.run(run())
+
+
+def test_recv_and_iterate_until_close():
+    """Without Data listeners messages are pulled in order."""
+    async def run():
+        connection = DataConnection('remote', None, serialization='raw',
+                                    inboxSize=2)
+        connection._open = True
+        for n in range(5):
+            connection._handleDataMessage(n)
+        assert connection.inboxStats.backlog == 3
+        assert await connection.recv() == 0
+        await connection.close()
+        assert [message async for message in connection] == [1]
+        assert connection.inboxStats.maxDepth == 2
+
+    asyncio.run(run())
+
+
+def test_block_keeps_order():
+    """Held back messages enter the inbox in order as it empties."""
+    async def run():
+        connection = DataConnection('remote', None, serialization='raw',
+                                    inboxSize=2)
+        for n in range(6):
+            connection._handleDataMessage(n)
+        assert [await connection.recv() for _ in range(6)] == \
+            list(range(6))
+
+    asyncio.run(run())
+
+
+def test_malformed_messages_keep_channel_alive():
+    """Messages failing to decode are reported, later ones still flow."""
+    async def run():
+        connection = DataConnection('remote', None, serialization='binary')
+        channel = FakeDataChannel()
+        await connection.initialize(channel)
+        errors, received = [], []
+        connection.on(ConnectionEventType.Error, errors.append)
+        connection.on(ConnectionEventType.Data, received.append)
+        for payload in (b'\x91' * 5000 + b'\x00',
+                        b'\xde\x00\x01\x91\x00\x00'):
+            channel.emit('message', payload)
+        channel.emit('message', pack('ok'))
+        assert received == ['ok']
+        # the deserialization errors are dropped like any undecodable one
+        assert errors == []
+        connection._deliver = lambda data: 1 / 0
+        channel.emit('message', pack('boom'))
+        assert [type(e) for e in errors] == [ZeroDivisionError]
+
+    asyncio.run(run())
+
+
+def test_backlog_is_bounded():
+    """The Block policy holds back a bounded number of messages."""
+    async def run():
+        connection = DataConnection('remote', None, serialization='raw',
+                                    inboxSize=2, backlogSize=3)
+        for n in range(8):
+            connection._handleDataMessage(n)
+        stats = connection.inboxStats
+        assert (stats.backlog, stats.dropped) == (3, 3)
+        assert [await connection.recv() for _ in range(5)] == \
+            list(range(5))
+
+    asyncio.run(run())
+
+
+def test_drop_policies():
+    """Full inboxes drop the oldest or newest message."""
+    async def run():
+        for policy, expected in (('drop-oldest', [3, 4]),
+                                 ('drop-newest', [0, 1])):
+            connection = DataConnection('remote', None, serialization='raw',
+                                        inboxSize=2, inboxPolicy=policy)
+            for n in range(5):
+                connection._handleDataMessage(n)
+            assert [await connection.recv() for _ in range(2)] == expected
+            assert connection.inboxStats.dropped == 3
+
+    asyncio.run(run())
+
+
+def test_coalesce_batches_small_messages():
+    """Small messages share frames that the receiver splits in order."""
+    async def run():
+        for serialization in ('json', 'binary'):
+            sender = DataConnection('remote', None,
+                                    serialization=serialization,
+                                    coalesceDelay=0.01,
+                                    coalesceMaxBytes=64)
+            channel = FakeDataChannel()
+            await sender.initialize(channel)
+            sender._open = True
+            for n in range(8):
+                await sender.send({'n': n})
+            await sender.send('x' * 100)
+            await sender.send('late')
+            # two batches and the large message alone
+            assert len(channel.sent) == 3
+            await asyncio.sleep(0.05)
+            assert len(channel.sent) == 4
+            receiver = DataConnection('local', None,
+                                      serialization=serialization)
+            for message in channel.sent:
+                receiver._handleDataMessage(message)
+            received = [await receiver.recv() for _ in range(10)]
+            assert received == [{'n': n} for n in range(8)] + \
+                ['x' * 100, 'late']
+
+    asyncio.run(run())
+
+
+def test_coalesce_drain_sends_batch():
+    """drain() does not wait for the latency budget."""
+    async def run():
+        connection = DataConnection('remote', None, serialization='json',
+                                    coalesceDelay=10)
+        channel = FakeDataChannel()
+        await connection.initialize(channel)
+        connection._open = True
+        await connection.send(1)
+        await connection.send(2, wait=True)
+        assert channel.sent == [b'\x00PJB\x00\x00\x00\x011\x00\x00\x00\x012']
+        await connection.close()
+
+    asyncio.run(run())
+
+
+def test_partial_reliability_options():
+    """Channel delivery options map to createDataChannel arguments."""
+    connection = DataConnection('remote', None, reliable=True)
+    assert connection.dataChannelInit() == {
+        'ordered': True, 'maxRetransmits': None, 'maxPacketLifeTime': None}
+    connection = DataConnection('remote', None, ordered=False,
+                                maxPacketLifeTime=100)
+    assert connection.dataChannelInit() == {
+        'ordered': False, 'maxRetransmits': None, 'maxPacketLifeTime': 100}
+    with pytest.raises(ValueError):
+        DataConnection('remote', None, maxRetransmits=0,
+                       maxPacketLifeTime=100)
+
+
+def test_negotiated_compression():
+    """Large messages go compressed once the answer accepts it."""
+    async def run():
+        for serialization in ('json', 'binary'):
+            sender = DataConnection('remote', None,
+                                    serialization=serialization,
+                                    compression=True,
+                                    compressionThreshold=100)
+            assert sender.compressionOffer == ['deflate']
+            receiver = DataConnection(
+                'local', None, serialization=serialization,
+                compression=['brotli', 'deflate'], _payload={})
+            assert receiver.compression == 'deflate'
+            channel = FakeDataChannel()
+            await sender.initialize(channel)
+            sender._open = True
+            large = {'events': ['motion'] * 200}
+            await sender.send(large)
+            sender.compression = 'deflate'
+            await sender.send('small')
+            await sender.send(large)
+            await sender.send(large, compress=False)
+            assert sender.compressionStats.compressed == 1
+            assert len(channel.sent[2]) < len(channel.sent[0]) / 10
+            for message in channel.sent:
+                receiver._handleDataMessage(message)
+            assert [await receiver.recv() for _ in range(4)] == \
+                [large, 'small', large, large]
+
+    asyncio.run(run())
@@ -0,0 +1,368 @@
+"""Test HTTP proxy response streaming and multiplexing."""
+import asyncio
+import gzip
+import json
+
+import struct
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from pyee import AsyncIOEventEmitter
+
+from peerjs.enums import ConnectionEventType
+from peerjs.ext import http_proxy
+from peerjs.ext.responsecache import ResponseCache
+
+
+class FakeConnection:
+    """Data connection stand in that records sent messages."""
+
+    def __init__(self):
+        self.open = True
+        self.sent = []
+        self.drains = 0
+        self.received = asyncio.Event()
+
+    async def send(self, data, compress=True):
+        self.sent.append(data)
+        self.received.set()
+
+    async def drain(self, limit=None):
+        assert limit == http_proxy.STREAM_BUFFER_LIMIT
+        self.drains += 1
+
+
+def test_stream_sends_header_first_and_chunks(monkeypatch):
+    """The header goes out before the body is complete."""
+    body = b'v' * (3 * http_proxy.STREAM_CHUNK_SIZE)
+    release = asyncio.Event()
+
+    async def clip(request):
+        response = web.StreamResponse(
+            headers={'content-type': 'video/mp4'})
+        await response.prepare(request)
+        await response.write(body[:1000])
+        await release.wait()
+        await response.write(body[1000:])
+        return response
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/clip', clip)
+        async with TestServer(app) as server, \
+                aiohttp.ClientSession() as session:
+            monkeypatch.setattr(http_proxy, 'http_session', session)
+            connection = FakeConnection()
+            stop_flag = asyncio.Event()
+            task = asyncio.create_task(http_proxy._stream(
+                responder=http_proxy._Responder(connection),
+                url=str(server.make_url('/clip')),
+                stop_flag=stop_flag))
+            await asyncio.wait_for(connection.received.wait(), 5)
+            header = json.loads(connection.sent[0])
+            assert header == {'status': 200, 'content-type': 'video/mp4',
+                              'stream': True}
+            assert stop_flag.is_set()
+            release.set()
+            await asyncio.wait_for(task, 5)
+        chunks = connection.sent[1:-1]
+        assert b''.join(chunks) == body
+        assert max(map(len, chunks)) <= http_proxy.STREAM_CHUNK_SIZE
+        assert connection.drains == len(chunks)
+        assert json.loads(connection.sent[-1]) == \
+            {'end': True, 'length': len(body)}
+
+    asyncio.run(run())
+
+
+def test_stream_stops_when_peer_closes(monkeypatch):
+    """Upstream reads end once the peer is gone."""
+    async def clip(request):
+        return web.Response(body=b'x' * 10 * http_proxy.STREAM_CHUNK_SIZE)
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/clip', clip)
+        async with TestServer(app) as server, \
+                aiohttp.ClientSession() as session:
+            monkeypatch.setattr(http_proxy, 'http_session', session)
+            connection = FakeConnection()
+
+            async def send(data, compress=True):
+                connection.sent.append(data)
+                connection.open = len(connection.sent) < 3
+            connection.send = send
+            await http_proxy._stream(
+                responder=http_proxy._Responder(connection),
+                url=str(server.make_url('/clip')),
+                stop_flag=asyncio.Event())
+        header = json.loads(connection.sent[0])
+        assert header['content-length'] == 10 * http_proxy.STREAM_CHUNK_SIZE
+        assert len(connection.sent) == 3
+
+    asyncio.run(run())
+
+
+def test_stream_of_encoded_body_has_no_content_length(monkeypatch):
+    """The announced length is that of the body the peer receives."""
+    body = json.dumps({'items': ['x' * 100] * 400}).encode()
+
+    async def feed(request):
+        return web.Response(body=gzip.compress(body), headers={
+            'Content-Type': 'application/json',
+            'Content-Encoding': 'gzip'})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/feed', feed)
+        async with TestServer(app) as server, \
+                aiohttp.ClientSession() as session:
+            monkeypatch.setattr(http_proxy, 'http_session', session)
+            connection = FakeConnection()
+            await http_proxy._stream(
+                responder=http_proxy._Responder(connection),
+                url=str(server.make_url('/feed')),
+                stop_flag=asyncio.Event())
+            return connection.sent
+
+    sent = asyncio.run(run())
+    assert 'content-length' not in json.loads(sent[0])
+    assert b''.join(sent[1:-1]) == body
+    assert json.loads(sent[-1]) == {'end': True, 'length': len(body)}
+
+
+class EmittingConnection(AsyncIOEventEmitter, FakeConnection):
+    """Fake connection that delivers requests through its events."""
+
+    def __init__(self):
+        AsyncIOEventEmitter.__init__(self)
+        FakeConnection.__init__(self)
+        self.peer = 'remote'
+
+
+def test_multiplexed_requests_are_tagged_and_capped(monkeypatch):
+    """Concurrent requests get their own ids, a few at a time."""
+    running = []
+    peak = []
+
+    async def api(request):
+        running.append(request)
+        peak.append(len(running))
+        await asyncio.sleep(0.05)
+        running.remove(request)
+        return web.json_response({'path': request.path})
+
+    monkeypatch.setitem(http_proxy.config, 'max_concurrent_requests', 2)
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/api/{name}', api)
+        async with TestServer(app) as server, \
+                aiohttp.ClientSession() as session:
+            monkeypatch.setattr(http_proxy, 'http_session', session)
+            connection = EmittingConnection()
+            http_proxy._setPeerConnectionHandlers(connection)
+            for n in range(5):
+                connection.emit(ConnectionEventType.Data, json.dumps({
+                    'id': n, 'url': str(server.make_url(f'/api/{n}'))}))
+            connection.emit(ConnectionEventType.Data, json.dumps({
+                'id': 'x', 'url': 'ping'}))
+            for _ in range(100):
+                await asyncio.sleep(0.02)
+                if sum(isinstance(m, bytes) for m in connection.sent) == 5:
+                    break
+        bodies = {}
+        for message in connection.sent:
+            if isinstance(message, bytes):
+                id, = struct.unpack_from('>I', message)
+                bodies[id] = json.loads(message[4:])
+        assert bodies == {n: {'path': f'/api/{n}'} for n in range(5)}
+        headers = [json.loads(m) for m in connection.sent
+                   if isinstance(m, str)]
+        assert {'id': 'x', 'status': 400} in headers
+        assert sorted(h['id'] for h in headers if h['status'] == 200) == \
+            list(range(5))
+        assert max(peak) == 2
+
+    asyncio.run(run())
+
+
+def test_cached_responses_and_not_modified(monkeypatch):
+    """Repeated polls hit the cache, known content is not resent."""
+    hits = []
+
+    async def status(request):
+        hits.append(request.headers.get('If-None-Match'))
+        return web.json_response({'ok': True}, headers={
+            'ETag': '"s1"', 'Cache-Control': 'max-age=60'})
+
+    cache = ResponseCache()
+    monkeypatch.setattr(http_proxy, 'response_cache', cache)
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/status', status)
+        async with TestServer(app) as server, \
+                aiohttp.ClientSession() as session:
+            monkeypatch.setattr(http_proxy, 'http_session', session)
+            url = str(server.make_url('/status'))
+            for headers in (None, None, {'If-None-Match': '"s1"'}):
+                responder = http_proxy._Responder(FakeConnection())
+                await http_proxy._proxy(
+                    responder=responder,
+                    request={'url': url, 'headers': headers},
+                    waiting_on_fetch=asyncio.Event())
+            return responder._peer_connection.sent
+
+    sent = asyncio.run(run())
+    assert hits == [None]
+    assert sent == [json.dumps({'status': 304,
+                                'content-type':
+                                'application/json; charset=utf-8',
+                                'etag': '"s1"',
+                                'cache-control': 'max-age=60'})]
+    assert (cache.stats.hits, cache.stats.notModified) == (2, 1)
+
+
+async def echo(request):
+    """Answer with what the proxy forwarded."""
+    body = b''
+    async for chunk in request.content.iter_chunked(64 * 1024):
+        body += chunk
+    return web.json_response({
+        'method': request.method,
+        'token': request.headers.get('X-Token'),
+        'type': request.headers.get('Content-Type'),
+        'length': len(body),
+        'body': body[:20].decode()})
+
+
+def run_requests(monkeypatch, requests, uploads=(), window=None,
+                 replies=None):
+    """Emit requests and upload data to the proxy, return the replies."""
+    async def run():
+        app = web.Application()
+        app.router.add_route('*', '/echo', echo)
+        async with TestServer(app) as server, \
+                aiohttp.ClientSession() as session:
+            monkeypatch.setattr(http_proxy, 'http_session', session)
+            connection = EmittingConnection()
+            http_proxy._setPeerConnectionHandlers(connection)
+            url = str(server.make_url('/echo'))
+            for request in requests:
+                connection.emit(ConnectionEventType.Data,
+                                json.dumps({'url': url, **request}))
+            sent = 0
+            for chunk in uploads:
+                # stay within the window of acknowledged bytes
+                while window is not None and sent + len(chunk) - max(
+                        [0] + [json.loads(m).get('received', 0)
+                               for m in connection.sent
+                               if isinstance(m, str)]) > window:
+                    await asyncio.sleep(0.01)
+                connection.emit(ConnectionEventType.Data,
+                                struct.pack('>I', 1) + chunk)
+                sent += len(chunk)
+            for _ in range(200):
+                await asyncio.sleep(0.02)
+                if sum(isinstance(m, bytes) or m.startswith('{') and
+                       json.loads(m)['status'] >= 400
+                       for m in connection.sent) == \
+                        (len(requests) if replies is None else replies):
+                    break
+        return connection.sent
+
+    return asyncio.run(run())
+
+
+def test_methods_headers_and_bodies(monkeypatch):
+    """Any method goes upstream with its headers and body."""
+    monkeypatch.setattr(http_proxy, 'response_cache', ResponseCache())
+    sent = run_requests(monkeypatch, [
+        {'id': 1, 'method': 'POST', 'headers': {'X-Token': 't',
+                                                'Connection': 'close'},
+         'body': {'threshold': 0.6}},
+        {'id': 2, 'method': 'delete', 'body': 'clip 7'},
+        {'id': 3, 'method': 'PATCH', 'body-length': 0}])
+    replies = {struct.unpack_from('>I', m)[0]: json.loads(m[4:])
+               for m in sent if isinstance(m, bytes)}
+    assert replies[1] == {'method': 'POST', 'token': 't',
+                          'type': 'application/json', 'length': 18,
+                          'body': '{"threshold": 0.6}'}
+    assert replies[2]['method'] == 'DELETE'
+    assert replies[2]['body'] == 'clip 7'
+    assert replies[3]['length'] == 0
+
+
+def test_streamed_upload_within_window(monkeypatch):
+    """A large body flows in as the peer keeps to the window."""
+    size = 3 * http_proxy.UPLOAD_WINDOW
+    chunk = b'u' * (64 * 1024)
+    sent = run_requests(monkeypatch,
+                        [{'id': 1, 'method': 'PUT', 'body-length': size}],
+                        uploads=[chunk] * (size // len(chunk)),
+                        window=http_proxy.UPLOAD_WINDOW)
+    reply = [json.loads(m[4:]) for m in sent if isinstance(m, bytes)][0]
+    assert reply['length'] == size
+    acknowledged = [json.loads(m)['received'] for m in sent
+                    if isinstance(m, str) and json.loads(m)['status'] == 100]
+    assert acknowledged[-1] == size and len(acknowledged) == 12
+
+
+def test_upload_ahead_of_window_fails(monkeypatch):
+    """A peer ignoring acknowledgements gets an error, not our memory."""
+    size = 3 * http_proxy.UPLOAD_WINDOW
+    chunk = b'u' * (64 * 1024)
+    sent = run_requests(monkeypatch,
+                        [{'id': 1, 'method': 'PUT', 'body-length': size}],
+                        uploads=[chunk] * (size // len(chunk)))
+    statuses = [json.loads(m)['status'] for m in sent if isinstance(m, str)]
+    assert statuses[-1] == 500
+
+
+def test_ping_with_body_length_leaves_no_upload(monkeypatch):
+    """A ping never registers an upload blocking later ones."""
+    chunk = b'u' * 1000
+    sent = run_requests(monkeypatch,
+                        [{'url': 'ping', 'body-length': 5},
+                         {'id': 1, 'method': 'PUT', 'body-length': 2000}],
+                        uploads=[chunk, chunk], replies=1)
+    assert sent[:2] == [json.dumps({'status': 200}), 'pong']
+    reply = [m for m in sent if isinstance(m, bytes)][0]
+    assert json.loads(reply[4:])['length'] == 2000
+
+
+def test_range_requests_bypass_cache(monkeypatch):
+    """Seeking in a clip gets the partial content, not the cached clip."""
+    async def clip(request):
+        headers = {'Cache-Control': 'max-age=60',
+                   'Content-Type': 'video/mp4'}
+        if 'Range' not in request.headers:
+            return web.Response(body=bytes(range(100)), headers=headers)
+        headers['Content-Range'] = 'bytes 0-9/100'
+        return web.Response(status=206, body=bytes(range(10)),
+                            headers=headers)
+
+    cache = ResponseCache()
+    monkeypatch.setattr(http_proxy, 'response_cache', cache)
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/clip', clip)
+        async with TestServer(app) as server, \
+                aiohttp.ClientSession() as session:
+            monkeypatch.setattr(http_proxy, 'http_session', session)
+            url = str(server.make_url('/clip'))
+            connection = FakeConnection()
+            for headers in (None, {'Range': 'bytes=0-9'}):
+                await http_proxy._proxy(
+                    responder=http_proxy._Responder(connection),
+                    request={'url': url, 'headers': headers},
+                    waiting_on_fetch=asyncio.Event())
+            return connection.sent
+
+    sent = asyncio.run(run())
+    assert json.loads(sent[2])['status'] == 206
+    assert sent[3] == bytes(range(10))
+    assert (cache.stats.misses, cache.stats.hits) == (1, 0)
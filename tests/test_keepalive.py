@@ -0,0 +1,64 @@
+"""Test the shared keepalive scheduler."""
+import asyncio
+import json
+
+from peerjs.ext.keepalive import KeepaliveScheduler
+
+
+class FakeConnection:
+    """Data connection stand in that records sent messages."""
+
+    def __init__(self):
+        self.open = True
+        self.sent = []
+
+    async def send(self, data):
+        self.sent.append(json.loads(data))
+
+
+async def sent(connection, count):
+    """Wait until connection has sent count messages."""
+    while len(connection.sent) < count:
+        await asyncio.sleep(0.01)
+
+
+def test_one_keepalive_per_connection():
+    """Waiting requests share a keepalive per interval."""
+    async def run():
+        scheduler = KeepaliveScheduler(interval=0.05, slots=4)
+        busy, idle = FakeConnection(), FakeConnection()
+        requests = [scheduler.waiting(busy, id) for id in (3, 1)]
+        legacy = scheduler.waiting(busy)
+        scheduler.waiting(idle).set()
+        await asyncio.wait_for(sent(busy, 2), timeout=5)
+        assert busy.sent == [{'status': 202, 'pending': [1, 3]}] * \
+            len(busy.sent)
+        assert idle.sent == []
+        stats = scheduler.stats
+        assert stats.sent == len(busy.sent)
+        assert stats.coalesced == 2 * stats.sent
+        assert (stats.connections, stats.waiting) == (1, 3)
+        for request in requests + [legacy]:
+            request.set()
+        assert scheduler.stats.connections == 0
+        count = len(busy.sent)
+        await asyncio.wait_for(scheduler._task, timeout=5)
+        assert len(busy.sent) == count
+
+    asyncio.run(run())
+
+
+def test_closed_connection_is_dropped():
+    """Connections closed while waiting get no more keepalives."""
+    async def run():
+        scheduler = KeepaliveScheduler(interval=0.02)
+        connection = FakeConnection()
+        request = scheduler.waiting(connection, 7)
+        connection.open = False
+        await asyncio.wait_for(scheduler._task, timeout=5)
+        assert connection.sent == []
+        assert scheduler.stats.dropped == 1
+        request.set()
+        assert request.is_set()
+
+    asyncio.run(run())
@@ -0,0 +1,60 @@
+"""Test the bounded store for early signaling messages."""
+from peerjs.enums import ServerMessageType
+from peerjs.messagestore import MessageStore
+from peerjs.servermessage import ServerMessage
+
+
+def _candidate(connectionId, n=0):
+    return ServerMessage(ServerMessageType.Candidate,
+                         {'connectionId': connectionId, 'n': n}, 'src')
+
+
+def test_replay_in_order():
+    """Messages are claimed in arrival order and only once."""
+    store = MessageStore()
+    for n in range(3):
+        store.store('dc_1', _candidate('dc_1', n))
+    assert [m.payload['n'] for m in store.pop('dc_1')] == [0, 1, 2]
+    assert store.pop('dc_1') == []
+    assert len(store) == 0
+    assert store.stats.replayed == 3
+
+
+def test_per_connection_limit():
+    """Messages beyond the per connection limit are dropped."""
+    store = MessageStore(maxPerConnection=2)
+    results = [store.store('dc_1', _candidate('dc_1', n)) for n in range(3)]
+    assert results == [True, True, False]
+    assert store.stats.dropped == 1
+    assert len(store.pop('dc_1')) == 2
+
+
+def test_total_limit_evicts_oldest_connection():
+    """The total limit evicts connections waiting the longest."""
+    store = MessageStore(maxMessages=3)
+    store.store('dc_1', _candidate('dc_1'))
+    store.store('dc_1', _candidate('dc_1'))
+    store.store('dc_2', _candidate('dc_2'))
+    store.store('dc_3', _candidate('dc_3'))
+    assert 'dc_1' not in store
+    assert len(store) == 2
+    assert store.stats.dropped == 2
+
+
+def test_byte_limit():
+    """A connection can not exceed the byte limit on its own."""
+    store = MessageStore(maxBytes=150)
+    assert store.store('dc_1', _candidate('dc_1'))
+    assert not store.store('dc_1', _candidate('dc_1'))
+    assert store.stats.bytes <= 150
+
+
+def test_expire():
+    """Messages older than the time to live are expired."""
+    store = MessageStore(ttl=10)
+    store.store('dc_1', _candidate('dc_1'))
+    assert store.expire() == 0
+    assert store.expire(now=store._messages['dc_1'][0][0] + 11) == 1
+    assert 'dc_1' not in store
+    assert store.stats.expired == 1
+    assert store.stats.messages == 0 and store.stats.bytes == 0
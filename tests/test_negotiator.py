@@ -0,0 +1,75 @@
+"""Test negotiation helpers."""
+import asyncio
+from types import SimpleNamespace
+
+from peerjs.enums import ConnectionType, ServerMessageType
+from peerjs.negotiator import Negotiator, supportsTrickleIce, withTrickleIce
+
+SDP = 'v=0\r\no=- 1 1 IN IP4 0.0.0.0\r\ns=-\r\nt=0 0\r\n' \
+      'm=application 9 UDP/DTLS/SCTP webrtc-datachannel\r\n' \
+      'a=mid:0\r\n'
+
+
+def test_trickle_ice_detection():
+    """Trickle support is read from the ice-options attribute."""
+    assert not supportsTrickleIce(SDP)
+    assert supportsTrickleIce(SDP + 'a=ice-options:trickle\r\n')
+    assert supportsTrickleIce(SDP + 'a=ice-options:ice2 trickle\r\n')
+    assert not supportsTrickleIce(SDP + 'a=ice-options:ice2\r\n')
+
+
+def test_with_trickle_ice():
+    """Trickle support is advertised once at session level."""
+    sdp = withTrickleIce(SDP)
+    assert supportsTrickleIce(sdp)
+    assert sdp.index('a=ice-options:trickle') < sdp.index('m=')
+    assert withTrickleIce(sdp) == sdp
+
+
+class FakePeerConnection:
+    """Peer connection stand in that records added candidates."""
+
+    def __init__(self):
+        self.candidates = []
+
+    async def addIceCandidate(self, candidate):
+        self.candidates.append(candidate)
+
+
+def test_end_of_candidates_reaches_peer_connection():
+    """An empty candidate tells ICE that no more are coming."""
+    peerConnection = FakePeerConnection()
+    negotiator = Negotiator(SimpleNamespace(
+        peer='remote', peerConnection=peerConnection, provider=None))
+    asyncio.run(negotiator.handleCandidate(
+        {'candidate': '', 'sdpMid': '0', 'sdpMLineIndex': 0}))
+    assert peerConnection.candidates == [None]
+
+
+class FakeSocket:
+    """Signaling socket stand in that records sent messages."""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(message)
+
+
+def test_trickled_candidates_end_with_empty_candidate():
+    """The remote ICE agent learns that no more candidates follow."""
+    sdp = SDP + 'a=candidate:1 1 udp 2130706431 192.0.2.1 5000 typ host\r\n'
+    socket = FakeSocket()
+    negotiator = Negotiator(SimpleNamespace(
+        peer='remote', type=ConnectionType.Data, connectionId='dc_1',
+        peerConnection=SimpleNamespace(
+            localDescription=SimpleNamespace(sdp=sdp)),
+        provider=SimpleNamespace(socket=socket)))
+    asyncio.run(negotiator._sendLocalCandidates())
+    assert [m['type'] for m in socket.sent] == \
+        [ServerMessageType.Candidate.value] * 2
+    first, last = (m['payload'] for m in socket.sent)
+    assert first['candidate']['candidate'].startswith('candidate:1 1 udp')
+    assert last == {
+        'candidate': {'candidate': '', 'sdpMid': '0', 'sdpMLineIndex': 0},
+        'type': ConnectionType.Data.value, 'connectionId': 'dc_1'}
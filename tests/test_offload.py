@@ -0,0 +1,59 @@
+"""Test offloading serialization of large messages."""
+import asyncio
+
+from peerjs.dataconnection import DataConnection
+from peerjs.offload import Offloader, estimateSize
+
+
+def test_estimate_size():
+    """Strings and bytes count by length, containers roughly."""
+    assert estimateSize('x' * 100) == 100
+    assert estimateSize({'snap': b'x' * 1000}) == 1008
+    assert estimateSize([{'a': 1}] * 1000) == 40000
+    assert estimateSize(42) == 8
+
+
+def test_offload_by_size():
+    """Calls above the threshold run in the executor and are timed."""
+    async def run():
+        offloader = Offloader(threshold=100)
+        assert await offloader.call('raw len', 10, len, b'x' * 10) == 10
+        assert await offloader.call('raw len', 1000, len, b'x' * 1000) == 1000
+        timing = offloader.timings['raw len']
+        assert timing.offloaded == 1
+        assert timing.counts[0] == 2
+        assert len(timing.meanSeconds) == len(timing.counts)
+        assert not Offloader(threshold=0).offloads(10 ** 9)
+
+    asyncio.run(run())
+
+
+def test_large_messages_keep_order():
+    """Small messages wait for a large one decoded in the background."""
+    async def run():
+        for serialization in ('json', 'binary'):
+            sender = DataConnection('remote', None,
+                                    serialization=serialization,
+                                    offloadThreshold=1000)
+            sent = []
+            sender._dc = type('Channel', (), {
+                'bufferedAmount': 0,
+                'send': lambda self, m: sent.append(m)})()
+            sender._open = True
+            large = {'text': 'x' * 5000}
+            await sender.send(large)
+            await sender.send('small')
+            receiver = DataConnection('local', None,
+                                      serialization=serialization,
+                                      offloadThreshold=1000)
+            for message in sent:
+                receiver._handleDataMessage(message)
+            assert receiver.inboxStats.received == 0
+            assert [await receiver.recv() for _ in range(2)] == \
+                [large, 'small']
+            assert sender.codecTimings[
+                f'{serialization} encode'].offloaded == 1
+            assert receiver.codecTimings[
+                f'{serialization} decode'].offloaded == 1
+
+    asyncio.run(run())
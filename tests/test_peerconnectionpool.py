@@ -0,0 +1,52 @@
+"""Test the pre-built peer connection pool."""
+import asyncio
+import time
+
+from peerjs.peerconnectionpool import PeerConnectionPool
+
+
+async def _filled(pool, size):
+    for _ in range(200):
+        if len(pool) >= size:
+            return
+        await asyncio.sleep(0.01)
+
+
+def test_hits_misses_and_refill():
+    """Connections come from the pool once it has refilled."""
+    async def run():
+        pool = PeerConnectionPool(size=2)
+        first = pool.take()
+        assert pool.stats.misses == 1
+        await _filled(pool, 2)
+        second = pool.take()
+        assert second.sctp is not None
+        assert pool.stats.hits == 1
+        assert pool.stats.hitRate == 0.5
+        await pool.close()
+        await first.close()
+        await second.close()
+        assert len(pool) == 0
+        # a closed pool builds on demand and does not refill
+        third = pool.take()
+        await asyncio.sleep(0.01)
+        assert len(pool) == 0
+        await third.close()
+
+    asyncio.run(run())
+
+
+def test_expire_replaces_idle():
+    """Connections idle longer than maxIdle are replaced."""
+    async def run():
+        pool = PeerConnectionPool(size=1, maxIdle=10)
+        pool.fill()
+        await _filled(pool, 1)
+        assert pool.expire(time.monotonic() + 5) == 0
+        assert pool.expire(time.monotonic() + 11) == 1
+        await _filled(pool, 1)
+        assert pool.stats.discarded == 1
+        assert pool.stats.created == 2
+        await pool.close()
+
+    asyncio.run(run())
@@ -0,0 +1,150 @@
+"""Test sharing of resources between pooled peers."""
+import asyncio
+
+from pyee import AsyncIOEventEmitter
+
+from peerjs.peer import Peer, PeerOptions
+from peerjs.peerpool import PeerPool
+
+
+async def fakeStart(peer):
+    """Start a peer as if the signaling server assigned it an id."""
+    peer._socket = peer._createServerConnection()
+    peer._id = peer._id or f'peer{id(peer)}'
+    peer._open = True
+
+
+def test_pooled_peers_share_resources():
+    """Pooled peers share http session and ICE config, not tokens."""
+    async def run():
+        pool = PeerPool(peer_options=PeerOptions())
+        peer1 = pool._createPeer()
+        peer2 = pool._createPeer()
+        assert peer1.http_api._http_session is pool.http_session
+        assert peer2.http_api._http_session is pool.http_session
+        assert peer1.options.config is peer2.options.config
+        assert peer1.options is not peer2.options
+        assert peer1.options.token != peer2.options.token
+        await peer1.http_api.close()
+        assert not pool.http_session.closed
+        await pool.close()
+    asyncio.run(run())
+
+
+def test_caller_options_are_respected():
+    """Only peers created from the pool options get its defaults."""
+    async def run():
+        pool = PeerPool(peer_options=PeerOptions())
+        default = pool._createPeer()
+        custom = pool._createPeer(
+            peer_options=PeerOptions(signalingCompression=True))
+        assert not default.options.signalingCompression
+        assert custom.options.signalingCompression
+        await pool.close()
+    asyncio.run(run())
+
+
+def test_failed_start_destroys_peer(monkeypatch):
+    """A peer that raised while starting is not pooled."""
+    started = []
+
+    async def start(peer):
+        await fakeStart(peer)
+        started.append(peer)
+        raise RuntimeError('socket failed')
+    monkeypatch.setattr(Peer, 'start', start)
+
+    async def run():
+        pool = PeerPool()
+        assert await pool.addPeer('failing') is None
+        assert started[0].destroyed
+        assert len(pool) == 0
+        assert (pool.stats.started, pool.stats.failedStarts) == (0, 1)
+        await pool.close()
+    asyncio.run(run())
+
+
+def test_add_and_remove_peers(monkeypatch):
+    """Started peers are tracked until removed or the pool closes."""
+    monkeypatch.setattr(Peer, 'start', fakeStart)
+
+    async def run():
+        pool = PeerPool(housekeepingInterval=60)
+        first = await pool.addPeer('first')
+        second = await pool.addPeer()
+        assert pool.getPeer('first') is first
+        assert pool.getPeer(second.id) is second
+        assert list(pool) == [first, second]
+        stats = pool.stats
+        assert (stats.peers, stats.started, stats.failedStarts) == (2, 2, 0)
+        assert stats.avgStartupTime is not None
+        housekeeper = pool._housekeeper
+        assert housekeeper is not None
+        assert first._housekeeper is None and second._housekeeper is None
+        await pool.removePeer('first')
+        assert first.destroyed and pool.getPeer('first') is None
+        assert (len(pool), pool.stats.removed) == (1, 1)
+        await pool.removePeer('first')
+        assert pool.stats.removed == 1
+        await pool.close()
+        assert second.destroyed and len(pool) == 0
+        assert housekeeper.cancelled() or housekeeper.done()
+    asyncio.run(run())
+
+
+def test_shared_housekeeping_drops_destroyed_peers(monkeypatch):
+    """One pool timer runs maintenance of the live peers only."""
+    monkeypatch.setattr(Peer, 'start', fakeStart)
+    housekept = []
+    monkeypatch.setattr(Peer, 'housekeep',
+                        lambda peer: housekept.append(peer))
+
+    async def run():
+        pool = PeerPool(housekeepingInterval=0.01)
+        live = await pool.addPeer('live')
+        gone = await pool.addPeer('gone')
+        await gone.destroy()
+
+        async def housekeptTwice():
+            while housekept.count(live) < 2:
+                await asyncio.sleep(0.01)
+        await asyncio.wait_for(housekeptTwice(), timeout=5)
+        assert gone not in housekept
+        assert list(pool) == [live]
+        assert pool.stats.removed == 1
+        await pool.close()
+    asyncio.run(run())
+
+
+class FakeConnection(AsyncIOEventEmitter):
+    """Peer connection stand in for the registry."""
+
+    def __init__(self, connectionId):
+        super().__init__()
+        self.connectionId = connectionId
+        self.open = True
+
+    async def close(self):
+        pass
+
+
+def test_stats_aggregate_peers(monkeypatch):
+    """Pool stats sum up the metrics of all pooled peers."""
+    monkeypatch.setattr(Peer, 'start', fakeStart)
+
+    async def run():
+        pool = PeerPool(housekeepingInterval=60)
+        first = await pool.addPeer('first')
+        second = await pool.addPeer('second')
+        first.connections.add('remote', FakeConnection('dc_1'))
+        first.connections.add('other', FakeConnection('dc_2'))
+        second.connections.add('remote', FakeConnection('dc_3'))
+        second._open = False
+        first.reconnectStats.reconnects = 2
+        second.reconnectStats.reconnects = 1
+        stats = pool.stats
+        assert (stats.peers, stats.open, stats.connections) == (2, 1, 3)
+        assert stats.signalingReconnects == 3
+        await pool.close()
+        assert (pool.stats.peers, pool.stats.removed) == (0, 2)
+    asyncio.run(run())
@@ -0,0 +1,93 @@
+"""Test the HTTP proxy response cache."""
+import asyncio
+import time
+from email.utils import formatdate
+
+from peerjs.ext.responsecache import ResponseCache, freshnessLifetime
+
+
+class Upstream:
+    """Fetch stand in answering with the given headers and body."""
+
+    def __init__(self, headers, body=b'x' * 100):
+        self.headers = headers
+        self.body = body
+        self.requests = []
+
+    async def __call__(self, url, headers):
+        self.requests.append(headers)
+        if 'If-None-Match' in headers and \
+                headers['If-None-Match'] == self.headers.get('ETag'):
+            return 304, {'ETag': self.headers['ETag']}, b''
+        return 200, self.headers, self.body
+
+
+def test_freshness_lifetime():
+    """max-age wins over Expires, Last-Modified gives a heuristic."""
+    now = time.time()
+    assert freshnessLifetime({'cache-control': 'public, max-age=60'}) == 60
+    assert freshnessLifetime({'cache-control': 'no-cache, max-age=60'}) == 0
+    assert 119 <= freshnessLifetime({
+        'date': formatdate(now, usegmt=True),
+        'expires': formatdate(now + 120, usegmt=True)}) <= 120
+    assert 99 <= freshnessLifetime({
+        'last-modified': formatdate(now - 1000, usegmt=True)}) <= 101
+    assert freshnessLifetime({}) == 0
+
+
+def test_fresh_hits_and_revalidation():
+    """Fresh entries skip upstream, stale ones revalidate by ETag."""
+    async def run():
+        cache = ResponseCache()
+        upstream = Upstream({'ETag': '"v1"', 'Cache-Control': 'max-age=60'})
+        first = await cache.get('/status', upstream)
+        second = await cache.get('/status', upstream)
+        assert second is first and len(upstream.requests) == 1
+        first.expires = 0
+        third = await cache.get('/status', upstream)
+        assert third.body == upstream.body and third.fresh
+        assert upstream.requests[-1] == {'If-None-Match': '"v1"'}
+        stats = cache.stats
+        assert (stats.hits, stats.revalidated, stats.misses) == (1, 1, 1)
+        assert stats.upstreamBytesSaved == 200
+        assert stats.hitRatio == 2 / 3
+
+    asyncio.run(run())
+
+
+def test_not_stored_and_lru_eviction():
+    """Uncacheable responses pass through, old entries make room."""
+    async def run():
+        cache = ResponseCache(maxBytes=250)
+        for headers in ({'Cache-Control': 'no-store, max-age=60'},
+                        {'Cache-Control': 'max-age=60', 'Vary': 'Accept'},
+                        {}):
+            await cache.get('/a', Upstream(headers))
+            assert len(cache) == 0
+        fresh = Upstream({'Cache-Control': 'max-age=60'})
+        for url in ('/a', '/b', '/a', '/c'):
+            await cache.get(url, fresh)
+        assert len(cache) == 2 and cache.stats.evicted == 1
+        await cache.get('/a', fresh)
+        assert cache.stats.hits == 2 and cache.stats.bytes == 200
+        cache.invalidate('/a')
+        assert cache.stats.bytes == 100
+
+    asyncio.run(run())
+
+
+def test_not_modified_for_peer():
+    """Matching client validators skip the body."""
+    async def run():
+        cache = ResponseCache()
+        lastModified = formatdate(time.time() - 60, usegmt=True)
+        response = await cache.get('/timeline', Upstream(
+            {'ETag': 'W/"t7"', 'Last-Modified': lastModified}))
+        assert cache.notModified(response, {'if-none-match': '"t6", "t7"'})
+        assert not cache.notModified(response, {'if-none-match': '"t6"'})
+        assert cache.notModified(response, {
+            'if-modified-since': formatdate(time.time(), usegmt=True)})
+        assert cache.stats.notModified == 2
+        assert cache.stats.peerBytesSaved == 200
+
+    asyncio.run(run())
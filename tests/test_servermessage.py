@@ -0,0 +1,31 @@
+"""Test signaling server message decoding."""
+import pytest
+
+from peerjs.enums import ServerMessageType
+from peerjs.servermessage import ServerMessage
+
+
+def test_from_json():
+    """Wire JSON is decoded with enum conversion."""
+    msg = ServerMessage.from_json(
+        '{"type": "CANDIDATE", "src": "abc",'
+        ' "payload": {"connectionId": "dc_1"}}')
+    assert msg.type is ServerMessageType.Candidate
+    assert msg.src == 'abc'
+    assert msg.payload == {'connectionId': 'dc_1'}
+
+
+def test_from_json_optional_fields():
+    """Payload and source are optional."""
+    msg = ServerMessage.from_json('{"type": "HEARTBEAT"}')
+    assert msg == ServerMessage(ServerMessageType.Heartbeat)
+    assert msg.payload is None
+    assert msg.src is None
+
+
+def test_from_json_unknown_type():
+    """Unknown message types are rejected."""
+    with pytest.raises(ValueError):
+        ServerMessage.from_json('{"type": "BOGUS"}')
+    with pytest.raises(ValueError):
+        ServerMessage.from_json('["OPEN"]')
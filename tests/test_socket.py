@@ -0,0 +1,130 @@
+"""Test signaling socket outbound queue."""
+import asyncio
+import json
+
+from peerjs.enums import SocketEventType
+from peerjs.socket import Socket, backoffDelay
+
+
+class FakeWebSocket:
+    """Websocket stand in that records sent frames."""
+
+    def __init__(self, block: asyncio.Event = None):
+        self.open = True
+        self.sent = []
+        self._block = block
+        self._closed = asyncio.Event()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await self._closed.wait()
+        raise StopAsyncIteration
+
+    def drop(self):
+        """Simulate the server closing the connection."""
+        self.open = False
+        self._closed.set()
+
+    async def send(self, message):
+        if self._block:
+            await self._block.wait()
+        self.sent.append(json.loads(message))
+
+    async def close(self):
+        self.drop()
+
+
+def _open(socket, websocket):
+    socket._websocket = websocket
+    socket._disconnected = False
+    socket._writer = asyncio.create_task(socket._write(websocket))
+
+
+def test_flush_in_order_after_open():
+    """Messages queued before the socket opens are flushed in order."""
+    async def run():
+        socket = Socket(host='localhost', port=9000, path='/', key='k')
+        for i in range(3):
+            await socket.send({'n': i})
+        assert socket.queuedMessages == 3
+        websocket = FakeWebSocket()
+        _open(socket, websocket)
+        await socket.send({'n': 3})
+        await asyncio.sleep(0)
+        assert [m['n'] for m in websocket.sent] == [0, 1, 2, 3]
+        assert socket.queuedMessages == 0
+        await socket._cleanup()
+    asyncio.run(run())
+
+
+def test_drop_oldest_while_not_open():
+    """Overflow before the socket opens drops the oldest messages."""
+    async def run():
+        socket = Socket(host='localhost', port=9000, path='/', key='k',
+                        sendQueueSize=2)
+        for i in range(4):
+            await socket.send({'n': i})
+        assert [json.loads(m)['n'] for m in socket._messagesQueue] == [2, 3]
+    asyncio.run(run())
+
+
+def test_backpressure_while_open():
+    """Senders wait for room in the queue while the websocket is busy."""
+    async def run():
+        socket = Socket(host='localhost', port=9000, path='/', key='k',
+                        sendQueueSize=2)
+        unblock = asyncio.Event()
+        websocket = FakeWebSocket(block=unblock)
+        _open(socket, websocket)
+        await socket.send({'n': 0})
+        await asyncio.sleep(0)
+        await socket.send({'n': 1})
+        blocked = asyncio.create_task(socket.send({'n': 2}))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        unblock.set()
+        await asyncio.wait_for(blocked, 1)
+        await asyncio.sleep(0.01)
+        assert [m['n'] for m in websocket.sent] == [0, 1, 2]
+        await socket._cleanup()
+    asyncio.run(run())
+
+
+def test_backoff_delay_bounds():
+    """Backoff delays grow exponentially up to the cap."""
+    for attempt in range(10):
+        delay = backoffDelay(attempt, 0.1, 2.0)
+        assert 0 <= delay <= min(2.0, 0.1 * 2 ** attempt)
+
+
+def test_reconnect_after_drop():
+    """A dropped websocket reconnects and flushes queued messages."""
+    async def run():
+        socket = Socket(host='localhost', port=9000, path='/', key='k',
+                        reconnectDelay=0.001)
+        websockets = []
+
+        async def connect(wss_url=None):
+            websocket = FakeWebSocket()
+            websockets.append(websocket)
+            socket._disconnected = False
+            return websocket
+        socket._connect = connect
+        reconnected = []
+        socket.on(SocketEventType.Reconnected, reconnected.append)
+        await socket.start('id', 'token')
+        websockets[0].drop()
+        await asyncio.sleep(0)
+        await socket.send({'n': 1})
+        for _ in range(100):
+            if reconnected and websockets[-1].sent:
+                break
+            await asyncio.sleep(0.01)
+        assert len(websockets) == 2
+        assert websockets[1].sent == [{'n': 1}]
+        assert socket.reconnectStats.reconnects == 1
+        assert socket.reconnectStats.lastReconnectTime == reconnected[0]
+        await socket.close()
+    asyncio.run(run())
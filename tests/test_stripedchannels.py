@@ -0,0 +1,94 @@
+"""Test striping large messages across data channels."""
+import asyncio
+
+from pyee import AsyncIOEventEmitter
+
+from peerjs.stripedchannels import StripedChannels, stripeLabel
+from peerjs.util import util
+
+
+class FakeDataChannel(AsyncIOEventEmitter):
+    """Open data channel stand in that records what is sent."""
+
+    def __init__(self):
+        super().__init__()
+        self.readyState = 'open'
+        self.bufferedAmount = 0
+        self.bufferedAmountLowThreshold = 0
+        self.sent = []
+
+    def send(self, data):
+        self.sent.append(data)
+
+
+def channels(count, received):
+    striped = StripedChannels(count, lambda m: received.append(bytes(m)))
+    dcs = [FakeDataChannel() for _ in range(count)]
+    for dc in dcs:
+        striped.add(dc)
+    return striped, dcs
+
+
+def test_stripes_keep_message_order():
+    """Messages are handed on in order whatever channel runs ahead."""
+    async def run():
+        sender, outgoing = channels(3, [])
+        assert sender.ready
+        first = bytes(range(256)) * 200
+        second = b'y' * 20000
+        await sender.send(first)
+        await sender.send(second)
+        # each message starts over with the first channel
+        assert [len(dc.sent) for dc in outgoing] == [3, 2, 1]
+        received = []
+        receiver, _ = channels(3, received)
+        for dc in reversed(outgoing):
+            for chunk in dc.sent:
+                receiver._receive(chunk)
+        assert received == [first, second]
+        assert receiver.stats.completed == 2
+
+    asyncio.run(run())
+
+
+def test_dropped_transfer_does_not_block():
+    """Later messages flow once an incomplete one is dropped."""
+    async def run():
+        sender, outgoing = channels(2, [])
+        await sender.send(b'a' * 40000)
+        await sender.send(b'b' * 40000)
+        received = []
+        receiver, _ = channels(2, received)
+        # the first message misses its second chunk
+        for chunk in outgoing[0].sent:
+            receiver._receive(chunk)
+        receiver._receive(outgoing[1].sent[1])
+        assert received == []
+        # time the first transfer out
+        receiver._chunks._timeout = -1
+        receiver.expire()
+        assert received == [b'b' * 40000]
+
+    asyncio.run(run())
+
+
+def test_far_ahead_transfer_is_dropped():
+    """A chunk with a transfer id far ahead neither blocks nor stays."""
+    async def run():
+        sender, outgoing = channels(1, [])
+        await sender.send(b'c' * 100)
+        received = []
+        receiver, _ = channels(1, received)
+        chunk = util.unpack(outgoing[0].sent[0])
+        for id in (2 ** 62, -1):
+            chunk['__peerData'] = id
+            receiver._receive(util.pack(chunk))
+        assert received == [] and receiver._next == 0
+        receiver._receive(outgoing[0].sent[0])
+        assert received == [b'c' * 100]
+
+    asyncio.run(run())
+
+
+def test_stripe_labels():
+    assert stripeLabel('dc_1', 2) == 'dc_1/stripe/2'
@@ -0,0 +1,104 @@
+"""Test the STUN cache against a local STUN stand in."""
+import asyncio
+
+from aioice import stun
+from aiortc.rtcconfiguration import RTCConfiguration, RTCIceServer
+
+from peerjs.stuncache import StunCache
+
+
+class StunServer(asyncio.DatagramProtocol):
+    """Answer binding requests with the sender's address."""
+
+    def __init__(self, lose: int = 0):
+        self.requests = 0
+        # requests lost before the first one answered
+        self.lose = lose
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        request = stun.parse_message(data)
+        self.requests += 1
+        if self.requests <= self.lose:
+            return
+        response = stun.Message(message_method=stun.Method.BINDING,
+                                message_class=stun.Class.RESPONSE,
+                                transaction_id=request.transaction_id)
+        response.attributes['XOR-MAPPED-ADDRESS'] = addr
+        self.transport.sendto(bytes(response), addr)
+
+
+def _config(port):
+    return RTCConfiguration(iceServers=[RTCIceServer(
+        urls=[f'stun:localhost:{port}', 'turn:turn.example.com:3478'],
+        username='user', credential='secret')])
+
+
+async def _stunServer(lose: int = 0):
+    loop = asyncio.get_running_loop()
+    transport, server = await loop.create_datagram_endpoint(
+        lambda: StunServer(lose), local_addr=('127.0.0.1', 0))
+    return transport, server, transport.get_extra_info('sockname')[1]
+
+
+def test_rewrite_with_cached_mapping():
+    """STUN servers are probed once and replaced by their address."""
+    async def run():
+        transport, server, port = await _stunServer()
+        addresses = {'10.0.0.2'}
+        cache = StunCache(addresses=lambda: frozenset(addresses))
+        config = _config(port)
+        # nothing cached yet: config passes through, refresh starts
+        assert cache.apply(config).iceServers[0].urls == \
+            config.iceServers[0].urls
+        await cache._refresher
+        for _ in range(3):
+            urls = cache.apply(config).iceServers[0].urls
+        assert urls == [f'stun:127.0.0.1:{port}', 'turn:turn.example.com:3478']
+        assert server.requests == 1
+        assert cache.stats.hits == 3
+        # a network change drops cached results
+        addresses.add('10.0.0.3')
+        assert cache.checkNetwork()
+        assert cache.mapping('localhost', port) is None
+        transport.close()
+
+    asyncio.run(run())
+
+
+def test_skip_stun_without_nat():
+    """No STUN when it reports a local address, kept if it is silent."""
+    async def run():
+        transport, server, port = await _stunServer()
+        cache = StunCache(addresses=lambda: frozenset({'127.0.0.1'}))
+        await cache.refresh(_config(port))
+        assert cache.apply(_config(port)).iceServers[0].urls == \
+            ['turn:turn.example.com:3478']
+        transport.close()
+        silent = StunCache(probeTimeout=0.1)
+        await silent.refresh(_config(port))
+        assert silent.stats.failedProbes == 1
+        assert silent.apply(_config(port)).iceServers[0].urls == \
+            _config(port).iceServers[0].urls
+
+    asyncio.run(run())
+
+
+def test_probe_retransmits_lost_requests(monkeypatch):
+    """A lost binding request is sent again with a doubling timeout."""
+    monkeypatch.setattr('peerjs.stuncache.STUN_RTO', 0.05)
+
+    async def run():
+        transport, server, port = await _stunServer(lose=2)
+        cache = StunCache(addresses=lambda: frozenset({'10.0.0.2'}),
+                          probeTimeout=1.0)
+        await cache.refresh(_config(port))
+        assert server.requests == 3
+        assert cache.stats.failedProbes == 0
+        assert cache.apply(_config(port)).iceServers[0].urls[0] == \
+            f'stun:127.0.0.1:{port}'
+        transport.close()
+
+    asyncio.run(run())